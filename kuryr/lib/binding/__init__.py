@@ -0,0 +1,1451 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import collections
+from concurrent import futures
+import contextlib
+import errno
+import os
+import sqlite3
+import threading
+
+from oslo_concurrency import processutils
+from oslo_config import cfg
+from oslo_log import log
+from oslo_utils import excutils
+import pyroute2
+from stevedore import extension
+
+from kuryr.lib.binding import coprocess
+from kuryr.lib.binding import datapath
+from kuryr.lib.binding import drivers
+from kuryr.lib.binding.drivers import subinterface
+from kuryr.lib.binding import iproute
+from kuryr.lib.binding import iproute_pool
+from kuryr.lib.binding import journal
+from kuryr.lib.binding import link_index
+from kuryr.lib.binding import netns as netns_lib
+from kuryr.lib.binding import plan
+from kuryr.lib.binding import scheduler
+from kuryr.lib.binding import singleflight
+from kuryr.lib.binding import veth_pool
+from kuryr.lib import exceptions
+from kuryr.lib import metrics
+from kuryr.lib import privileged
+
+
+LOG = log.getLogger(__name__)
+
+BINDING_SUBCOMMAND = 'bind'
+DOWN = 'DOWN'
+FALLBACK_VIF_TYPE = 'unbound'
+FIXED_IP_KEY = 'fixed_ips'
+IFF_UP = 0x1  # The last bit represents if the interface is up
+IP_ADDRESS_KEY = 'ip_address'
+KIND_VETH = 'veth'
+MAC_ADDRESS_KEY = 'mac_address'
+SUBNET_ID_KEY = 'subnet_id'
+UNBINDING_SUBCOMMAND = 'unbind'
+ENSURING_OPERATION = 'ensure'
+VIF_TYPE_KEY = 'binding:vif_type'
+VIF_DETAILS_KEY = 'binding:vif_details'
+DEFAULT_NETWORK_MTU = 1500
+IPDB_BACKEND = 'ipdb'
+IPROUTE_BACKEND = 'iproute'
+DEFAULT_CONTAINER_IFNAME = 'eth0'
+DRIVER_NAMESPACE = 'kuryr.binding.drivers'
+
+_IPDB_CACHE = None
+_IPROUTE_CACHE = None
+_IPROUTE_POOL_CACHE = None
+_NETLINK_LOCK = threading.Lock()
+_LINK_INDEX_CACHE = None
+_VETH_POOL_CACHE = None
+_NETNS_CACHE = None
+_JOURNAL_CACHE = None
+_JOURNAL_LOCK = threading.Lock()
+_DRIVER_REGISTRY = None
+_DRIVER_REGISTRY_LOCK = threading.Lock()
+_SUB_INTERFACE_DRIVER = subinterface.SubInterfaceDriver()
+# Serializes the operations on each port and coalesces the duplicates
+_SINGLE_FLIGHT = singleflight.SingleFlight()
+_SCHEDULER_CACHE = None
+_SCHEDULER_LOCK = threading.Lock()
+
+
+def get_ipdb():
+    """Returns the already cached or a newly created IPDB instance.
+
+    IPDB reads the Linux specific file when it's instantiated. This behaviour
+    prevents Mac OSX users from running unit tests. This function makes the
+    loading IPDB lazyily and therefore it can be mocked after the import of
+    modules that import this module.
+
+    :returns: The already cached or newly created ``pyroute2.IPDB`` instance
+    """
+    global _IPDB_CACHE
+    if not _IPDB_CACHE:
+        with _NETLINK_LOCK:
+            if not _IPDB_CACHE:
+                _IPDB_CACHE = pyroute2.IPDB()
+    return _IPDB_CACHE
+
+
+def get_iproute():
+    """Returns the already cached or a newly created IPRoute instance.
+
+    IPRoute reads the Linux specific file when it's instantiated. This
+    behaviour prevents Mac OSX users from running unit tests. This function
+    makes the loading IPDB lazyily and therefore it can be mocked after the
+    import of modules that import this module.
+
+    :returns: The already cached or newly created ``pyroute2.IPRoute`` instance
+    """
+    global _IPROUTE_CACHE
+    if not _IPROUTE_CACHE:
+        with _NETLINK_LOCK:
+            if not _IPROUTE_CACHE:
+                _IPROUTE_CACHE = pyroute2.IPRoute()
+    return _IPROUTE_CACHE
+
+
+def get_iproute_pool():
+    """Returns the pool of the netlink sockets of the concurrent binds.
+
+    :returns: the already cached or newly created
+              ``kuryr.lib.binding.iproute_pool.IPRoutePool`` instance, or
+              None if ``[binding] iproute_pool_size`` is 0
+    """
+    global _IPROUTE_POOL_CACHE
+    if cfg.CONF.binding.iproute_pool_size <= 0:
+        return None
+    if _IPROUTE_POOL_CACHE is None:
+        with _NETLINK_LOCK:
+            if _IPROUTE_POOL_CACHE is None:
+                _IPROUTE_POOL_CACHE = iproute_pool.IPRoutePool(
+                    cfg.CONF.binding.iproute_pool_size,
+                    cfg.CONF.binding.iproute_rcvbuf,
+                    cfg.CONF.binding.iproute_sndbuf)
+    return _IPROUTE_POOL_CACHE
+
+
+@contextlib.contextmanager
+def iproute_connection():
+    """Provides an IPRoute instance for the enclosed block.
+
+    The instance is checked out of the pool of netlink sockets when it is
+    enabled, so that no other thread uses it until the block exits.
+    Otherwise it is the instance shared by all the threads returned by
+    ``get_iproute``.
+    """
+    pool = get_iproute_pool()
+    if pool is None:
+        yield get_iproute()
+        return
+    with pool.connection() as ipr:
+        yield ipr
+
+
+def get_link_index():
+    """Returns the already started or a newly started link index.
+
+    The index follows the link notifications of the host from the moment it
+    is started, so it is created lazily only when ``[binding] link_index`` is
+    enabled.
+
+    :returns: the already cached or newly created
+              ``kuryr.lib.binding.link_index.LinkIndex`` instance
+    """
+    global _LINK_INDEX_CACHE
+    if not _LINK_INDEX_CACHE:
+        with _NETLINK_LOCK:
+            if not _LINK_INDEX_CACHE:
+                index = link_index.LinkIndex()
+                index.start()
+                _LINK_INDEX_CACHE = index
+    return _LINK_INDEX_CACHE
+
+
+def _get_link_index():
+    if cfg.CONF.binding.link_index:
+        return get_link_index()
+    return None
+
+
+def get_veth_pool():
+    """Returns the already started or a newly started veth pool.
+
+    :returns: the already cached or newly created
+              ``kuryr.lib.binding.veth_pool.VethPool`` instance, or None if
+              the pool is disabled
+    """
+    global _VETH_POOL_CACHE
+    if cfg.CONF.binding.veth_pool_size <= 0:
+        return None
+    if _VETH_POOL_CACHE is None:
+        # Taken before the lock, which it takes itself.
+        pool_link_index = _get_link_index()
+        with _NETLINK_LOCK:
+            if _VETH_POOL_CACHE is None:
+                # The refill thread gets a socket of its own, the one shared
+                # by the binds is not safe to use from two threads at once.
+                pool = veth_pool.VethPool(
+                    pyroute2.IPRoute(), cfg.CONF.binding.veth_pool_size,
+                    cfg.CONF.binding.veth_pool_low_watermark,
+                    link_index=pool_link_index)
+                pool.start()
+                _VETH_POOL_CACHE = pool
+    return _VETH_POOL_CACHE
+
+
+def get_netns_cache():
+    """Returns the cache of the handles of the container namespaces.
+
+    :returns: the already cached or newly created
+              ``kuryr.lib.binding.netns.NetnsCache`` instance
+    """
+    global _NETNS_CACHE
+    if _NETNS_CACHE is None:
+        with _NETLINK_LOCK:
+            if _NETNS_CACHE is None:
+                _NETNS_CACHE = netns_lib.NetnsCache(
+                    cfg.CONF.binding.netns_cache_size)
+    return _NETNS_CACHE
+
+
+def get_journal():
+    """Returns the journal of the ports bound on the host.
+
+    :returns: the already cached or newly opened
+              ``kuryr.lib.binding.journal.Journal`` instance, or None if
+              ``[binding] journal_path`` is not set
+    """
+    global _JOURNAL_CACHE
+    if not cfg.CONF.binding.journal_path:
+        return None
+    if _JOURNAL_CACHE is None:
+        with _JOURNAL_LOCK:
+            if _JOURNAL_CACHE is None:
+                _JOURNAL_CACHE = journal.Journal(
+                    cfg.CONF.binding.journal_path)
+    return _JOURNAL_CACHE
+
+
+def _journal_bind(endpoint_id, binding_plan, peer_name, netns=None,
+                  pending=False):
+    # The journal only speeds the recovery up, failing to write it must not
+    # fail the binding.
+    port_journal = get_journal()
+    if port_journal is None:
+        return
+    try:
+        port_journal.record_bind(
+            binding_plan.port_id, endpoint_id, binding_plan.ifname,
+            peer_name, binding_plan.vif_type,
+            netns_lib.get_netns_path(netns) if netns is not None else None,
+            binding_plan.raw_vif_details, pending,
+            binding_plan.link_kind)
+    except sqlite3.Error:
+        LOG.warning('Could not record the binding of the port %s in the '
+                    'journal.', binding_plan.port_id, exc_info=True)
+
+
+def _journal_pending(endpoint_id, binding_plan, netns=None,
+                     container_ifname=None):
+    # Recorded before the veth pair is created, so the reconciliation does
+    # not take the pair of a port being bound for a stray one.
+    if netns is not None:
+        peer_name = container_ifname or DEFAULT_CONTAINER_IFNAME
+    elif binding_plan.is_sub_interface:
+        peer_name = binding_plan.ifname
+    else:
+        peer_name = binding_plan.peer_name
+    _journal_bind(endpoint_id, binding_plan, peer_name, netns, pending=True)
+
+
+def _journal_unbind(port_id):
+    port_journal = get_journal()
+    if port_journal is None:
+        return
+    try:
+        port_journal.record_unbind(port_id)
+    except sqlite3.Error:
+        LOG.warning('Could not remove the port %s from the journal.',
+                    port_id, exc_info=True)
+
+
+def _get_unbind_plan(neutron_port):
+    """Returns the ``BindingPlan`` to unbind the port without its network.
+
+    The kind of the interface of the port may have been selected by its
+    network, it is read from the journal.
+    """
+    port_journal = get_journal()
+    entry = None
+    if port_journal is not None:
+        try:
+            entry = port_journal.get(neutron_port['id'])
+        except sqlite3.Error:
+            LOG.warning('Could not read the port %s from the journal.',
+                        neutron_port['id'], exc_info=True)
+    return plan.BindingPlan(
+        neutron_port, link_kind=entry.link_kind if entry else None)
+
+
+def _is_journaled(port_id):
+    port_journal = get_journal()
+    if port_journal is None:
+        return False
+    try:
+        return port_journal.get(port_id) is not None
+    except sqlite3.Error:
+        LOG.warning('Could not read the port %s from the journal.', port_id,
+                    exc_info=True)
+        return False
+
+
+def get_in_flight_port_ids():
+    """Returns the IDs of the ports being bound, ensured or unbound.
+
+    :returns: a set of the IDs of the Neutron ports
+    """
+    return _SINGLE_FLIGHT.keys()
+
+
+def get_scheduler():
+    """Returns the admission control of the binding operations.
+
+    :returns: the already cached or newly created
+              ``kuryr.lib.binding.scheduler.BindingScheduler`` instance, or
+              None if ``[binding] max_concurrent_bindings`` is 0
+    """
+    global _SCHEDULER_CACHE
+    if cfg.CONF.binding.max_concurrent_bindings <= 0:
+        return None
+    if _SCHEDULER_CACHE is None:
+        with _SCHEDULER_LOCK:
+            if _SCHEDULER_CACHE is None:
+                limits = {
+                    vif_type: int(limit) for vif_type, limit in
+                    cfg.CONF.binding.vif_type_concurrency.items()}
+                _SCHEDULER_CACHE = scheduler.BindingScheduler(
+                    cfg.CONF.binding.max_concurrent_bindings, limits,
+                    cfg.CONF.binding.binding_queue_size,
+                    cfg.CONF.binding.binding_queue_timeout or None)
+    return _SCHEDULER_CACHE
+
+
+def _run_admitted(vif_type, priority, func, *args):
+    binding_scheduler = get_scheduler()
+    if binding_scheduler is None:
+        return func(*args)
+    with binding_scheduler.admit(vif_type, priority):
+        return func(*args)
+
+
+def _is_up(interface):
+    flags = interface['flags']
+    if not flags:
+        return False
+    return (flags & IFF_UP) == 1
+
+
+def cleanup_veth(ifname, vif_type=None):
+    """Cleans the veth passed as an argument up.
+
+    :param ifname:   the name of the veth endpoint
+    :param vif_type: the vif_type of the port the metrics are tagged with
+    :returns: the index of the interface which name is the given ifname if it
+              exists, otherwise None
+    :raises: pyroute2.NetlinkError
+    """
+    with metrics.timed(metrics.CLEANUP, vif_type):
+        with iproute_connection() as ipr:
+            link_index = _get_link_index()
+            host_veth_index = iproute.lookup_link(ipr, ifname, link_index)
+            if host_veth_index is None:
+                return None
+            try:
+                iproute.delete_link(ipr, host_veth_index, link_index)
+            except pyroute2.NetlinkError as e:
+                if link_index is None or e.code != errno.ENODEV:
+                    raise
+                # The link index had not processed the deletion of the
+                # interface yet, it is looked up again with a dump.
+                host_veth_index = iproute.lookup_link(ipr, ifname)
+                if host_veth_index is None:
+                    return None
+                iproute.delete_link(ipr, host_veth_index, link_index)
+            return host_veth_index
+
+
+def cleanup_netns_link(netns, ifname, vif_type=None):
+    """Deletes an interface in a network namespace.
+
+    :param netns:    the path or the Docker name of the network namespace
+    :param ifname:   the name of the interface in the namespace
+    :param vif_type: the vif_type of the port the metrics are tagged with
+    :returns: the index of the deleted interface, or None if it or the
+              namespace does not exist any more
+    :raises: pyroute2.NetlinkError
+    """
+    cache = get_netns_cache()
+    with metrics.timed(metrics.CLEANUP, vif_type):
+        try:
+            handle = cache.checkout(netns)
+        except OSError:
+            # The interfaces of a namespace are gone with it.
+            return None
+        try:
+            index = iproute.lookup_link(handle.iproute, ifname)
+            if index is not None:
+                handle.iproute.link('del', index=index)
+            return index
+        except OSError:
+            return None
+        finally:
+            cache.checkin(handle)
+
+
+def _get_sub_interface_link(binding_plan):
+    """Returns where the sub-interface of the port was created.
+
+    The network namespace of a sub-interface is not known when unbinding,
+    it is read from the journal.
+
+    :param binding_plan: the ``BindingPlan`` of the port
+    :returns: the tuple of the network namespace and the name of the
+              sub-interface in it, or None if the port is not bound to a
+              sub-interface in a namespace according to the journal
+    """
+    if not binding_plan.is_sub_interface:
+        return None
+    port_journal = get_journal()
+    if port_journal is None:
+        return None
+    try:
+        entry = port_journal.get(binding_plan.port_id)
+    except sqlite3.Error:
+        LOG.warning('Could not read the port %s from the journal.',
+                    binding_plan.port_id, exc_info=True)
+        return None
+    if entry is None or entry.netns is None:
+        return None
+    return entry.netns, entry.peer_name
+
+
+def _cleanup_port_link(binding_plan):
+    """Deletes the veth pair or the sub-interface of the port.
+
+    :param binding_plan: the ``BindingPlan`` of the port
+    :returns: the index of the deleted interface or None if it did not exist
+    :raises: pyroute2.NetlinkError
+    """
+    sub_interface = _get_sub_interface_link(binding_plan)
+    if sub_interface is not None:
+        netns, ifname = sub_interface
+        return cleanup_netns_link(netns, ifname, binding_plan.vif_type)
+    return cleanup_veth(binding_plan.ifname, binding_plan.vif_type)
+
+
+def _get_ip_addresses(neutron_port, neutron_subnets):
+    """Returns the addresses to be set on the container side of the veth.
+
+    :param neutron_port:    a port dictionary returned from
+                            python-neutronclient
+    :param neutron_subnets: a list of all subnets under network to which this
+                            endpoint is trying to join
+    :returns: a tuple of tuples of the IP address and its prefix length. The
+              prefix length is None when it is embedded in the address
+    """
+    return plan.get_ip_addresses(
+        neutron_port, {subnet['id']: subnet for subnet in neutron_subnets})
+
+
+def _get_gateways(neutron_port, neutron_subnets):
+    """Returns the gateways of the subnets of the port, one per IP version."""
+    return plan.get_gateways(
+        neutron_port, {subnet['id']: subnet for subnet in neutron_subnets})
+
+
+_get_mtu = plan.get_mtu
+
+
+def _configure_veth_ipdb(ip, ifname, peer_name, ip_addresses, mtu,
+                         mac_address, vif_type=None):
+    """Creates and configures the veth pair with IPDB transactions.
+
+    The addresses are committed in the same transaction as the MTU, the MAC
+    address and the state of the container side, so their configuration is
+    measured as a part of the link configuration phase.
+    """
+    try:
+        with metrics.timed(metrics.VETH_CREATE, vif_type):
+            with ip.create(ifname=ifname, kind=KIND_VETH,
+                           reuse=True, peer=peer_name) as host_veth:
+                if not _is_up(host_veth):
+                    host_veth.up()
+        with metrics.timed(metrics.LINK_CONFIG, vif_type):
+            with ip.interfaces[peer_name] as peer_veth:
+                for address, prefixlen in ip_addresses:
+                    if prefixlen is None:
+                        peer_veth.add_ip(address)
+                    else:
+                        peer_veth.add_ip(address, prefixlen)
+                peer_veth.set_mtu(mtu)
+                peer_veth.address = mac_address
+                if not _is_up(peer_veth):
+                    peer_veth.up()
+    except pyroute2.CreateException:
+        raise exceptions.VethCreationFailure(
+            'Creating the veth pair was failed.')
+    except pyroute2.CommitException:
+        raise exceptions.VethCreationFailure(
+            'Could not configure the veth endpoint for the container.')
+    except KeyError:
+        raise exceptions.VethCreationFailure(
+            'The veth endpoint {0} is not in the host namespace.'.format(
+                peer_name))
+
+
+def _configure_veth(binding_plan, netns=None, container_ifname=None,
+                    indexes=None):
+    """Creates the veth pair for the Neutron port and configures its peer.
+
+    The netlink requests are issued with the library configured by the
+    ``[binding] netlink_backend`` option. With the ``iproute`` backend the
+    veth pair is taken from the warm pool when it is enabled. When a network
+    namespace is given, the peer is created and configured in it with
+    IPRoute regardless of the backend. The datapath profile of the port, if
+    any, is applied to both sides before returning.
+
+    :param binding_plan:     the ``BindingPlan`` of the port
+    :param netns:            the path or the Docker name of the network
+                             namespace to create the peer in, if any
+    :param container_ifname: the name of the peer in the namespace
+    :param indexes:          the tuple of the indexes of the host and
+                             container sides when the veth pair was already
+                             created in the host namespace with the
+                             ``iproute`` backend, e.g., by a batch
+    :returns: the tuple of the names of the veth pair
+    :raises: kuryr.common.exceptions.VethCreationFailure
+    """
+    profile = None
+    link_attributes = None
+    if binding_plan.datapath_profile:
+        profile = datapath.get_profile(binding_plan.datapath_profile)
+        link_attributes = profile.get_creation_attributes()
+
+    if binding_plan.is_sub_interface:
+        ifname, peer_name = _configure_sub_interface(binding_plan, netns,
+                                                     container_ifname,
+                                                     link_attributes)
+        if profile is not None:
+            _apply_datapath_profile(binding_plan, profile, None, peer_name,
+                                    netns)
+        return ifname, peer_name
+
+    ifname = binding_plan.ifname
+    peer_name = binding_plan.peer_name
+    vif_type = binding_plan.vif_type
+
+    if (link_attributes and netns is None and
+            cfg.CONF.binding.netlink_backend != IPROUTE_BACKEND):
+        # IPDB cannot create the veth pairs with their numbers of queues.
+        raise exceptions.VethCreationFailure(
+            'The queues of the datapath profile {0} cannot be set with the '
+            '{1} netlink backend.'.format(binding_plan.datapath_profile,
+                                          cfg.CONF.binding.netlink_backend))
+
+    if netns is not None:
+        peer_name = container_ifname or DEFAULT_CONTAINER_IFNAME
+        cache = get_netns_cache()
+        handle = _checkout_netns(cache, netns)
+        try:
+            with iproute_connection() as ipr:
+                iproute.configure_veth_in_netns(
+                    ipr, handle, ifname, peer_name,
+                    binding_plan.ip_addresses, binding_plan.mtu,
+                    binding_plan.mac_address, binding_plan.gateways,
+                    link_index=_get_link_index(), vif_type=vif_type,
+                    link_attributes=link_attributes)
+        except exceptions.VethCreationFailure:
+            with excutils.save_and_reraise_exception():
+                cache.invalidate(netns)
+        finally:
+            cache.checkin(handle)
+    elif cfg.CONF.binding.netlink_backend == IPROUTE_BACKEND:
+        link_index = _get_link_index()
+        # The queues of the pooled veth pairs are already set.
+        pool = None if link_attributes else get_veth_pool()
+        with iproute_connection() as ipr:
+            if (indexes is None and pool is not None and
+                    iproute.lookup_link(ipr, ifname, link_index) is None):
+                indexes = pool.acquire(ipr, ifname, peer_name)
+            iproute.configure_veth(ipr, ifname, peer_name,
+                                   binding_plan.ip_addresses,
+                                   binding_plan.mtu, binding_plan.mac_address,
+                                   link_index=link_index, indexes=indexes,
+                                   vif_type=vif_type,
+                                   link_attributes=link_attributes)
+    else:
+        _configure_veth_ipdb(get_ipdb(), ifname, peer_name,
+                             binding_plan.ip_addresses, binding_plan.mtu,
+                             binding_plan.mac_address, vif_type=vif_type)
+
+    if profile is not None:
+        _apply_datapath_profile(binding_plan, profile, ifname, peer_name,
+                                netns)
+    return ifname, peer_name
+
+
+def _checkout_netns(cache, netns):
+    """Checks the handle of the network namespace out of the cache.
+
+    :raises: kuryr.common.exceptions.VethCreationFailure
+    """
+    try:
+        return cache.checkout(netns)
+    except OSError as e:
+        raise exceptions.VethCreationFailure(
+            'Could not open the network namespace {0}: {1}'.format(netns, e))
+
+
+def _apply_datapath_profile(binding_plan, profile, ifname, peer_name,
+                            netns=None):
+    """Applies the datapath profile to both sides of the veth pair.
+
+    The netlink settings are applied with IPRoute and the offloads with
+    ethtool, run in the network namespace of the peer when it is in one.
+
+    :param binding_plan: the ``BindingPlan`` of the port
+    :param profile:      the ``kuryr.lib.binding.datapath.DatapathProfile``
+    :param ifname:       the name of the host side, None for a sub-interface
+    :param peer_name:    the name of the peer
+    :param netns:        the path or the Docker name of the network namespace
+                         of the peer, if any
+    :raises: kuryr.common.exceptions.VethCreationFailure
+    """
+    offload_args = profile.get_offload_args()
+    try:
+        with metrics.timed(metrics.LINK_CONFIG, binding_plan.vif_type):
+            with iproute_connection() as ipr:
+                link_index = _get_link_index()
+                links = []
+                if ifname is not None:
+                    links.append((ipr, ifname, iproute.lookup_link(
+                        ipr, ifname, link_index), None))
+                if netns is not None:
+                    with get_netns_cache().use(netns) as handle:
+                        links.append((handle.iproute, peer_name,
+                                      iproute.lookup_link(handle.iproute,
+                                                          peer_name),
+                                      handle.path))
+                        _apply_profile_to_links(links, profile, offload_args)
+                else:
+                    if peer_name != ifname:
+                        links.append((ipr, peer_name, iproute.lookup_link(
+                            ipr, peer_name, link_index), None))
+                    _apply_profile_to_links(links, profile, offload_args)
+    except (OSError, pyroute2.NetlinkError,
+            processutils.ProcessExecutionError) as e:
+        raise exceptions.VethCreationFailure(
+            'Could not apply the datapath profile {0}: {1}'.format(
+                profile.name, e))
+
+
+def _apply_profile_to_links(links, profile, offload_args):
+    """Applies the datapath profile to the links looked up for it.
+
+    :param links:        the list of the tuples of the IPRoute connection,
+                         the name, the index and the network namespace path
+                         of each link
+    :param profile:      the ``kuryr.lib.binding.datapath.DatapathProfile``
+    :param offload_args: the ethtool arguments of the offloads, if any
+    :raises: kuryr.common.exceptions.VethCreationFailure
+    """
+    for link_ipr, name, index, netns_path in links:
+        if index is None:
+            raise exceptions.VethCreationFailure(
+                'The interface {0} does not exist.'.format(name))
+        datapath.apply_profile(link_ipr, index, profile)
+        if offload_args:
+            _set_offloads(name, offload_args, netns_path)
+
+
+def _configure_sub_interface(binding_plan, netns=None, container_ifname=None,
+                             link_attributes=None):
+    """Creates the ipvlan or macvlan sub-interface for the Neutron port.
+
+    The sub-interface is created with IPRoute regardless of the
+    ``[binding] netlink_backend`` option. It is named after the host side of
+    the veth pair it replaces, or ``container_ifname`` in the network
+    namespace when one is given.
+
+    :param binding_plan:     the ``BindingPlan`` of the port
+    :param netns:            the path or the Docker name of the network
+                             namespace to create the sub-interface in, if any
+    :param container_ifname: the name of the sub-interface in the namespace
+    :param link_attributes:  the attributes the sub-interface is created with,
+                             e.g., its number of queues
+    :returns: the tuple of the name of the sub-interface in the host
+              namespace and of its name where it was created
+    :raises: kuryr.common.exceptions.VethCreationFailure
+    """
+    if not binding_plan.uplink:
+        raise exceptions.VethCreationFailure(
+            'No uplink interface is set for the {0} sub-interfaces.'.format(
+                binding_plan.link_kind))
+    if binding_plan.link_kind == plan.KIND_IPVLAN:
+        mode = cfg.CONF.binding.ipvlan_mode
+    else:
+        mode = cfg.CONF.binding.macvlan_mode
+    ifname = binding_plan.ifname
+    handle = None
+    if netns is not None:
+        ifname = container_ifname or DEFAULT_CONTAINER_IFNAME
+        cache = get_netns_cache()
+        handle = _checkout_netns(cache, netns)
+    try:
+        with iproute_connection() as ipr:
+            iproute.configure_sub_interface(
+                ipr, binding_plan.uplink, ifname, binding_plan.link_kind,
+                mode, binding_plan.ip_addresses, binding_plan.mtu,
+                binding_plan.mac_address, binding_plan.gateways,
+                netns_handle=handle, link_index=_get_link_index(),
+                vif_type=binding_plan.vif_type,
+                link_attributes=link_attributes)
+    except exceptions.VethCreationFailure:
+        with excutils.save_and_reraise_exception():
+            if netns is not None:
+                cache.invalidate(netns)
+    finally:
+        if handle is not None:
+            cache.checkin(handle)
+    return binding_plan.ifname, ifname
+
+
+def _ensure_veth(binding_plan, netns=None, container_ifname=None):
+    """Configures the existing veth pair of the Neutron port, if any.
+
+    Only what differs from the port is written, see
+    ``iproute.ensure_veth``.
+
+    :param binding_plan:     the ``BindingPlan`` of the port
+    :param netns:            the path or the Docker name of the network
+                             namespace the peer is in, if any
+    :param container_ifname: the name of the peer in the namespace
+    :returns: the tuple of the names of the veth pair and the index of the
+              master of the host side, or None if the pair does not exist.
+              A host side whose peer is in no namespace given is taken for
+              a pair whose peer was moved into the namespace of a container
+    :raises: kuryr.common.exceptions.VethCreationFailure
+    """
+    with iproute_connection() as ipr:
+        return _ensure_veth_links(ipr, binding_plan, netns, container_ifname)
+
+
+def _ensure_veth_links(ipr, binding_plan, netns, container_ifname):
+    if netns is None:
+        return _ensure_veth_peer(ipr, binding_plan, None, container_ifname)
+    cache = get_netns_cache()
+    try:
+        handle = cache.checkout(netns)
+    except OSError:
+        return None
+    try:
+        try:
+            peer_ipr = handle.iproute
+        except OSError:
+            return None
+        return _ensure_veth_peer(ipr, binding_plan, peer_ipr,
+                                 container_ifname)
+    finally:
+        cache.checkin(handle)
+
+
+def _ensure_veth_peer(ipr, binding_plan, netns_ipr, container_ifname):
+    ifname = binding_plan.ifname
+    link_index = _get_link_index()
+    if netns_ipr is not None:
+        peer_name = container_ifname or DEFAULT_CONTAINER_IFNAME
+        peer_ipr = netns_ipr
+        peer_index = iproute.lookup_link(peer_ipr, peer_name)
+    elif binding_plan.is_sub_interface:
+        peer_name = ifname
+        peer_ipr = ipr
+        peer_index = iproute.lookup_link(ipr, ifname, link_index)
+    else:
+        peer_name = binding_plan.peer_name
+        peer_ipr = ipr
+        peer_index = iproute.lookup_link(ipr, peer_name, link_index)
+
+    mac_address = binding_plan.mac_address
+    if binding_plan.is_sub_interface:
+        # The sub-interface stands for both sides of the veth pair.
+        ipr, host_index = peer_ipr, peer_index
+        if binding_plan.link_kind == plan.KIND_IPVLAN:
+            mac_address = None
+    else:
+        host_index = iproute.lookup_link(ipr, ifname, link_index)
+        if (host_index is not None and peer_index is None and
+                netns_ipr is None):
+            # The peer was moved into the namespace of the container, the
+            # port is bound and only its host side can be ensured.
+            peer_ipr = None
+    if host_index is None or (peer_index is None and peer_ipr is not None):
+        return None
+
+    master_index = iproute.ensure_veth(
+        ipr, host_index, peer_ipr, peer_index, binding_plan.ip_addresses,
+        binding_plan.mtu, mac_address, vif_type=binding_plan.vif_type)
+    return ifname, peer_name, master_index
+
+
+def _execute_driver_bind(driver, endpoint_id, binding_plan, cleanup=True):
+    """Binds with the driver and cleans the veth up on failure.
+
+    :param cleanup: whether the veth pair is deleted when the driver fails,
+                    which must only be done for a pair created by the same
+                    call
+    """
+    try:
+        with metrics.timed(driver.phase, binding_plan.vif_type):
+            return driver.bind_plan(endpoint_id, binding_plan)
+    except (exceptions.BindingFailure, processutils.ProcessExecutionError):
+        with excutils.save_and_reraise_exception():
+            if cleanup:
+                cleanup_veth(binding_plan.ifname, binding_plan.vif_type)
+
+
+def _execute_driver_unbind(driver, endpoint_id, binding_plan):
+    with metrics.timed(driver.phase, binding_plan.vif_type):
+        return driver.unbind_plan(endpoint_id, binding_plan)
+
+
+def _binding_not_supported(vif_type):
+    return exceptions.BindingNotSupportedFailure(
+        "vif_type({0}) is not supported. A binding driver or script for "
+        "this type can't be found.".format(vif_type))
+
+
+def _get_bind_args(endpoint_id, binding_plan):
+    """Returns the arguments passed to the executable for binding."""
+    return (BINDING_SUBCOMMAND, binding_plan.port_id, binding_plan.ifname,
+            endpoint_id, binding_plan.mac_address, binding_plan.network_id,
+            binding_plan.tenant_id, binding_plan.vif_details)
+
+
+def _get_unbind_args(endpoint_id, binding_plan):
+    """Returns the arguments passed to the executable for unbinding."""
+    return (UNBINDING_SUBCOMMAND, binding_plan.port_id, binding_plan.ifname,
+            endpoint_id, binding_plan.mac_address, binding_plan.vif_details)
+
+
+def _execute(*cmd):
+    """Runs the binding executable as root.
+
+    The executable is run by the privileged helper when
+    ``[binding] use_privsep`` is enabled, otherwise through the root helper.
+
+    :returns: the tuple of stdout and stderr of the executable
+    :raises: processutils.ProcessExecutionError
+    """
+    if not cfg.CONF.binding.use_privsep:
+        return processutils.execute(
+            *cmd, run_as_root=True,
+            root_helper=cfg.CONF.binding.root_helper or None)
+    return _check_privileged_result(cmd, privileged.execute_binding(*cmd))
+
+
+def _set_offloads(ifname, offload_args, netns_path=None):
+    """Sets the offloads of an interface with ethtool as root.
+
+    ethtool is run by the privileged helper dedicated to it when
+    ``[binding] use_privsep`` is enabled, otherwise through the root helper.
+
+    :param ifname:       the name of the interface
+    :param offload_args: the features and their states
+    :param netns_path:   the path of the network namespace file of the
+                         interface, if any
+    :returns: the tuple of stdout and stderr of ethtool
+    :raises: processutils.ProcessExecutionError
+    """
+    cmd = ('ethtool', '--offload', ifname) + offload_args
+    if netns_path is not None:
+        cmd = ('nsenter', '--net=' + netns_path) + cmd
+    if not cfg.CONF.binding.use_privsep:
+        return _execute(*cmd)
+    return _check_privileged_result(
+        cmd, privileged.set_offloads(ifname, offload_args, netns_path))
+
+
+def _check_privileged_result(cmd, result):
+    exit_code, stdout, stderr = result
+    if exit_code != 0:
+        raise processutils.ProcessExecutionError(
+            stdout=stdout, stderr=stderr, exit_code=exit_code,
+            cmd=' '.join(str(c) for c in cmd))
+    return stdout, stderr
+
+
+def _run_binding(exec_path, subcommand, endpoint_id, binding_plan):
+    """Has the binding executable bind or unbind the port.
+
+    The request is sent to the coprocess of the executable when
+    ``[binding] use_coprocess`` is enabled and the executable supports it,
+    otherwise the executable is run with the positional arguments.
+
+    :returns: the tuple of stdout and stderr of the executable
+    :raises: processutils.ProcessExecutionError
+    """
+    if cfg.CONF.binding.use_coprocess:
+        process = coprocess.get_coprocess(exec_path)
+        if process is not None:
+            return process.execute(subcommand, endpoint_id, binding_plan)
+    if subcommand == BINDING_SUBCOMMAND:
+        args = _get_bind_args(endpoint_id, binding_plan)
+    else:
+        args = _get_unbind_args(endpoint_id, binding_plan)
+    return _execute(exec_path, *args)
+
+
+def _get_plan(neutron_port, ifname):
+    binding_plan = plan.BindingPlan(neutron_port)
+    binding_plan.ifname = ifname
+    return binding_plan
+
+
+class ScriptDriver(drivers.BindingDriver):
+    """Binds the ports by running the vif_type executable in ``bindir``.
+
+    :param exec_path: the path of the binding executable
+    """
+
+    phase = metrics.SCRIPT
+
+    def __init__(self, exec_path):
+        self.exec_path = exec_path
+
+    def bind(self, endpoint_id, neutron_port, ifname):
+        return self.bind_plan(endpoint_id, _get_plan(neutron_port, ifname))
+
+    def unbind(self, endpoint_id, neutron_port, ifname):
+        return self.unbind_plan(endpoint_id, _get_plan(neutron_port, ifname))
+
+    def bind_plan(self, endpoint_id, binding_plan):
+        return _run_binding(self.exec_path, BINDING_SUBCOMMAND, endpoint_id,
+                            binding_plan)
+
+    def unbind_plan(self, endpoint_id, binding_plan):
+        return _run_binding(self.exec_path, UNBINDING_SUBCOMMAND,
+                            endpoint_id, binding_plan)
+
+
+def load_drivers():
+    """Loads the binding drivers of the supported vif_types.
+
+    The vif_types listed in ``[binding] native_drivers`` are bound by the
+    in-process driver registered for them in the ``kuryr.binding.drivers``
+    entry point namespace. Any other vif_type with an executable in
+    ``bindir`` is bound by running it. The drivers are meant to be loaded
+    once at startup, ``get_driver`` loads them on first use otherwise.
+
+    :returns: the dictionary mapping the supported vif_types to their
+              ``kuryr.lib.binding.drivers.BindingDriver``
+    """
+    global _DRIVER_REGISTRY
+    registry = {}
+    native_drivers = set(cfg.CONF.binding.native_drivers)
+    manager = extension.ExtensionManager(DRIVER_NAMESPACE)
+    for ext in manager:
+        if ext.name in native_drivers:
+            registry[ext.name] = ext.plugin()
+    for vif_type in native_drivers.difference(registry):
+        LOG.warning('There is no in-process binding driver for the vif_type '
+                    '%s.', vif_type)
+    bindir = cfg.CONF.bindir
+    if os.path.isdir(bindir):
+        for vif_type in os.listdir(bindir):
+            if vif_type not in registry:
+                registry[vif_type] = ScriptDriver(
+                    os.path.join(bindir, vif_type))
+    _DRIVER_REGISTRY = registry
+    return registry
+
+
+def get_driver(vif_type):
+    """Returns the binding driver of the vif_type.
+
+    :param vif_type: the vif_type of the port
+    :returns: the ``kuryr.lib.binding.drivers.BindingDriver`` of the vif_type
+              or None if it is not supported
+    """
+    if _DRIVER_REGISTRY is None:
+        with _DRIVER_REGISTRY_LOCK:
+            if _DRIVER_REGISTRY is None:
+                load_drivers()
+    return _DRIVER_REGISTRY.get(vif_type)
+
+
+def get_plan_driver(binding_plan):
+    """Returns the binding driver of the port of a plan.
+
+    :param binding_plan: the ``kuryr.lib.binding.plan.BindingPlan`` of the
+                         port
+    :returns: the driver of the ipvlan and macvlan sub-interfaces for the
+              ports given one, the driver of the vif_type of the port
+              otherwise, or None if it is not supported
+    """
+    if binding_plan.is_sub_interface:
+        return _SUB_INTERFACE_DRIVER
+    return get_driver(binding_plan.vif_type)
+
+
+def port_bind(endpoint_id, neutron_port, neutron_subnets,
+              neutron_network=None, netns=None, container_ifname=None,
+              binding_plan=None):
+    """Binds the Neutron port to the network interface on the host.
+
+    The operations on the same port are run one at a time in the order they
+    were requested. A bind requested while another bind of the port is
+    pending or running shares its result rather than binding it again. When
+    ``[binding] max_concurrent_bindings`` is set, the bind waits for a free
+    slot of the vif_type of the port.
+
+    The ports which link kind is ``ipvlan`` or ``macvlan`` get a
+    sub-interface of the uplink, named after the host side of the veth pair
+    it replaces, instead of a veth pair, and no vif_type driver is invoked.
+
+    :param endpoint_id:      the ID of the endpoint as string
+    :param neutron_port:     a port dictionary returned from
+                             python-neutronclient
+    :param neutron_subnets:  a list of all subnets under network to which
+                             this endpoint is trying to join
+    :param neutron_network:  network which this endpoint is trying to join
+    :param netns:            the path of the network namespace of the
+                             container, or its name in
+                             ``utils.DOCKER_NETNS_BASE``. When given, the
+                             peer of the veth pair is created directly in it
+                             under ``container_ifname`` and gets its
+                             addresses, default routes and state there
+    :param container_ifname: the name of the peer in ``netns``, ``eth0`` by
+                             default
+    :param binding_plan:     the ``kuryr.lib.binding.plan.BindingPlan`` of
+                             the port, if it was already built, e.g., for a
+                             retry. It is built from the port, subnets and
+                             network otherwise
+    :returns: the tuple of the names of the veth pair and the tuple of stdout
+              and stderr returned by processutils.execute invoked with the
+              executable script for binding. The port is recorded in the
+              journal when ``[binding] journal_path`` is set
+    :raises: kuryr.common.exceptions.BindingNotSupportedFailure,
+             kuryr.common.exceptions.VethCreationFailure,
+             kuryr.common.exceptions.BindingFailure,
+             kuryr.common.exceptions.BindingAdmissionFailure,
+             processutils.ProcessExecutionError
+    """
+    return _SINGLE_FLIGHT.do(
+        neutron_port['id'], BINDING_SUBCOMMAND, _run_admitted,
+        neutron_port.get(VIF_TYPE_KEY, FALLBACK_VIF_TYPE),
+        scheduler.BIND_PRIORITY, _port_bind, endpoint_id, neutron_port,
+        neutron_subnets, neutron_network, netns, container_ifname,
+        binding_plan)
+
+
+def _port_bind(endpoint_id, neutron_port, neutron_subnets, neutron_network,
+               netns, container_ifname, binding_plan):
+    if binding_plan is None:
+        binding_plan = plan.BindingPlan(neutron_port, neutron_subnets,
+                                        neutron_network)
+    driver = get_plan_driver(binding_plan)
+    if driver is None:
+        raise _binding_not_supported(binding_plan.vif_type)
+
+    # The existing record of the port is left as is, the port may still be
+    # in use if binding it again fails, e.g., when it is bound twice.
+    journaled = _is_journaled(binding_plan.port_id)
+    if not journaled:
+        _journal_pending(endpoint_id, binding_plan, netns, container_ifname)
+    try:
+        ifname, peer_name = _configure_veth(binding_plan, netns,
+                                            container_ifname)
+        stdout, stderr = _execute_driver_bind(driver, endpoint_id,
+                                              binding_plan)
+    except Exception:
+        with excutils.save_and_reraise_exception():
+            if not journaled:
+                _journal_unbind(binding_plan.port_id)
+    _journal_bind(endpoint_id, binding_plan, peer_name, netns)
+
+    return (ifname, peer_name, (stdout, stderr))
+
+
+def port_ensure(endpoint_id, neutron_port, neutron_subnets,
+                neutron_network=None, netns=None, container_ifname=None,
+                binding_plan=None):
+    """Binds the Neutron port unless it is already bound.
+
+    It is meant to be called again for the existing endpoints, e.g., when
+    the agent restarts. The live state of the veth pair is read and only
+    what differs from the port is applied, and the binding driver or script
+    is skipped if the driver reports the host side as already plugged. When
+    the peer was moved into the namespace of the container and ``netns`` is
+    not given, only the host side is ensured. The port is bound with
+    ``port_bind`` if the host side does not exist, its record in the journal
+    is left as is if that fails.
+
+    :param endpoint_id:      the ID of the endpoint as string
+    :param neutron_port:     a port dictionary returned from
+                             python-neutronclient
+    :param neutron_subnets:  a list of all subnets under network to which
+                             this endpoint is trying to join
+    :param neutron_network:  network which this endpoint is trying to join
+    :param netns:            the network namespace of the container, see
+                             ``port_bind``
+    :param container_ifname: the name of the peer in ``netns``
+    :param binding_plan:     the ``BindingPlan`` of the port, see
+                             ``port_bind``
+    :returns: the tuple of the names of the veth pair and the tuple of stdout
+              and stderr of the binding, both empty if it was skipped
+    :raises: kuryr.common.exceptions.BindingNotSupportedFailure,
+             kuryr.common.exceptions.VethCreationFailure,
+             kuryr.common.exceptions.BindingFailure,
+             processutils.ProcessExecutionError
+    """
+    return _SINGLE_FLIGHT.do(
+        neutron_port['id'], ENSURING_OPERATION, _run_admitted,
+        neutron_port.get(VIF_TYPE_KEY, FALLBACK_VIF_TYPE),
+        scheduler.BIND_PRIORITY, _port_ensure, endpoint_id, neutron_port,
+        neutron_subnets, neutron_network, netns, container_ifname,
+        binding_plan)
+
+
+def _port_ensure(endpoint_id, neutron_port, neutron_subnets, neutron_network,
+                 netns, container_ifname, binding_plan):
+    if binding_plan is None:
+        binding_plan = plan.BindingPlan(neutron_port, neutron_subnets,
+                                        neutron_network)
+    driver = get_plan_driver(binding_plan)
+    if driver is None:
+        raise _binding_not_supported(binding_plan.vif_type)
+
+    state = _ensure_veth(binding_plan, netns, container_ifname)
+    if state is None:
+        return _port_bind(endpoint_id, neutron_port, neutron_subnets,
+                          neutron_network, netns, container_ifname,
+                          binding_plan)
+
+    ifname, peer_name, master_index = state
+    if driver.is_plugged(neutron_port, ifname, master_index):
+        LOG.debug('The port %s is already bound.', binding_plan.port_id)
+        stdout, stderr = '', ''
+    else:
+        # The pair may be in use by a running container, a failed plug
+        # leaves it in place.
+        stdout, stderr = _execute_driver_bind(driver, endpoint_id,
+                                              binding_plan, cleanup=False)
+    _journal_bind(endpoint_id, binding_plan, peer_name, netns)
+
+    return (ifname, peer_name, (stdout, stderr))
+
+
+def port_bind_many(endpoints):
+    """Binds a batch of Neutron ports to network interfaces on the host.
+
+    All the veth pairs are created and configured in a single pass over the
+    shared netlink handle before any binding driver is invoked. The drivers
+    are then invoked grouped by vif_type.
+
+    The ports are serialized with the other operations on them like
+    ``port_bind`` does. The ports with no operation in flight are bound by
+    the batch, the others once the batch is done, each one like
+    ``port_bind`` does, and a port whose binding is already requested shares
+    its outcome.
+
+    A failure binding one port does not abort the others. The veth pair of a
+    port whose binding fails after its creation is cleaned up the same way
+    ``port_bind`` does.
+
+    :param endpoints: an iterable of tuples with the arguments ``port_bind``
+                      takes, i.e., ``(endpoint_id, neutron_port,
+                      neutron_subnets[, neutron_network[, netns[,
+                      container_ifname]]])``
+    :returns: a list with an element per endpoint in the given order. Each
+              element is either what ``port_bind`` would have returned for
+              the endpoint or the exception raised while binding it
+    """
+    results = []
+    claimed = []
+    deferred = []
+    shared = []
+    for index, endpoint in enumerate(endpoints):
+        endpoint = tuple(endpoint[:6]) + (None,) * (6 - len(endpoint))
+        results.append(None)
+        port_id = endpoint[1]['id']
+        flight, future = _SINGLE_FLIGHT.enter(port_id, BINDING_SUBCOMMAND)
+        if flight is None:
+            shared.append((index, future))
+        elif future is None:
+            claimed.append((index, port_id, flight, endpoint))
+        else:
+            deferred.append((index, port_id, flight, future, endpoint))
+
+    # The flights claimed by the batch never wait for other operations, so
+    # the batches binding the same ports cannot wait for each other.
+    try:
+        _port_bind_batch(claimed, results)
+    finally:
+        for index, port_id, flight, endpoint in claimed:
+            result = results[index]
+            if result is None:
+                result = exceptions.BindingFailure(
+                    'Binding the port {0} was aborted.'.format(port_id))
+                results[index] = result
+            if isinstance(result, Exception):
+                _SINGLE_FLIGHT.leave(port_id, flight, exception=result)
+            else:
+                _SINGLE_FLIGHT.leave(port_id, flight, result)
+
+    for index, port_id, flight, previous, endpoint in deferred:
+        vif_type = endpoint[1].get(VIF_TYPE_KEY, FALLBACK_VIF_TYPE)
+        try:
+            results[index] = _SINGLE_FLIGHT.run(
+                port_id, flight, previous, _run_admitted, vif_type,
+                scheduler.BIND_PRIORITY, _port_bind, *(endpoint + (None,)))
+        except Exception as e:
+            results[index] = e
+    for index, future in shared:
+        try:
+            results[index] = future.result()
+        except Exception as e:
+            results[index] = e
+
+    return results
+
+
+def _port_bind_batch(endpoints, results):
+    groups = collections.OrderedDict()
+    for index, port_id, flight, endpoint in endpoints:
+        (endpoint_id, neutron_port, neutron_subnets, neutron_network, netns,
+         container_ifname) = endpoint
+        try:
+            binding_plan = plan.BindingPlan(neutron_port, neutron_subnets,
+                                            neutron_network)
+            driver = get_plan_driver(binding_plan)
+        except Exception as e:
+            results[index] = e
+            continue
+        if driver is None:
+            results[index] = _binding_not_supported(binding_plan.vif_type)
+            continue
+        groups.setdefault(binding_plan.vif_type, []).append(
+            (index, endpoint_id, binding_plan, driver, netns,
+             container_ifname))
+
+    # The netlink pass over the ports of a vif_type is admitted as a single
+    # operation, the drivers are then admitted per port.
+    pending_binds = collections.OrderedDict()
+    for vif_type, group in groups.items():
+        try:
+            _run_admitted(vif_type, scheduler.BIND_PRIORITY,
+                          _configure_veth_batch, group, results,
+                          pending_binds)
+        except exceptions.BindingAdmissionFailure as e:
+            for bind in group:
+                results[bind[0]] = e
+
+    for driver, binds in pending_binds.items():
+        for index, endpoint_id, binding_plan, peer_name, netns in binds:
+            try:
+                stdout, stderr = _run_admitted(
+                    binding_plan.vif_type, scheduler.BIND_PRIORITY,
+                    _execute_driver_bind, driver, endpoint_id, binding_plan)
+            except Exception as e:
+                # The veth pair is already cleaned up by _execute_driver_bind
+                # when the driver fails.
+                if not isinstance(e, (exceptions.BindingFailure,
+                                      processutils.ProcessExecutionError)):
+                    _cleanup_batch_link(binding_plan)
+                _journal_unbind(binding_plan.port_id)
+                results[index] = e
+                continue
+            _journal_bind(endpoint_id, binding_plan, peer_name, netns)
+            results[index] = (binding_plan.ifname, peer_name,
+                              (stdout, stderr))
+
+
+def _configure_veth_batch(group, results, pending_binds):
+    for (index, endpoint_id, binding_plan, driver, netns,
+         container_ifname) in group:
+        _journal_pending(endpoint_id, binding_plan, netns, container_ifname)
+    created = _create_veth_batch(group)
+
+    for (index, endpoint_id, binding_plan, driver, netns,
+         container_ifname) in group:
+        try:
+            ifname, peer_name = _configure_veth(
+                binding_plan, netns, container_ifname,
+                indexes=created.get(binding_plan.ifname))
+        except exceptions.VethCreationFailure as e:
+            # The existing interfaces are never replaced, the ones created
+            # for the port are left as is like port_bind does.
+            _journal_unbind(binding_plan.port_id)
+            results[index] = e
+            continue
+        except Exception as e:
+            _cleanup_batch_link(binding_plan)
+            _journal_unbind(binding_plan.port_id)
+            results[index] = e
+            continue
+        pending_binds.setdefault(driver, []).append(
+            (index, endpoint_id, binding_plan, peer_name, netns))
+
+
+def _create_veth_batch(group):
+    """Creates the veth pairs of a batch of ports over one netlink socket.
+
+    Only the veth pairs created in the host namespace with the ``iproute``
+    backend and without a datapath profile are created here, preferably
+    taken from the warm pool. The others, and the pairs whose host side
+    already exists or which cannot be created, are left to
+    ``_configure_veth``.
+
+    :param group: the list of the binds of the batch
+    :returns: a dict of the tuples of the indexes of the host and container
+              sides of the veth pairs by the name of their host side
+    """
+    if cfg.CONF.binding.netlink_backend != IPROUTE_BACKEND:
+        return {}
+    pairs = [(binding_plan.ifname, binding_plan.peer_name)
+             for index, endpoint_id, binding_plan, driver, netns, _ in group
+             if (netns is None and not binding_plan.is_sub_interface and
+                 not binding_plan.datapath_profile)]
+    if not pairs:
+        return {}
+
+    link_index = _get_link_index()
+    pool = get_veth_pool()
+    created = {}
+    missing = []
+    try:
+        with iproute_connection() as ipr:
+            for ifname, peer_name in pairs:
+                if iproute.lookup_link(ipr, ifname, link_index) is not None:
+                    continue
+                indexes = None
+                if pool is not None:
+                    indexes = pool.acquire(ipr, ifname, peer_name)
+                if indexes is None:
+                    missing.append((ifname, peer_name))
+                else:
+                    created[ifname] = indexes
+            created.update(iproute.create_veths(ipr, missing, link_index))
+    except (OSError, pyroute2.NetlinkError):
+        LOG.warning('Could not create the veth pairs of the batch, they are '
+                    'created one by one.', exc_info=True)
+    return created
+
+
+def _cleanup_batch_link(binding_plan):
+    """Deletes the link of a port whose binding by a batch failed."""
+    try:
+        _cleanup_port_link(binding_plan)
+    except Exception:
+        LOG.warning('Could not clean the interface of the port %s up.',
+                    binding_plan.port_id, exc_info=True)
+
+
+def port_unbind(endpoint_id, neutron_port, binding_plan=None):
+    """Unbinds the Neutron port from the network interface on the host.
+
+    :param endpoint_id: the ID of the Docker container as string
+    :param neutron_port: a port dictionary returned from python-neutronclient
+    :param binding_plan: the ``BindingPlan`` of the port, e.g., kept from its
+                         binding. It is built from the port and the kind of
+                         interface recorded in the journal otherwise
+    :returns: the tuple of stdout and stderr returned by processutils.execute
+              invoked with the executable script for unbinding
+    :raises: kuryr.common.exceptions.BindingNotSupportedFailure,
+             processutils.ProcessExecutionError, pyroute2.NetlinkError
+    """
+    return _SINGLE_FLIGHT.do(
+        neutron_port['id'], UNBINDING_SUBCOMMAND, _run_admitted,
+        neutron_port.get(VIF_TYPE_KEY, FALLBACK_VIF_TYPE),
+        scheduler.UNBIND_PRIORITY, _port_unbind, endpoint_id, neutron_port,
+        binding_plan)
+
+
+def port_unbind_many(endpoints, timeout=None):
+    """Unbinds a batch of Neutron ports, e.g., to drain the host.
+
+    The ports are unbound by ``[binding] unbind_workers`` threads, each one
+    like ``port_unbind`` does, i.e., serialized with the other operations
+    on the same port and admitted by the scheduler.
+
+    A failure unbinding one port does not abort the others. The ports whose
+    unbinding is not done when the timeout expires are reported as failed
+    with ``BindingTimeoutFailure``. Their unbinding keeps running in the
+    background.
+
+    :param endpoints: an iterable of tuples with the arguments
+                      ``port_unbind`` takes, i.e., ``(endpoint_id,
+                      neutron_port[, binding_plan])``
+    :param timeout:   the seconds the whole batch may take, unbounded if None
+    :returns: a list with an element per endpoint in the given order. Each
+              element is either what ``port_unbind`` would have returned for
+              the endpoint or the exception raised while unbinding it
+    """
+    endpoints = [tuple(endpoint) for endpoint in endpoints]
+    results = [None] * len(endpoints)
+    if not endpoints:
+        return results
+
+    executor = futures.ThreadPoolExecutor(
+        max_workers=min(cfg.CONF.binding.unbind_workers, len(endpoints)))
+    try:
+        unbinds = {executor.submit(port_unbind, *endpoint): index
+                   for index, endpoint in enumerate(endpoints)}
+        done, not_done = futures.wait(unbinds, timeout=timeout)
+    finally:
+        executor.shutdown(wait=False)
+
+    for future in not_done:
+        future.cancel()
+        index = unbinds[future]
+        results[index] = exceptions.BindingTimeoutFailure(
+            'Unbinding the port {0} did not finish in time.'.format(
+                endpoints[index][1]['id']))
+    for future in done:
+        index = unbinds[future]
+        try:
+            results[index] = future.result()
+        except Exception as e:
+            results[index] = e
+    return results
+
+
+def _port_unbind(endpoint_id, neutron_port, binding_plan):
+    if binding_plan is None:
+        binding_plan = _get_unbind_plan(neutron_port)
+    driver = get_plan_driver(binding_plan)
+    if driver is None:
+        raise _binding_not_supported(binding_plan.vif_type)
+
+    stdout, stderr = _execute_driver_unbind(driver, endpoint_id, binding_plan)
+    try:
+        _cleanup_port_link(binding_plan)
+    except pyroute2.NetlinkError:
+        raise exceptions.VethDeletionFailure(
+            'Deleting the veth pair failed.')
+    _journal_unbind(binding_plan.port_id)
+    return (stdout, stderr)
@@ -0,0 +1,228 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Coroutine versions of the port binding API for asyncio front-ends.
+
+The binding executables are run with ``asyncio.create_subprocess_exec``, so
+waiting for them does not hold a thread. The netlink requests, which do not
+block for long, are issued from the default executor of the event loop
+because pyroute2 has no asyncio API.
+
+This module requires Python 3.5 or later.
+"""
+
+import asyncio
+
+from oslo_concurrency import processutils
+from oslo_config import cfg
+import pyroute2
+
+from kuryr.lib import binding
+from kuryr.lib.binding import coprocess
+from kuryr.lib.binding import plan
+from kuryr.lib.binding import scheduler
+from kuryr.lib import exceptions
+from kuryr.lib import metrics
+from kuryr.lib import utils
+
+
+async def _execute(*cmd):
+    """Runs the command as root like ``binding._execute`` does.
+
+    The command is run directly by root, otherwise through the
+    ``[binding] root_helper``. When ``[binding] use_privsep`` is enabled,
+    the command is sent to the privileged helper from the default executor.
+
+    :returns: the tuple of the decoded stdout and stderr of the command
+    :raises: processutils.ProcessExecutionError
+    """
+    if cfg.CONF.binding.use_privsep:
+        return await _run_in_executor(binding._execute, *cmd)
+    cmd = utils.get_root_command(*cmd)
+    process = await asyncio.create_subprocess_exec(
+        *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+    stdout, stderr = await process.communicate()
+    stdout = stdout.decode('utf-8')
+    stderr = stderr.decode('utf-8')
+    if process.returncode != 0:
+        raise processutils.ProcessExecutionError(
+            stdout=stdout, stderr=stderr, exit_code=process.returncode,
+            cmd=' '.join(cmd))
+    return stdout, stderr
+
+
+async def _run_binding(exec_path, subcommand, endpoint_id, binding_plan):
+    """Coroutine version of ``binding._run_binding``."""
+    if cfg.CONF.binding.use_coprocess:
+        process = await _run_in_executor(coprocess.get_coprocess, exec_path)
+        if process is not None:
+            return await _run_in_executor(process.execute, subcommand,
+                                          endpoint_id, binding_plan)
+    if subcommand == binding.BINDING_SUBCOMMAND:
+        args = binding._get_bind_args(endpoint_id, binding_plan)
+    else:
+        args = binding._get_unbind_args(endpoint_id, binding_plan)
+    return await _execute(exec_path, *args)
+
+
+async def _run_in_executor(func, *args):
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(None, func, *args)
+
+
+async def _single_flight(key, operation, func, *args):
+    """Coroutine version of ``SingleFlight.do``.
+
+    The flights are the ones of the synchronous API, so an operation on a
+    port is serialized with the ones requested through either API.
+    """
+    flight, future = binding._SINGLE_FLIGHT.enter(key, operation)
+    if flight is None:
+        return await asyncio.wrap_future(future)
+    try:
+        if future is not None:
+            await asyncio.wait([asyncio.wrap_future(future)])
+        result = await func(*args)
+    except BaseException as e:
+        # The flight is left when the coroutine is cancelled too, the next
+        # operations on the port would wait for it forever otherwise.
+        binding._SINGLE_FLIGHT.leave(key, flight, exception=e)
+        raise
+    binding._SINGLE_FLIGHT.leave(key, flight, result)
+    return result
+
+
+async def _run_admitted(vif_type, priority, func, *args):
+    """Coroutine version of ``binding._run_admitted``.
+
+    The slot is waited for on the event loop and shared with the
+    synchronous API, so the coroutines are queued fairly with the threads.
+    """
+    binding_scheduler = binding.get_scheduler()
+    if binding_scheduler is None:
+        return await func(*args)
+    with metrics.timed(metrics.QUEUE_WAIT, vif_type):
+        admission = binding_scheduler.request(vif_type, priority)
+        try:
+            await asyncio.wait_for(
+                asyncio.shield(asyncio.wrap_future(admission)),
+                binding_scheduler.timeout)
+        except asyncio.TimeoutError:
+            binding_scheduler.cancel(vif_type, admission)
+            raise exceptions.BindingAdmissionFailure(
+                'No binding slot for the vif_type {0} was free within {1} '
+                'seconds.'.format(vif_type, binding_scheduler.timeout))
+        except BaseException:
+            binding_scheduler.cancel(vif_type, admission)
+            raise
+    try:
+        return await func(*args)
+    finally:
+        binding_scheduler.release(vif_type)
+
+
+async def port_bind(endpoint_id, neutron_port, neutron_subnets,
+                    neutron_network=None, netns=None, container_ifname=None,
+                    binding_plan=None):
+    """Binds the Neutron port to the network interface on the host.
+
+    This is the coroutine version of ``kuryr.lib.binding.port_bind`` and
+    takes the same arguments, returns the same value and raises the same
+    exceptions.
+    """
+    return await _single_flight(
+        neutron_port['id'], binding.BINDING_SUBCOMMAND, _run_admitted,
+        neutron_port.get(binding.VIF_TYPE_KEY, binding.FALLBACK_VIF_TYPE),
+        scheduler.BIND_PRIORITY, _port_bind, endpoint_id, neutron_port,
+        neutron_subnets, neutron_network, netns, container_ifname,
+        binding_plan)
+
+
+async def _port_bind(endpoint_id, neutron_port, neutron_subnets,
+                     neutron_network, netns, container_ifname, binding_plan):
+    if binding_plan is None:
+        binding_plan = plan.BindingPlan(neutron_port, neutron_subnets,
+                                        neutron_network)
+    vif_type = binding_plan.vif_type
+    driver = binding.get_plan_driver(binding_plan)
+    if driver is None:
+        raise binding._binding_not_supported(vif_type)
+
+    await _run_in_executor(binding._journal_pending, endpoint_id,
+                           binding_plan, netns, container_ifname)
+    try:
+        ifname, peer_name = await _run_in_executor(
+            binding._configure_veth, binding_plan, netns, container_ifname)
+
+        if not isinstance(driver, binding.ScriptDriver):
+            stdout, stderr = await _run_in_executor(
+                binding._execute_driver_bind, driver, endpoint_id,
+                binding_plan)
+        else:
+            try:
+                with metrics.timed(driver.phase, vif_type):
+                    stdout, stderr = await _run_binding(
+                        driver.exec_path, binding.BINDING_SUBCOMMAND,
+                        endpoint_id, binding_plan)
+            except processutils.ProcessExecutionError:
+                await _run_in_executor(binding.cleanup_veth, ifname,
+                                       vif_type)
+                raise
+    except Exception:
+        await _run_in_executor(binding._journal_unbind,
+                               binding_plan.port_id)
+        raise
+    await _run_in_executor(binding._journal_bind, endpoint_id, binding_plan,
+                           peer_name, netns)
+
+    return (ifname, peer_name, (stdout, stderr))
+
+
+async def port_unbind(endpoint_id, neutron_port, binding_plan=None):
+    """Unbinds the Neutron port from the network interface on the host.
+
+    This is the coroutine version of ``kuryr.lib.binding.port_unbind`` and
+    takes the same arguments, returns the same value and raises the same
+    exceptions.
+    """
+    return await _single_flight(
+        neutron_port['id'], binding.UNBINDING_SUBCOMMAND, _run_admitted,
+        neutron_port.get(binding.VIF_TYPE_KEY, binding.FALLBACK_VIF_TYPE),
+        scheduler.UNBIND_PRIORITY, _port_unbind, endpoint_id, neutron_port,
+        binding_plan)
+
+
+async def _port_unbind(endpoint_id, neutron_port, binding_plan):
+    if binding_plan is None:
+        binding_plan = await _run_in_executor(binding._get_unbind_plan,
+                                              neutron_port)
+    vif_type = binding_plan.vif_type
+    driver = binding.get_plan_driver(binding_plan)
+    if driver is None:
+        raise binding._binding_not_supported(vif_type)
+
+    if not isinstance(driver, binding.ScriptDriver):
+        stdout, stderr = await _run_in_executor(
+            binding._execute_driver_unbind, driver, endpoint_id,
+            binding_plan)
+    else:
+        with metrics.timed(driver.phase, vif_type):
+            stdout, stderr = await _run_binding(
+                driver.exec_path, binding.UNBINDING_SUBCOMMAND,
+                endpoint_id, binding_plan)
+    try:
+        await _run_in_executor(binding._cleanup_port_link, binding_plan)
+    except pyroute2.NetlinkError:
+        raise exceptions.VethDeletionFailure(
+            'Deleting the veth pair failed.')
+    await _run_in_executor(binding._journal_unbind, binding_plan.port_id)
+    return (stdout, stderr)
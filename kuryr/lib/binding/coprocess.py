@@ -0,0 +1,314 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Long-lived binding executables speaking line-delimited JSON.
+
+A binding executable opts into the coprocess protocol by supporting the
+``coprocess`` subcommand. Started with it, the executable first writes a
+hello line with the version of the protocol it speaks::
+
+    {"version": 1}
+
+and then reads one request per line from its stdin and writes one response
+per line to its stdout::
+
+    {"id": 1, "command": "bind", "port_id": "...", "ifname": "...",
+     "endpoint_id": "...", "mac_address": "...", "network_id": "...",
+     "tenant_id": "...", "vif_details": {...}}
+    {"id": 1, "exit_code": 0, "stdout": "...", "stderr": "..."}
+
+The unbind requests have the ``unbind`` command and no ``network_id`` and
+``tenant_id``. The ``vif_details`` are passed as a JSON object rather than
+flattened. Several requests may be sent before the first one is answered,
+and the responses are matched to them by ID, so an executable may handle
+them concurrently and answer them in any order. An executable that exits or
+does not answer with a supported hello is run once per request with the
+positional arguments as before.
+
+The executables are started directly when the process runs as root and
+through ``[binding] root_helper`` otherwise. They are not started as
+coprocesses when ``[binding] use_privsep`` is enabled, the privileged helper
+runs them once per request instead.
+"""
+
+import json
+import select
+import subprocess
+import threading
+import time
+
+from oslo_concurrency import processutils
+from oslo_config import cfg
+from oslo_log import log
+
+from kuryr.lib import utils
+
+LOG = log.getLogger(__name__)
+
+COPROCESS_SUBCOMMAND = 'coprocess'
+SUPPORTED_VERSIONS = (1,)
+HELLO_TIMEOUT = 5
+STOP_TIMEOUT = 5
+STOP_POLL_INTERVAL = 0.1
+BINDING_SUBCOMMAND = 'bind'
+
+_COPROCESSES = {}
+_UNSUPPORTED = set()
+# The events set once the executables being started answered their hello.
+_STARTING = {}
+_COPROCESSES_LOCK = threading.Lock()
+
+
+def get_request(command, endpoint_id, binding_plan):
+    """Returns the request of the protocol for a bind or an unbind.
+
+    :param command:      ``bind`` or ``unbind``
+    :param endpoint_id:  the ID of the endpoint as string
+    :param binding_plan: the ``kuryr.lib.binding.plan.BindingPlan`` of the
+                         port
+    :returns: the request as a dictionary, without its ID
+    """
+    request = {'command': command,
+               'port_id': binding_plan.port_id,
+               'ifname': binding_plan.ifname,
+               'endpoint_id': endpoint_id,
+               'mac_address': binding_plan.mac_address,
+               'vif_details': binding_plan.raw_vif_details or {}}
+    if command == BINDING_SUBCOMMAND:
+        request['network_id'] = binding_plan.network_id
+        request['tenant_id'] = binding_plan.tenant_id
+    return request
+
+
+class Coprocess(object):
+    """A binding executable started once and fed requests over its stdin.
+
+    The requests of concurrent callers are in flight at once, a reader
+    thread hands each response to the caller waiting for it.
+
+    :param exec_path: the path of the binding executable
+    :param timeout:   seconds to wait for the response to a request
+    """
+
+    def __init__(self, exec_path, timeout):
+        self._exec_path = exec_path
+        self._timeout = timeout
+        self._process = None
+        self._next_id = 1
+        # The events and responses of the requests in flight by ID.
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._stop_lock = threading.Lock()
+        self.version = None
+
+    def start(self):
+        """Starts the executable and reads its hello.
+
+        :returns: whether the executable speaks a supported version of the
+                  protocol
+        """
+        self._process = subprocess.Popen(
+            utils.get_root_command(self._exec_path, COPROCESS_SUBCOMMAND),
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            universal_newlines=True)
+        try:
+            hello = self._read_line(HELLO_TIMEOUT)
+            version = json.loads(hello)['version']
+        except (EnvironmentError, ValueError, KeyError, TypeError):
+            self.stop()
+            return False
+        if version not in SUPPORTED_VERSIONS:
+            LOG.warning('%(path)s speaks the unsupported version %(version)s '
+                        'of the coprocess protocol.',
+                        {'path': self._exec_path, 'version': version})
+            self.stop()
+            return False
+        self.version = version
+        reader = threading.Thread(target=self._read_responses,
+                                  args=(self._process,),
+                                  name='kuryr-coprocess-reader')
+        reader.daemon = True
+        reader.start()
+        return True
+
+    def stop(self):
+        """Stops the executable.
+
+        The executable is terminated, which the root helper forwards to it
+        unlike a kill, and killed if it did not exit within
+        ``STOP_TIMEOUT`` seconds. The requests in flight fail.
+        """
+        with self._stop_lock:
+            process = self._process
+            if process is None:
+                return
+            try:
+                process.stdin.close()
+            except EnvironmentError:
+                pass
+            if process.poll() is None:
+                process.terminate()
+                deadline = time.time() + STOP_TIMEOUT
+                while process.poll() is None and time.time() < deadline:
+                    time.sleep(STOP_POLL_INTERVAL)
+                if process.poll() is None:
+                    LOG.warning('%s did not exit when terminated, killing '
+                                'it.', self._exec_path)
+                    process.kill()
+            process.wait()
+            self._process = None
+
+    def is_running(self):
+        return self._process is not None and self._process.poll() is None
+
+    def _read_line(self, timeout):
+        readable, _, _ = select.select([self._process.stdout], [], [],
+                                       timeout)
+        if not readable:
+            raise EnvironmentError(
+                'No answer from {0} within {1} seconds.'.format(
+                    self._exec_path, timeout))
+        line = self._process.stdout.readline()
+        if not line:
+            raise EnvironmentError(
+                '{0} exited.'.format(self._exec_path))
+        return line
+
+    def _read_responses(self, process):
+        try:
+            for line in iter(process.stdout.readline, ''):
+                try:
+                    response = json.loads(line)
+                    with self._lock:
+                        waiter = self._pending.pop(response['id'])
+                except (ValueError, KeyError, TypeError):
+                    LOG.warning('Ignoring the unexpected response %(line)r '
+                                'of %(path)s.',
+                                {'line': line, 'path': self._exec_path})
+                    continue
+                waiter[1] = response
+                waiter[0].set()
+        except (EnvironmentError, ValueError):
+            pass
+        finally:
+            # The executable exited, the requests in flight are not answered.
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            for waiter in pending.values():
+                waiter[0].set()
+
+    def execute(self, command, endpoint_id, binding_plan):
+        """Sends a bind or unbind request and waits for its response.
+
+        The executable is stopped if it does not answer properly and is
+        started again by ``get_coprocess`` for the next request.
+
+        :param command:      ``bind`` or ``unbind``
+        :param endpoint_id:  the ID of the endpoint as string
+        :param binding_plan: the ``kuryr.lib.binding.plan.BindingPlan`` of
+                             the port
+        :returns: the tuple of stdout and stderr of the request
+        :raises: processutils.ProcessExecutionError
+        """
+        request = get_request(command, endpoint_id, binding_plan)
+        cmd = ' '.join([self._exec_path, command, binding_plan.port_id])
+        waiter = [threading.Event(), None]
+        error = None
+        with self._lock:
+            request['id'] = self._next_id
+            self._next_id += 1
+            self._pending[request['id']] = waiter
+            try:
+                self._process.stdin.write(json.dumps(request) + '\n')
+                self._process.stdin.flush()
+            except (EnvironmentError, ValueError, AttributeError) as e:
+                del self._pending[request['id']]
+                error = e
+        if error is None and not waiter[0].wait(self._timeout):
+            error = 'No answer from {0} within {1} seconds.'.format(
+                self._exec_path, self._timeout)
+        elif error is None and waiter[1] is None:
+            error = '{0} exited.'.format(self._exec_path)
+        if error is not None:
+            self.stop()
+            raise processutils.ProcessExecutionError(
+                description='The coprocess failed: {0}'.format(error),
+                cmd=cmd)
+        response = waiter[1]
+        stdout = response.get('stdout', '')
+        stderr = response.get('stderr', '')
+        exit_code = response.get('exit_code', 0)
+        if exit_code != 0:
+            raise processutils.ProcessExecutionError(
+                stdout=stdout, stderr=stderr, exit_code=exit_code, cmd=cmd)
+        return stdout, stderr
+
+
+def get_coprocess(exec_path):
+    """Returns the running coprocess of the binding executable, if any.
+
+    The executable is started the first time and again after it stopped.
+    Executables that do not speak the protocol are remembered and never
+    started as coprocesses again. The hello of an executable being started
+    is awaited without blocking the lookups of the other executables.
+
+    :param exec_path: the path of the binding executable
+    :returns: the running ``Coprocess`` or None if the executable only
+              supports the positional arguments or ``[binding]
+              use_privsep`` is enabled
+    """
+    if cfg.CONF.binding.use_privsep:
+        return None
+    while True:
+        with _COPROCESSES_LOCK:
+            if exec_path in _UNSUPPORTED:
+                return None
+            coprocess = _COPROCESSES.get(exec_path)
+            if coprocess is not None and coprocess.is_running():
+                return coprocess
+            starting = _STARTING.get(exec_path)
+            if starting is None:
+                starting = _STARTING[exec_path] = threading.Event()
+                break
+        # Another thread is starting the executable.
+        starting.wait()
+
+    coprocess = Coprocess(exec_path, cfg.CONF.binding.coprocess_timeout)
+    started = None
+    try:
+        started = coprocess.start()
+    finally:
+        with _COPROCESSES_LOCK:
+            del _STARTING[exec_path]
+            if started:
+                _COPROCESSES[exec_path] = coprocess
+            else:
+                _COPROCESSES.pop(exec_path, None)
+                # The executable is started again if it could not be run.
+                if started is not None:
+                    _UNSUPPORTED.add(exec_path)
+        starting.set()
+    if not started:
+        LOG.info('%s does not support the coprocess protocol, running it '
+                 'once per request.', exec_path)
+        return None
+    return coprocess
+
+
+def stop_all():
+    """Stops all the coprocesses and forgets the unsupported executables."""
+    with _COPROCESSES_LOCK:
+        coprocesses = list(_COPROCESSES.values())
+        _COPROCESSES.clear()
+        _UNSUPPORTED.clear()
+    for coprocess in coprocesses:
+        coprocess.stop()
@@ -0,0 +1,153 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Datapath profiles tuning the interfaces created by the binds.
+
+The veth pairs are created with the defaults of the kernel, and the
+high-throughput containers otherwise need their transmit queue length,
+queues, offloads and queueing discipline tuned by hand once they are up. A
+profile names a set of these settings in a ``[datapath_profile:<name>]``
+section of the configuration, and the bind creating the interfaces applies
+it to both ends of the veth pair before the container gets them.
+
+The profiles that can be used are listed by the ``[binding] datapath_profile``
+and ``datapath_profiles`` options and read once.
+"""
+
+import threading
+
+from oslo_config import cfg
+
+from kuryr.lib import config
+from kuryr.lib import exceptions
+
+_PROFILES = None
+_PROFILES_LOCK = threading.Lock()
+
+
+class DatapathProfile(object):
+    """The datapath settings of a profile, None for the ones left as is.
+
+    :param name:          the name of the profile
+    :param txqueuelen:    the length of the transmit queue
+    :param gso:           whether the generic segmentation offload is on
+    :param gro:           whether the generic receive offload is on
+    :param tso:           whether the TCP segmentation offload is on
+    :param num_tx_queues: the number of transmit queues
+    :param num_rx_queues: the number of receive queues
+    :param qdisc:         the kind of the root queueing discipline
+    """
+
+    __slots__ = ('name', 'txqueuelen', 'gso', 'gro', 'tso', 'num_tx_queues',
+                 'num_rx_queues', 'qdisc')
+
+    def __init__(self, name, txqueuelen=None, gso=None, gro=None, tso=None,
+                 num_tx_queues=None, num_rx_queues=None, qdisc=None):
+        self.name = name
+        self.txqueuelen = txqueuelen
+        self.gso = gso
+        self.gro = gro
+        self.tso = tso
+        self.num_tx_queues = num_tx_queues
+        self.num_rx_queues = num_rx_queues
+        self.qdisc = qdisc
+
+    def get_creation_attributes(self):
+        """Returns the link attributes only settable by creating the link.
+
+        :returns: a dictionary of the keyword arguments of the pyroute2
+                  ``link('add', ...)`` request, empty if the profile sets
+                  none of them
+        """
+        attributes = {}
+        if self.num_tx_queues is not None:
+            attributes['num_tx_queues'] = self.num_tx_queues
+        if self.num_rx_queues is not None:
+            attributes['num_rx_queues'] = self.num_rx_queues
+        return attributes
+
+    def get_offload_args(self):
+        """Returns the ``ethtool --offload`` arguments of the profile.
+
+        :returns: a tuple of the features and their states, empty if the
+                  profile sets none of them
+        """
+        args = ()
+        for feature in ('gso', 'gro', 'tso'):
+            state = getattr(self, feature)
+            if state is not None:
+                args += (feature, 'on' if state else 'off')
+        return args
+
+    def __repr__(self):
+        return '<DatapathProfile {0}>'.format(self.name)
+
+
+def _read_profile(name):
+    group = config.register_datapath_profile_opts(cfg.CONF, name)
+    return DatapathProfile(name, group.txqueuelen, group.gso, group.gro,
+                           group.tso, group.num_tx_queues,
+                           group.num_rx_queues, group.qdisc)
+
+
+def load_profiles():
+    """Registers the options of the configured datapath profiles, reads them.
+
+    The profiles are meant to be loaded once at startup, so an invalid
+    value fails there, ``get_profile`` loads them on first use otherwise.
+
+    :returns: the dictionary mapping the names of the profiles to their
+              ``DatapathProfile``
+    :raises: oslo_config.cfg.ConfigFileValueError
+    """
+    global _PROFILES
+    names = set(cfg.CONF.binding.datapath_profiles)
+    if cfg.CONF.binding.datapath_profile:
+        names.add(cfg.CONF.binding.datapath_profile)
+    _PROFILES = {name: _read_profile(name) for name in names}
+    return _PROFILES
+
+
+def get_profile(name):
+    """Returns the datapath profile configured under the name.
+
+    :param name: the name of the profile
+    :returns: the ``DatapathProfile`` read from the
+              ``[datapath_profile:<name>]`` section
+    :raises: kuryr.lib.exceptions.VethCreationFailure if the profile is not
+             listed by the ``[binding] datapath_profile`` or
+             ``datapath_profiles`` options
+    """
+    if _PROFILES is None:
+        with _PROFILES_LOCK:
+            if _PROFILES is None:
+                load_profiles()
+    try:
+        return _PROFILES[name]
+    except KeyError:
+        raise exceptions.VethCreationFailure(
+            'The datapath profile {0} is not configured.'.format(name))
+
+
+def apply_profile(ipr, index, profile):
+    """Applies the netlink settings of the profile to an existing link.
+
+    :param ipr:     the ``pyroute2.IPRoute`` instance of the namespace of the
+                    link
+    :param index:   the index of the link
+    :param profile: the ``DatapathProfile`` to apply
+    :raises: pyroute2.NetlinkError
+    """
+    if profile.txqueuelen is not None:
+        ipr.link('set', index=index, txqlen=profile.txqueuelen)
+    if profile.qdisc:
+        ipr.tc('replace', kind=profile.qdisc, index=index)
@@ -0,0 +1,86 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import abc
+
+import six
+
+from kuryr.lib import metrics
+
+
+@six.add_metaclass(abc.ABCMeta)
+class BindingDriver(object):
+    """Plugs the host side of the veth pair of a port in process.
+
+    The drivers are the in-process counterparts of the vif_type executables
+    in the ``bindir`` directory and get the same information they do. They
+    are registered in the ``kuryr.binding.drivers`` entry point namespace
+    under the vif_type they bind.
+    """
+
+    #: The binding phase the bind and unbind calls are reported as.
+    phase = metrics.PLUG
+
+    @abc.abstractmethod
+    def bind(self, endpoint_id, neutron_port, ifname):
+        """Plugs the host side of the veth pair of the Neutron port.
+
+        :param endpoint_id:  the ID of the endpoint as string
+        :param neutron_port: a port dictionary returned from
+                             python-neutronclient
+        :param ifname:       the name of the host side of the veth pair
+        :returns: the tuple of the output and the error output of the
+                  binding, for parity with the binding executables
+        :raises: kuryr.common.exceptions.BindingFailure
+        """
+
+    @abc.abstractmethod
+    def unbind(self, endpoint_id, neutron_port, ifname):
+        """Unplugs the host side of the veth pair of the Neutron port.
+
+        :param endpoint_id:  the ID of the endpoint as string
+        :param neutron_port: a port dictionary returned from
+                             python-neutronclient
+        :param ifname:       the name of the host side of the veth pair
+        :returns: the tuple of the output and the error output of the
+                  unbinding, for parity with the binding executables
+        :raises: kuryr.common.exceptions.BindingFailure
+        """
+
+    def bind_plan(self, endpoint_id, binding_plan):
+        """Binds the port of a ``kuryr.lib.binding.plan.BindingPlan``.
+
+        The drivers that can use the data derived in the plan override it,
+        the others are called with ``bind``.
+        """
+        return self.bind(endpoint_id, binding_plan.get_port(),
+                         binding_plan.ifname)
+
+    def unbind_plan(self, endpoint_id, binding_plan):
+        """Unbinds the port of a ``kuryr.lib.binding.plan.BindingPlan``."""
+        return self.unbind(endpoint_id, binding_plan.get_port(),
+                           binding_plan.ifname)
+
+    def is_plugged(self, neutron_port, ifname, master_index):
+        """Returns whether the host side of the veth pair is plugged.
+
+        It is used to skip binding again a port that is already bound. By
+        default, the host side is deemed plugged when it is enslaved to a
+        bridge or to the OVS datapath.
+
+        :param neutron_port: a port dictionary returned from
+                             python-neutronclient
+        :param ifname:       the name of the host side of the veth pair
+        :param master_index: the index of the master of the host side, None
+                             if it has none
+        """
+        return master_index is not None
@@ -0,0 +1,358 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""In-process binding driver for the ``ovs`` vif_type.
+
+It does what the ``ovs`` binding executable does, but talks to the local
+ovsdb-server over a single persistent OVSDB connection instead of running
+``ovs-vsctl`` for each bind and unbind.
+"""
+
+import threading
+
+from oslo_config import cfg
+from oslo_log import log
+from oslo_utils import excutils
+from ovsdbapp.backend.ovs_idl import connection
+from ovsdbapp.schema.open_vswitch import impl_idl
+import pyroute2
+
+from kuryr.lib import binding
+from kuryr.lib.binding import drivers
+from kuryr.lib.binding.drivers import ovs_batch
+from kuryr.lib.binding.drivers import ovs_index
+from kuryr.lib.binding import iproute
+from kuryr.lib import exceptions
+from kuryr.lib import utils
+
+
+LOG = log.getLogger(__name__)
+
+HYBRID_PLUG_KEY = 'ovs_hybrid_plug'
+OVS_SCHEMA = 'Open_vSwitch'
+OWNER = 'kuryr'
+KIND_BRIDGE = 'bridge'
+
+_OVSDB_API = None
+_OVSDB_API_LOCK = threading.Lock()
+
+
+def get_ovsdb_api():
+    """Returns the already cached or a newly created OVSDB API.
+
+    The API keeps a single connection to the ovsdb-server given by
+    ``[binding] ovsdb_connection`` open for the lifetime of the process. Its
+    IDL is an ``ovs_index.IndexedOvsdbIdl``, which indexes the interfaces of
+    the replica it keeps.
+
+    :returns: the already cached or newly created
+              ``ovsdbapp.schema.open_vswitch.impl_idl.OvsdbIdl`` instance
+    """
+    global _OVSDB_API
+    with _OVSDB_API_LOCK:
+        if _OVSDB_API is None:
+            idl = ovs_index.IndexedOvsdbIdl.from_server(
+                cfg.CONF.binding.ovsdb_connection, OVS_SCHEMA)
+            _OVSDB_API = impl_idl.OvsdbIdl(connection.Connection(
+                idl=idl, timeout=cfg.CONF.binding.ovsdb_timeout))
+    return _OVSDB_API
+
+
+def _lookup_link(ipr, ifname, since=None):
+    index = iproute.lookup_link(ipr, ifname, binding._get_link_index(),
+                                iproute.LINK_NOTIFICATION_TIMEOUT, since)
+    if index is None:
+        raise exceptions.BindingFailure(
+            'The interface {0} could not be found.'.format(ifname))
+    return index
+
+
+def _get_hybrid_names(port_id):
+    return utils.get_hybrid_plug_names(port_id)
+
+
+def _is_hybrid_vif(vif_details):
+    return bool((vif_details or {}).get(HYBRID_PLUG_KEY))
+
+
+class OvsDriver(drivers.BindingDriver):
+    """Plugs the veth pairs of the ports into the integration bridge.
+
+    :param ovsdb:           the ovsdbapp Open_vSwitch API to use, the one
+                            connected to ``[binding] ovsdb_connection`` by
+                            default
+    :param interface_index: the ``ovs_index.InterfaceIndex`` to resolve the
+                            interfaces with, the one of the IDL of ``ovsdb``
+                            by default
+    """
+
+    def __init__(self, ovsdb=None, interface_index=None):
+        self._ovsdb = ovsdb
+        self._interface_index = interface_index
+        self._batcher = None
+        self._batcher_lock = threading.Lock()
+
+    @property
+    def ovsdb(self):
+        if self._ovsdb is None:
+            self._ovsdb = get_ovsdb_api()
+        return self._ovsdb
+
+    @property
+    def interface_index(self):
+        if self._interface_index is None:
+            self._interface_index = self.ovsdb.idl.interface_index
+        return self._interface_index
+
+    @property
+    def batcher(self):
+        """The ``TransactionBatcher`` of the driver, None when disabled."""
+        if cfg.CONF.binding.ovsdb_batch_window <= 0:
+            return None
+        with self._batcher_lock:
+            if self._batcher is None:
+                self._batcher = ovs_batch.TransactionBatcher(
+                    self.ovsdb, cfg.CONF.binding.ovsdb_batch_window,
+                    cfg.CONF.binding.ovsdb_batch_size)
+        return self._batcher
+
+    def _commit(self, command, *commands):
+        batcher = self.batcher
+        if batcher is not None:
+            batcher.submit(command, *commands).result()
+            return
+        with self.ovsdb.transaction(check_error=True) as txn:
+            txn.add(command)
+            for other in commands:
+                txn.add(other)
+
+    def get_interface(self, neutron_port):
+        """Returns the OVS interface kuryr plugged for the Neutron port.
+
+        :param neutron_port: a port dictionary returned from
+                             python-neutronclient
+        :returns: the ``ovs_index.Interface`` or None if the port is not
+                  plugged
+        """
+        return self._get_interface(neutron_port['id'])
+
+    def _get_interface(self, port_id):
+        return self.interface_index.lookup_iface_id(port_id, owner=OWNER)
+
+    @staticmethod
+    def _is_hybrid_plug(neutron_port):
+        return _is_hybrid_vif(neutron_port.get(binding.VIF_DETAILS_KEY))
+
+    @staticmethod
+    def _get_external_ids(endpoint_id, port_id, mac_address, vm_key):
+        return {'attached-mac': mac_address,
+                'iface-id': port_id,
+                vm_key: endpoint_id,
+                'iface-status': 'active',
+                'owner': OWNER}
+
+    def _add_port(self, port_name, external_ids):
+        # Like "--may-exist add-port -- set Interface", the external_ids of
+        # the interface are written even when the port already exists.
+        bridge = cfg.CONF.binding.integration_bridge
+        try:
+            self._commit(
+                self.ovsdb.add_port(bridge, port_name, may_exist=True),
+                self.ovsdb.db_set('Interface', port_name,
+                                  ('external_ids', external_ids)))
+        except Exception as e:
+            raise exceptions.BindingFailure(
+                'Could not plug {0} into {1}: {2}'.format(port_name, bridge,
+                                                          e))
+
+    def _del_port(self, port_name):
+        bridge = cfg.CONF.binding.integration_bridge
+        try:
+            self._commit(self.ovsdb.del_port(port_name, bridge=bridge,
+                                             if_exists=True))
+        except Exception as e:
+            raise exceptions.BindingFailure(
+                'Could not unplug {0} from {1}: {2}'.format(port_name,
+                                                            bridge, e))
+
+    def get_owned_interfaces(self):
+        """Returns the OVS interfaces plugged by kuryr.
+
+        :returns: a list of ``ovs_index.Interface``
+        """
+        return self.interface_index.get_owned(OWNER)
+
+    def is_plugged(self, neutron_port, ifname, master_index):
+        interface = self.get_interface(neutron_port)
+        if interface is None:
+            return False
+        if self._is_hybrid_plug(neutron_port):
+            return master_index is not None
+        return interface.name == ifname
+
+    @staticmethod
+    def get_link_names(interface):
+        """Returns the names of the links created along the OVS interface.
+
+        :param interface: an ``ovs_index.Interface`` plugged by kuryr
+        :returns: the names of the hybrid plug bridge and of its veth when
+                  the interface was plugged through one, otherwise an empty
+                  list
+        """
+        if not interface.iface_id:
+            return []
+        br_name, veth_lb, veth_ovs = _get_hybrid_names(interface.iface_id)
+        if interface.name != veth_ovs:
+            return []
+        return [veth_lb, br_name]
+
+    def unplug(self, port_names):
+        """Unplugs the OVS ports in a single transaction.
+
+        :param port_names: the names of the ports to unplug
+        :raises: kuryr.common.exceptions.BindingFailure
+        """
+        bridge = cfg.CONF.binding.integration_bridge
+        try:
+            with self.ovsdb.transaction(check_error=True) as txn:
+                for port_name in port_names:
+                    txn.add(self.ovsdb.del_port(port_name, bridge=bridge,
+                                                if_exists=True))
+        except Exception as e:
+            raise exceptions.BindingFailure(
+                'Could not unplug {0} from {1}: {2}'.format(
+                    ', '.join(port_names), bridge, e))
+
+    def bind(self, endpoint_id, neutron_port, ifname):
+        return self._bind(endpoint_id, neutron_port['id'],
+                          neutron_port['mac_address'],
+                          neutron_port.get(binding.VIF_DETAILS_KEY), ifname)
+
+    def unbind(self, endpoint_id, neutron_port, ifname):
+        return self._unbind(neutron_port['id'],
+                            neutron_port.get(binding.VIF_DETAILS_KEY))
+
+    def bind_plan(self, endpoint_id, binding_plan):
+        return self._bind(endpoint_id, binding_plan.port_id,
+                          binding_plan.mac_address,
+                          binding_plan.raw_vif_details, binding_plan.ifname)
+
+    def unbind_plan(self, endpoint_id, binding_plan):
+        return self._unbind(binding_plan.port_id,
+                            binding_plan.raw_vif_details)
+
+    def _bind(self, endpoint_id, port_id, mac_address, vif_details, ifname):
+        if _is_hybrid_vif(vif_details):
+            return self._hybrid_bind(endpoint_id, port_id, mac_address,
+                                     ifname)
+        self._add_port(ifname, self._get_external_ids(
+            endpoint_id, port_id, mac_address, 'vm-uuid'))
+        return ('plugged veth {0} (Neutron port {1})'.format(
+            ifname, port_id), '')
+
+    def _unbind(self, port_id, vif_details):
+        interface = self._get_interface(port_id)
+        if interface is not None:
+            self._del_port(interface.name)
+        else:
+            LOG.debug('Neutron port %s is not plugged into OVS.', port_id)
+        if _is_hybrid_vif(vif_details):
+            self._hybrid_unbind(port_id)
+        return ('unplugged port {0}'.format(port_id), '')
+
+    def _hybrid_bind(self, endpoint_id, port_id, mac_address, ifname):
+        """Plugs the veth through a Linux bridge for iptables filtering."""
+        br_name, veth_lb, veth_ovs = _get_hybrid_names(port_id)
+        with binding.iproute_connection() as ipr:
+            return self._hybrid_bind_links(ipr, endpoint_id, port_id,
+                                           mac_address, ifname, br_name,
+                                           veth_lb, veth_ovs)
+
+    def _hybrid_bind_links(self, ipr, endpoint_id, port_id, mac_address,
+                           ifname, br_name, veth_lb, veth_ovs):
+        # The links left by an earlier attempt are reused, the ones created
+        # by this call are deleted again if a later step fails.
+        link_index = binding._get_link_index()
+        created = []
+        try:
+            try:
+                br_index = iproute.lookup_link(ipr, br_name, link_index)
+                if br_index is None:
+                    since = iproute.get_sequence(link_index)
+                    ipr.link('add', ifname=br_name, kind=KIND_BRIDGE,
+                             br_forward_delay=0, br_stp_state=0)
+                    created.append(br_name)
+                    br_index = _lookup_link(ipr, br_name, since)
+                host_index = _lookup_link(ipr, ifname)
+                ipr.link('set', index=host_index, state='up',
+                         master=br_index)
+                lb_index = iproute.lookup_link(ipr, veth_lb, link_index)
+                since = None
+                if lb_index is None:
+                    since = iproute.get_sequence(link_index)
+                    ipr.link('add', ifname=veth_lb, kind=binding.KIND_VETH,
+                             peer=veth_ovs)
+                    created.append(veth_lb)
+                    lb_index = _lookup_link(ipr, veth_lb, since)
+                ovs_index = _lookup_link(ipr, veth_ovs, since)
+                ipr.link('set', index=lb_index, master=br_index)
+                ipr.link('set', index=br_index, state='up')
+            except pyroute2.NetlinkError as e:
+                raise exceptions.BindingFailure(
+                    'Could not create the hybrid plug bridge {0}: {1}'.format(
+                        br_name, e))
+            self._add_port(veth_ovs, self._get_external_ids(
+                endpoint_id, port_id, mac_address, 'vm-id'))
+            try:
+                ipr.link('set', index=lb_index, state='up')
+                ipr.link('set', index=ovs_index, state='up')
+            except pyroute2.NetlinkError as e:
+                raise exceptions.BindingFailure(
+                    'Could not set {0} and {1} up: {2}'.format(
+                        veth_lb, veth_ovs, e))
+        except exceptions.BindingFailure:
+            with excutils.save_and_reraise_exception():
+                self._rollback_links(ipr, veth_ovs, created)
+        return ('plugged veth {0} (Neutron port {1}) through {2}'.format(
+            ifname, port_id, br_name), '')
+
+    def _rollback_links(self, ipr, veth_ovs, created):
+        if not created:
+            return
+        LOG.debug('Deleting the links %s of the failed hybrid plug.',
+                  created)
+        link_index = binding._get_link_index()
+        for name in reversed(created):
+            try:
+                index = iproute.lookup_link(ipr, name, link_index)
+                if index is not None:
+                    iproute.delete_link(ipr, index, link_index)
+            except pyroute2.NetlinkError:
+                LOG.warning('Could not delete %s.', name, exc_info=True)
+        try:
+            self._del_port(veth_ovs)
+        except exceptions.BindingFailure:
+            LOG.warning('Could not unplug %s.', veth_ovs, exc_info=True)
+
+    def _hybrid_unbind(self, port_id):
+        br_name, veth_lb, _ = _get_hybrid_names(port_id)
+        try:
+            with binding.iproute_connection() as ipr:
+                link_index = binding._get_link_index()
+                for name in (veth_lb, br_name):
+                    index = iproute.lookup_link(ipr, name, link_index)
+                    if index is not None:
+                        iproute.delete_link(ipr, index, link_index)
+        except pyroute2.NetlinkError as e:
+            raise exceptions.BindingFailure(
+                'Could not delete the hybrid plug bridge {0}: {1}'.format(
+                    br_name, e))
@@ -0,0 +1,108 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Coalescing of the OVSDB commands of concurrent binds into transactions.
+
+Every committed OVSDB transaction touching the integration bridge makes
+ovs-vswitchd reconfigure the bridge. When many ports are plugged at once,
+the commands submitted within a short window are committed together so the
+bridge is reconfigured once per batch rather than once per port.
+"""
+
+from concurrent import futures
+import threading
+import time
+
+from oslo_log import log
+
+
+LOG = log.getLogger(__name__)
+
+
+class TransactionBatcher(object):
+    """Commits the submitted OVSDB commands in batches.
+
+    A batch is committed once ``window`` seconds passed since its first
+    command was submitted or once it holds ``max_size`` commands. When the
+    transaction of a batch fails, its commands are committed again one by
+    one so that only the commands that fail on their own are reported as
+    failed.
+
+    :param ovsdb:    the ovsdbapp API the commands belong to
+    :param window:   seconds to wait for more commands before committing
+    :param max_size: the maximum number of commands in a transaction
+    """
+
+    def __init__(self, ovsdb, window, max_size):
+        self._ovsdb = ovsdb
+        self._window = window
+        self._max_size = max_size
+        self._pending = []
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def submit(self, command, *commands):
+        """Queues OVSDB commands for the next transaction.
+
+        :param command:  the ovsdbapp command, e.g., from ``add_port``
+        :param commands: more commands always committed in the same
+                         transaction as ``command``, after it
+        :returns: a ``concurrent.futures.Future`` resolved once the
+                  transaction holding the commands was committed
+        """
+        future = futures.Future()
+        with self._cond:
+            self._pending.append(((command,) + commands, future))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run,
+                                                name='kuryr-ovsdb-batcher')
+                self._thread.daemon = True
+                self._thread.start()
+            self._cond.notify()
+        return future
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            deadline = time.time() + self._window
+            while len(self._pending) < self._max_size:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = self._pending[:self._max_size]
+            del self._pending[:self._max_size]
+        return batch
+
+    def _run(self):
+        while True:
+            self._commit(self._next_batch())
+
+    def _commit(self, batch):
+        try:
+            with self._ovsdb.transaction(check_error=True) as txn:
+                for commands, _ in batch:
+                    for command in commands:
+                        txn.add(command)
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0][1].set_exception(e)
+                return
+            LOG.warning('The OVSDB transaction of %(count)d commands failed, '
+                        'committing them one by one: %(error)s',
+                        {'count': len(batch), 'error': e})
+            for item in batch:
+                self._commit([item])
+            return
+        for _, future in batch:
+            future.set_result(None)
@@ -0,0 +1,154 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""In-process index of the OVS interfaces of the local ovsdb-server.
+
+The OVSDB IDL already keeps a replica of the Open_vSwitch database, kept up
+to date by the monitor updates of the server, but it can only be searched by
+row UUID. The index follows the same updates to map the interface names and
+the ``iface-id`` and ``owner`` external IDs to the rows, so finding the
+interface of a Neutron port does not require scanning the Interface table
+with ``ovs-vsctl find``.
+"""
+
+import collections
+import threading
+
+from ovs.db import idl as ovs_idl
+from ovsdbapp.backend.ovs_idl import connection
+
+
+INTERFACE_TABLE = 'Interface'
+PORT_TABLE = 'Port'
+IFACE_ID_KEY = 'iface-id'
+OWNER_KEY = 'owner'
+
+Interface = collections.namedtuple('Interface',
+                                   ['uuid', 'name', 'iface_id', 'owner'])
+
+
+class InterfaceIndex(object):
+    """Maps the names, iface-ids and owners of the OVS interfaces to them.
+
+    :param tables: the tables of the IDL replica the index follows, used to
+                   drop the entries of the rows removed while the connection
+                   to the server was down
+    """
+
+    def __init__(self, tables=None):
+        self._tables = tables
+        self._interfaces = {}
+        self._by_name = {}
+        self._by_iface_id = {}
+        self._by_owner = collections.defaultdict(set)
+        self._ports = {}
+        self._port_names = set()
+        self._lock = threading.Lock()
+
+    def notify(self, event, row, updates=None):
+        """Updates the index with a change of the IDL replica.
+
+        :param event:   one of the ``ovs.db.idl.ROW_*`` events
+        :param row:     the created, updated or deleted row
+        :param updates: the columns of the row before an update
+        """
+        table = row._table.name
+        if table == INTERFACE_TABLE:
+            with self._lock:
+                self._remove_interface(row.uuid)
+                if event != ovs_idl.ROW_DELETE:
+                    self._add_interface(row)
+        elif table == PORT_TABLE:
+            with self._lock:
+                name = self._ports.pop(row.uuid, None)
+                self._port_names.discard(name)
+                if event != ovs_idl.ROW_DELETE:
+                    self._ports[row.uuid] = row.name
+                    self._port_names.add(row.name)
+
+    def _add_interface(self, row):
+        external_ids = getattr(row, 'external_ids', None) or {}
+        interface = Interface(row.uuid, row.name,
+                              external_ids.get(IFACE_ID_KEY),
+                              external_ids.get(OWNER_KEY))
+        self._interfaces[row.uuid] = interface
+        self._by_name[interface.name] = interface
+        if interface.iface_id:
+            self._by_iface_id[interface.iface_id] = interface
+        if interface.owner:
+            self._by_owner[interface.owner].add(interface)
+
+    def _remove_interface(self, uuid):
+        interface = self._interfaces.pop(uuid, None)
+        if interface is None:
+            return
+        if self._by_name.get(interface.name) == interface:
+            del self._by_name[interface.name]
+        if self._by_iface_id.get(interface.iface_id) == interface:
+            del self._by_iface_id[interface.iface_id]
+        owned = self._by_owner.get(interface.owner)
+        if owned is not None:
+            owned.discard(interface)
+            if not owned:
+                del self._by_owner[interface.owner]
+
+    def _check(self, interface):
+        # The IDL does not notify the deletions that happened while it was
+        # disconnected, the entries of the rows it dropped are removed here.
+        if interface is None or self._tables is None:
+            return interface
+        if interface.uuid in self._tables[INTERFACE_TABLE].rows:
+            return interface
+        self._remove_interface(interface.uuid)
+        return None
+
+    def lookup_iface_id(self, iface_id, owner=None):
+        """Returns the interface with the given iface-id.
+
+        :param iface_id: the ID of the Neutron port the interface belongs to
+        :param owner:    if given, the owner the interface must have
+        :returns: the ``Interface`` or None if there is no such interface
+        """
+        with self._lock:
+            interface = self._check(self._by_iface_id.get(iface_id))
+        if interface is not None and owner and interface.owner != owner:
+            return None
+        return interface
+
+    def lookup_name(self, name):
+        """Returns the interface with the given name or None."""
+        with self._lock:
+            return self._check(self._by_name.get(name))
+
+    def get_owned(self, owner):
+        """Returns the interfaces whose owner external ID is the given one."""
+        with self._lock:
+            interfaces = [self._check(interface)
+                          for interface in list(self._by_owner.get(owner, ()))]
+        return [interface for interface in interfaces if interface]
+
+    def has_port(self, name):
+        """Returns whether there is an OVS port with the given name."""
+        with self._lock:
+            return name in self._port_names
+
+
+class IndexedOvsdbIdl(connection.OvsdbIdl):
+    """OVSDB IDL keeping an ``InterfaceIndex`` of its replica."""
+
+    def __init__(self, *args, **kwargs):
+        super(IndexedOvsdbIdl, self).__init__(*args, **kwargs)
+        self.interface_index = InterfaceIndex(self.tables)
+
+    def notify(self, event, row, updates=None):
+        self.interface_index.notify(event, row, updates)
+        super(IndexedOvsdbIdl, self).notify(event, row, updates)
@@ -0,0 +1,45 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from kuryr.lib.binding import drivers
+
+
+class SubInterfaceDriver(drivers.BindingDriver):
+    """In-process driver of the ports given an ipvlan or macvlan interface.
+
+    The sub-interface is attached to the uplink when kuryr creates it and
+    detached when kuryr deletes it, so there is no host side to plug into a
+    bridge whatever the vif_type of the port. The driver is picked by
+    ``kuryr.lib.binding.get_plan_driver`` rather than registered under a
+    vif_type.
+    """
+
+    def bind(self, endpoint_id, neutron_port, ifname):
+        return ('Binding Neutron port {0} to a sub-interface'.format(
+            neutron_port['id']), '')
+
+    def unbind(self, endpoint_id, neutron_port, ifname):
+        return ('Unbinding Neutron port {0} from a sub-interface'.format(
+            neutron_port['id']), '')
+
+    def bind_plan(self, endpoint_id, binding_plan):
+        return ('Binding Neutron port {0} to a {1} sub-interface of '
+                '{2}'.format(binding_plan.port_id, binding_plan.link_kind,
+                             binding_plan.uplink), '')
+
+    def unbind_plan(self, endpoint_id, binding_plan):
+        return ('Unbinding Neutron port {0} from a {1} sub-interface of '
+                '{2}'.format(binding_plan.port_id, binding_plan.link_kind,
+                             binding_plan.uplink), '')
+
+    def is_plugged(self, neutron_port, ifname, master_index):
+        return True
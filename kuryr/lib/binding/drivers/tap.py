@@ -0,0 +1,41 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from kuryr.lib.binding import drivers
+
+
+class TapDriver(drivers.BindingDriver):
+    """In-process driver for the ``tap`` vif_type.
+
+    The host side of the veth pair of a ``tap`` port is left unbridged, so
+    there is nothing to do once kuryr created it, nor before kuryr deletes
+    it.
+    """
+
+    def bind(self, endpoint_id, neutron_port, ifname):
+        return ('Binding VIF_TYPE_TAP Neutron port {0}'.format(
+            neutron_port['id']), '')
+
+    def unbind(self, endpoint_id, neutron_port, ifname):
+        return ('Unbinding VIF_TYPE_TAP Neutron port {0}'.format(
+            neutron_port['id']), '')
+
+    def bind_plan(self, endpoint_id, binding_plan):
+        return ('Binding VIF_TYPE_TAP Neutron port {0}'.format(
+            binding_plan.port_id), '')
+
+    def unbind_plan(self, endpoint_id, binding_plan):
+        return ('Unbinding VIF_TYPE_TAP Neutron port {0}'.format(
+            binding_plan.port_id), '')
+
+    def is_plugged(self, neutron_port, ifname, master_index):
+        return True
@@ -0,0 +1,479 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Veth configuration issuing netlink requests through IPRoute only.
+
+Unlike IPDB, IPRoute does not dump and mirror every interface, address and
+route of the host, so the memory used and the time spent by the first bind
+do not grow with the number of interfaces on the host.
+"""
+
+import errno
+import socket
+
+import netaddr
+import pyroute2
+
+from kuryr.lib import exceptions
+from kuryr.lib import metrics
+
+
+IFF_UP = 0x1
+IPVLAN_MODES = {'l2': 0, 'l3': 1, 'l3s': 2}
+KIND_IPVLAN = 'ipvlan'
+KIND_VETH = 'veth'
+# Seconds to wait for the notification of a newly created link
+LINK_NOTIFICATION_TIMEOUT = 5
+
+
+def lookup_link(ipr, ifname, link_index=None, timeout=0, since=None):
+    """Returns the index of the interface with the given name.
+
+    :param ipr:        the ``pyroute2.IPRoute`` instance to use
+    :param ifname:     the name of the interface
+    :param link_index: the ``kuryr.lib.binding.link_index.LinkIndex`` to look
+                       the interface up in instead of dumping the links with
+                       ``ipr``
+    :param timeout:    seconds to wait for the interface to show up in
+                       ``link_index``
+    :param since:      the sequence of ``link_index`` the interface must have
+                       been notified after, see ``get_sequence``
+    :returns: the index of the interface or None if it does not exist
+    """
+    if link_index is not None:
+        return link_index.lookup(ifname, timeout, since)
+    indexes = ipr.link_lookup(ifname=ifname)
+    if not indexes:
+        return None
+    return indexes[0]
+
+
+def get_sequence(link_index):
+    """Returns the sequence to look a link about to be created up with.
+
+    :param link_index: the ``kuryr.lib.binding.link_index.LinkIndex`` the
+                       link is looked up in, if any
+    :returns: the sequence of the last notification ``link_index``
+              processed, or None without a link index
+    """
+    if link_index is None:
+        return None
+    return link_index.sequence
+
+
+def delete_link(ipr, index, link_index=None):
+    """Deletes a link and drops it from the link index at once.
+
+    :param ipr:        the ``pyroute2.IPRoute`` instance to use
+    :param index:      the index of the link
+    :param link_index: the ``kuryr.lib.binding.link_index.LinkIndex`` the
+                       link is dropped from, if any
+    :raises: pyroute2.NetlinkError
+    """
+    try:
+        ipr.link('del', index=index)
+    except pyroute2.NetlinkError as e:
+        if e.code == errno.ENODEV and link_index is not None:
+            link_index.forget(index)
+        raise
+    if link_index is not None:
+        link_index.forget(index)
+
+
+def _is_stale(error, link_index):
+    # A link deleted by another process or just before may still be in the
+    # link index, the links are then looked up with a dump instead.
+    return (link_index is not None and
+            isinstance(error, pyroute2.NetlinkError) and
+            error.code == errno.ENODEV)
+
+
+def _add_address(ipr, index, address, prefixlen):
+    if prefixlen is None:
+        network = netaddr.IPNetwork(address)
+        address, prefixlen = str(network.ip), network.prefixlen
+    try:
+        ipr.addr('add', index=index, address=address, mask=prefixlen)
+    except pyroute2.NetlinkError as e:
+        # The address is already there when the veth pair is reused.
+        if e.code != errno.EEXIST:
+            raise
+
+
+def configure_veth(ipr, ifname, peer_name, ip_addresses, mtu, mac_address,
+                   link_index=None, indexes=None, vif_type=None,
+                   link_attributes=None):
+    """Creates the veth pair if it does not exist and configures it.
+
+    :param ipr:          the ``pyroute2.IPRoute`` instance to use
+    :param ifname:       the name of the host side of the veth pair
+    :param peer_name:    the name of the container side of the veth pair
+    :param ip_addresses: a list of tuples of the IP addresses and the prefix
+                         lengths to set on the container side
+    :param mtu:          the MTU of the container side
+    :param mac_address:  the MAC address of the container side
+    :param link_index:   the ``kuryr.lib.binding.link_index.LinkIndex`` used to
+                         look the interfaces up, if any
+    :param indexes:      the tuple of the indexes of the host and container
+                         sides when the veth pair already exists with the
+                         given names, e.g., when it is taken from the pool
+    :param vif_type:     the vif_type of the port the metrics are tagged with
+    :param link_attributes: the attributes both sides are created with, e.g.,
+                            their number of queues
+    :raises: kuryr.common.exceptions.VethCreationFailure
+    """
+    try:
+        with metrics.timed(metrics.VETH_CREATE, vif_type):
+            try:
+                host_index, peer_index = _create_veth(
+                    ipr, ifname, peer_name, link_index, indexes,
+                    link_attributes)
+            except pyroute2.NetlinkError as e:
+                if not _is_stale(e, link_index):
+                    raise
+                host_index, peer_index = _create_veth(
+                    ipr, ifname, peer_name, None, None, link_attributes)
+    except pyroute2.NetlinkError:
+        raise exceptions.VethCreationFailure(
+            'Creating the veth pair was failed.')
+
+    try:
+        try:
+            _configure_peer(ipr, peer_index, ip_addresses, mtu, mac_address,
+                            vif_type)
+        except pyroute2.NetlinkError as e:
+            if not _is_stale(e, link_index):
+                raise
+            peer_index = lookup_link(ipr, peer_name)
+            if peer_index is None:
+                raise exceptions.VethCreationFailure(
+                    'Creating the veth pair was failed.')
+            _configure_peer(ipr, peer_index, ip_addresses, mtu, mac_address,
+                            vif_type)
+    except pyroute2.NetlinkError:
+        raise exceptions.VethCreationFailure(
+            'Could not configure the veth endpoint for the container.')
+
+
+def _create_veth(ipr, ifname, peer_name, link_index, indexes,
+                 link_attributes):
+    if indexes is not None:
+        host_index, peer_index = indexes
+    else:
+        host_index = lookup_link(ipr, ifname, link_index)
+        if host_index is None:
+            since = get_sequence(link_index)
+            if link_attributes:
+                peer = dict(link_attributes, ifname=peer_name)
+                ipr.link('add', ifname=ifname, kind=KIND_VETH, peer=peer,
+                         **link_attributes)
+            else:
+                ipr.link('add', ifname=ifname, kind=KIND_VETH,
+                         peer=peer_name)
+            host_index = lookup_link(ipr, ifname, link_index,
+                                     LINK_NOTIFICATION_TIMEOUT, since)
+            peer_index = lookup_link(ipr, peer_name, link_index,
+                                     LINK_NOTIFICATION_TIMEOUT, since)
+        else:
+            peer_index = lookup_link(ipr, peer_name, link_index)
+    if host_index is None or peer_index is None:
+        raise exceptions.VethCreationFailure(
+            'Creating the veth pair was failed.')
+    ipr.link('set', index=host_index, state='up')
+    return host_index, peer_index
+
+
+def create_veths(ipr, pairs, link_index=None):
+    """Creates veth pairs, requesting all of them before looking them up.
+
+    The notifications of the new links are waited for once all the pairs are
+    requested, instead of after each one of them. The pairs which cannot be
+    created, e.g., because their host side already exists, are skipped.
+
+    :param ipr:        the ``pyroute2.IPRoute`` instance to use
+    :param pairs:      a list of tuples of the names of the host and container
+                       sides of the veth pairs
+    :param link_index: the ``kuryr.lib.binding.link_index.LinkIndex`` used to
+                       look the interfaces up, if any
+    :returns: a dict of the tuples of the indexes of the host and container
+              sides of the created pairs by the name of their host side
+    """
+    since = get_sequence(link_index)
+    requested = []
+    for ifname, peer_name in pairs:
+        try:
+            ipr.link('add', ifname=ifname, kind=KIND_VETH, peer=peer_name)
+        except pyroute2.NetlinkError:
+            continue
+        requested.append((ifname, peer_name))
+
+    created = {}
+    for ifname, peer_name in requested:
+        host_index = lookup_link(ipr, ifname, link_index,
+                                 LINK_NOTIFICATION_TIMEOUT, since)
+        peer_index = lookup_link(ipr, peer_name, link_index,
+                                 LINK_NOTIFICATION_TIMEOUT, since)
+        if host_index is not None and peer_index is not None:
+            created[ifname] = (host_index, peer_index)
+    return created
+
+
+def _configure_peer(ipr, peer_index, ip_addresses, mtu, mac_address,
+                    vif_type):
+    with metrics.timed(metrics.ADDRESS_CONFIG, vif_type):
+        for address, prefixlen in ip_addresses:
+            _add_address(ipr, peer_index, address, prefixlen)
+    with metrics.timed(metrics.LINK_CONFIG, vif_type):
+        ipr.link('set', index=peer_index, mtu=mtu, address=mac_address)
+        ipr.link('set', index=peer_index, state='up')
+
+
+def _get_default_route_family(gateway):
+    if netaddr.IPAddress(gateway).version == 6:
+        return socket.AF_INET6, '::/0'
+    return socket.AF_INET, '0.0.0.0/0'
+
+
+def configure_veth_in_netns(ipr, netns_handle, ifname, peer_name,
+                            ip_addresses, mtu, mac_address, gateways=(),
+                            link_index=None, vif_type=None,
+                            link_attributes=None):
+    """Creates the veth pair with its peer in a network namespace.
+
+    The peer is created in the namespace under its final name and with its
+    MTU and MAC address by the request creating the veth pair, so it never
+    shows up in the host namespace. Its addresses, default routes and state
+    are then configured from within the namespace. The existing interfaces
+    are never replaced, the creation fails if the host side already exists.
+
+    :param ipr:          the ``pyroute2.IPRoute`` instance of the host
+    :param netns_handle: the ``kuryr.lib.binding.netns.NetnsHandle`` of the
+                         namespace
+    :param ifname:       the name of the host side of the veth pair
+    :param peer_name:    the name of the peer in the namespace
+    :param ip_addresses: a list of tuples of the IP addresses and the prefix
+                         lengths to set on the peer
+    :param mtu:          the MTU of the peer
+    :param mac_address:  the MAC address of the peer
+    :param gateways:     the gateways the default routes of the namespace go
+                         through, at most one per IP version
+    :param link_index:   the ``kuryr.lib.binding.link_index.LinkIndex`` used to
+                         look the host side up, if any
+    :param vif_type:     the vif_type of the port the metrics are tagged with
+    :param link_attributes: the attributes both sides are created with, e.g.,
+                            their number of queues
+    :raises: kuryr.common.exceptions.VethCreationFailure
+    """
+    link_attributes = link_attributes or {}
+    try:
+        with metrics.timed(metrics.VETH_CREATE, vif_type):
+            since = get_sequence(link_index)
+            peer = dict(link_attributes, ifname=peer_name,
+                        net_ns_fd=netns_handle.fd, address=mac_address,
+                        mtu=mtu)
+            try:
+                ipr.link('add', ifname=ifname, kind=KIND_VETH, peer=peer,
+                         **link_attributes)
+            except pyroute2.NetlinkError as e:
+                if e.code != errno.EEXIST:
+                    raise
+                raise exceptions.VethCreationFailure(
+                    'The interface {0} already exists.'.format(ifname))
+            host_index = lookup_link(ipr, ifname, link_index,
+                                     LINK_NOTIFICATION_TIMEOUT, since)
+            if host_index is None:
+                raise exceptions.VethCreationFailure(
+                    'Creating the veth pair was failed.')
+            ipr.link('set', index=host_index, state='up')
+    except pyroute2.NetlinkError:
+        raise exceptions.VethCreationFailure(
+            'Creating the veth pair was failed.')
+
+    netns_ipr = netns_handle.iproute
+    try:
+        peer_index = lookup_link(netns_ipr, peer_name)
+        if peer_index is None:
+            raise exceptions.VethCreationFailure(
+                'The veth endpoint {0} is not in {1}.'.format(
+                    peer_name, netns_handle.path))
+        with metrics.timed(metrics.ADDRESS_CONFIG, vif_type):
+            for address, prefixlen in ip_addresses:
+                _add_address(netns_ipr, peer_index, address, prefixlen)
+        with metrics.timed(metrics.LINK_CONFIG, vif_type):
+            netns_ipr.link('set', index=peer_index, state='up')
+            for gateway in gateways:
+                family, dst = _get_default_route_family(gateway)
+                netns_ipr.route('replace', dst=dst, gateway=gateway,
+                                oif=peer_index, family=family)
+    except pyroute2.NetlinkError:
+        raise exceptions.VethCreationFailure(
+            'Could not configure the veth endpoint for the container.')
+
+
+def configure_sub_interface(ipr, uplink, ifname, kind, mode, ip_addresses,
+                            mtu, mac_address, gateways=(), netns_handle=None,
+                            link_index=None, vif_type=None,
+                            link_attributes=None):
+    """Creates an ipvlan or macvlan sub-interface of the uplink.
+
+    The sub-interface is created directly in the network namespace when one
+    is given, where it also gets its default routes. An interface with the
+    same name is never replaced, it may be one the container relies on.
+    The ipvlan sub-interfaces share the MAC address of the uplink, only the
+    macvlan ones are given the MAC address of the port.
+
+    :param ipr:          the ``pyroute2.IPRoute`` instance of the host
+    :param uplink:       the name of the host interface the sub-interface is
+                         created on
+    :param ifname:       the name of the sub-interface
+    :param kind:         ``ipvlan`` or ``macvlan``
+    :param mode:         the ipvlan mode, i.e., ``l2``, ``l3`` or ``l3s``, or
+                         the macvlan one, e.g., ``bridge``
+    :param ip_addresses: a list of tuples of the IP addresses and the prefix
+                         lengths to set on the sub-interface
+    :param mtu:          the MTU of the sub-interface
+    :param mac_address:  the MAC address of the port
+    :param gateways:     the gateways the default routes of the namespace go
+                         through, at most one per IP version
+    :param netns_handle: the ``kuryr.lib.binding.netns.NetnsHandle`` of the
+                         namespace to create the sub-interface in, if any
+    :param link_index:   the ``kuryr.lib.binding.link_index.LinkIndex`` used to
+                         look the host interfaces up, if any
+    :param vif_type:     the vif_type of the port the metrics are tagged with
+    :param link_attributes: the attributes the sub-interface is created with,
+                            e.g., its number of queues
+    :raises: kuryr.common.exceptions.VethCreationFailure
+    """
+    if netns_handle is not None:
+        sub_ipr = netns_handle.iproute
+        sub_link_index = None
+    else:
+        sub_ipr = ipr
+        sub_link_index = link_index
+    try:
+        with metrics.timed(metrics.VETH_CREATE, vif_type):
+            uplink_index = lookup_link(ipr, uplink, link_index)
+            if uplink_index is None:
+                raise exceptions.VethCreationFailure(
+                    'The uplink interface {0} does not exist.'.format(uplink))
+            kwargs = dict(link_attributes or {}, ifname=ifname, kind=kind,
+                          link=uplink_index, mtu=mtu)
+            if kind == KIND_IPVLAN:
+                kwargs['ipvlan_mode'] = IPVLAN_MODES[mode]
+            else:
+                kwargs['macvlan_mode'] = mode
+                kwargs['address'] = mac_address
+            if netns_handle is not None:
+                kwargs['net_ns_fd'] = netns_handle.fd
+            since = get_sequence(sub_link_index)
+            try:
+                ipr.link('add', **kwargs)
+            except pyroute2.NetlinkError as e:
+                if e.code != errno.EEXIST:
+                    raise
+                raise exceptions.VethCreationFailure(
+                    'The interface {0} already exists.'.format(ifname))
+            index = lookup_link(sub_ipr, ifname, sub_link_index,
+                                LINK_NOTIFICATION_TIMEOUT, since)
+            if index is None:
+                raise exceptions.VethCreationFailure(
+                    'Creating the {0} sub-interface was failed.'.format(kind))
+    except pyroute2.NetlinkError:
+        raise exceptions.VethCreationFailure(
+            'Creating the {0} sub-interface was failed.'.format(kind))
+
+    try:
+        with metrics.timed(metrics.ADDRESS_CONFIG, vif_type):
+            for address, prefixlen in ip_addresses:
+                _add_address(sub_ipr, index, address, prefixlen)
+        with metrics.timed(metrics.LINK_CONFIG, vif_type):
+            sub_ipr.link('set', index=index, state='up')
+            if netns_handle is not None:
+                for gateway in gateways:
+                    family, dst = _get_default_route_family(gateway)
+                    sub_ipr.route('replace', dst=dst, gateway=gateway,
+                                  oif=index, family=family)
+    except pyroute2.NetlinkError:
+        raise exceptions.VethCreationFailure(
+            'Could not configure the {0} sub-interface for the '
+            'container.'.format(kind))
+
+
+def _normalize_address(address, prefixlen):
+    if prefixlen is None:
+        network = netaddr.IPNetwork(address)
+        return network.ip, network.prefixlen
+    return netaddr.IPAddress(address), prefixlen
+
+
+def ensure_veth(ipr, host_index, peer_ipr, peer_index, ip_addresses, mtu,
+                mac_address, vif_type=None):
+    """Applies to an existing veth pair only what differs from the port.
+
+    The state of the pair is read first and nothing is written when it
+    already matches, so ensuring a pair that is configured costs a few
+    reads. The addresses of the peer that do not belong to the port are
+    left in place. Only the host side is ensured when the peer is not given,
+    e.g., when it was moved into the namespace of a container.
+
+    :param ipr:          the ``pyroute2.IPRoute`` instance of the host
+    :param host_index:   the index of the host side
+    :param peer_ipr:     the ``pyroute2.IPRoute`` instance of the namespace
+                         of the peer
+    :param peer_index:   the index of the peer, or None to leave it alone
+    :param ip_addresses: a list of tuples of the IP addresses and the prefix
+                         lengths the peer must have
+    :param mtu:          the MTU the peer must have
+    :param mac_address:  the MAC address the peer must have, or None to leave
+                         it as is, e.g., on an ipvlan sub-interface
+    :param vif_type:     the vif_type of the port the metrics are tagged with
+    :returns: the index of the master of the host side or None
+    :raises: kuryr.common.exceptions.VethCreationFailure
+    """
+    try:
+        host = ipr.get_links(host_index)[0]
+        if not host['flags'] & IFF_UP:
+            ipr.link('set', index=host_index, state='up')
+        if peer_index is not None:
+            _ensure_peer(peer_ipr, peer_index, ip_addresses, mtu,
+                         mac_address, vif_type)
+    except pyroute2.NetlinkError:
+        raise exceptions.VethCreationFailure(
+            'Could not configure the veth endpoint for the container.')
+    return host.get_attr('IFLA_MASTER')
+
+
+def _ensure_peer(peer_ipr, peer_index, ip_addresses, mtu, mac_address,
+                 vif_type):
+    peer = peer_ipr.get_links(peer_index)[0]
+    existing = set(
+        (netaddr.IPAddress(addr.get_attr('IFA_ADDRESS')),
+         addr['prefixlen'])
+        for addr in peer_ipr.get_addr(index=peer_index))
+    missing = [(address, prefixlen)
+               for address, prefixlen in ip_addresses
+               if _normalize_address(address, prefixlen) not in existing]
+    if missing:
+        with metrics.timed(metrics.ADDRESS_CONFIG, vif_type):
+            for address, prefixlen in missing:
+                _add_address(peer_ipr, peer_index, address, prefixlen)
+    changes = {}
+    if peer.get_attr('IFLA_MTU') != mtu:
+        changes['mtu'] = mtu
+    if (mac_address is not None and
+            (peer.get_attr('IFLA_ADDRESS') or '').lower() != mac_address):
+        changes['address'] = mac_address
+    if not peer['flags'] & IFF_UP:
+        changes['state'] = 'up'
+    if changes:
+        with metrics.timed(metrics.LINK_CONFIG, vif_type):
+            peer_ipr.link('set', index=peer_index, **changes)
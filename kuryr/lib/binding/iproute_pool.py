@@ -0,0 +1,164 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Pool of the netlink sockets used by concurrent binds.
+
+A single IPRoute instance shared by all the threads serializes their
+requests, or interleaves the replies to them when they are not serialized.
+The pool hands each thread a socket of its own for the duration of a bind,
+so concurrent binds issue their requests in parallel. A socket whose receive
+buffer overflowed, i.e., that failed with ENOBUFS, may have lost replies and
+is replaced by a new one.
+"""
+
+import contextlib
+import errno
+import socket
+import threading
+
+from oslo_log import log
+import pyroute2
+from six.moves import queue
+
+
+LOG = log.getLogger(__name__)
+
+# Seconds between the checks for a free slot while all the sockets are busy
+CHECKOUT_POLL_INTERVAL = 0.1
+
+
+def _is_enobufs(error):
+    # The netlink errors of the binds are wrapped, e.g., into
+    # VethCreationFailure, so the errors they were raised from are looked at.
+    while error is not None:
+        code = getattr(error, 'code', None)
+        if code is None:
+            code = getattr(error, 'errno', None)
+        if code == errno.ENOBUFS:
+            return True
+        error = (getattr(error, '__cause__', None) or
+                 getattr(error, '__context__', None))
+    return False
+
+
+class IPRoutePool(object):
+    """Bounded pool of ``pyroute2.IPRoute`` sockets.
+
+    The sockets are opened lazily, up to ``size`` of them. A thread checking
+    a socket out while all of them are in use waits for one to be checked
+    in.
+
+    :param size:   the maximum number of sockets opened
+    :param rcvbuf: the size of the receive buffer of the sockets in bytes,
+                   the default of the kernel if 0
+    :param sndbuf: the size of the send buffer of the sockets in bytes, the
+                   default of the kernel if 0
+    """
+
+    def __init__(self, size, rcvbuf=0, sndbuf=0):
+        self._size = size
+        self._rcvbuf = rcvbuf
+        self._sndbuf = sndbuf
+        self._idle = queue.LifoQueue()
+        self._opened = 0
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def _open(self):
+        ipr = pyroute2.IPRoute()
+        try:
+            if self._rcvbuf:
+                ipr.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF,
+                               self._rcvbuf)
+            if self._sndbuf:
+                ipr.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF,
+                               self._sndbuf)
+        except Exception:
+            ipr.close()
+            raise
+        return ipr
+
+    def checkout(self):
+        """Takes a socket out of the pool, opening it if needed.
+
+        :returns: the ``pyroute2.IPRoute`` instance, to be given back with
+                  ``checkin``
+        """
+        while True:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+            with self._lock:
+                can_open = self._opened < self._size
+                if can_open:
+                    self._opened += 1
+            if can_open:
+                try:
+                    return self._open()
+                except Exception:
+                    with self._lock:
+                        self._opened -= 1
+                    raise
+            # A discarded socket frees a slot without being checked in, the
+            # waiters poll to open its replacement.
+            try:
+                return self._idle.get(timeout=CHECKOUT_POLL_INTERVAL)
+            except queue.Empty:
+                pass
+
+    def checkin(self, ipr, discard=False):
+        """Gives a socket back to the pool.
+
+        :param ipr:     the ``pyroute2.IPRoute`` instance from ``checkout``
+        :param discard: whether the socket must be closed rather than reused,
+                        e.g., because it failed with ENOBUFS
+        """
+        if not (discard or self._closed):
+            self._idle.put(ipr)
+            return
+        with self._lock:
+            self._opened -= 1
+        try:
+            ipr.close()
+        except Exception:
+            LOG.debug('Could not close the netlink socket.', exc_info=True)
+
+    @contextlib.contextmanager
+    def connection(self):
+        """Checks a socket out for the enclosed block.
+
+        The socket is replaced if the block fails with ENOBUFS, or with an
+        error raised from it.
+        """
+        ipr = self.checkout()
+        discard = False
+        try:
+            yield ipr
+        except Exception as e:
+            if _is_enobufs(e):
+                LOG.warning('The receive buffer of a netlink socket '
+                            'overflowed, opening a new socket.')
+                discard = True
+            raise
+        finally:
+            self.checkin(ipr, discard)
+
+    def close(self):
+        """Closes the idle sockets and the busy ones once checked in."""
+        self._closed = True
+        while True:
+            try:
+                ipr = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self.checkin(ipr, discard=True)
@@ -0,0 +1,192 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""On-disk journal of the ports bound on the host.
+
+The journal records every port bound by ``port_bind`` until it is unbound by
+``port_unbind``, so that after a crash or a restart the agent knows from the
+local state alone which ports it bound, under which names and in which
+network namespaces, without asking Neutron or dumping the interfaces of the
+host. The journal is an SQLite database in write-ahead logging mode: every
+record is committed in its own transaction and a crash of the process never
+leaves it half written.
+
+A port is recorded as pending before its veth pair is created and as bound
+once its binding succeeded, so its interfaces are never on the host without
+a record of the port. The records left pending by an interrupted bind are
+expired by the reconciliation.
+"""
+
+import collections
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+
+Entry = collections.namedtuple('Entry', ['port_id', 'endpoint_id', 'ifname',
+                                         'peer_name', 'vif_type', 'netns',
+                                         'vif_details_digest', 'updated_at',
+                                         'pending', 'link_kind'])
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS ports (
+    port_id TEXT PRIMARY KEY,
+    endpoint_id TEXT,
+    ifname TEXT NOT NULL,
+    peer_name TEXT NOT NULL,
+    vif_type TEXT NOT NULL,
+    netns TEXT,
+    vif_details_digest TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    pending INTEGER NOT NULL DEFAULT 0,
+    link_kind TEXT
+)
+'''
+
+# The journals created before the pending records and the kinds of the
+# interfaces were added.
+_MIGRATIONS = (
+    ('pending', 'ALTER TABLE ports ADD COLUMN pending INTEGER NOT NULL '
+                'DEFAULT 0'),
+    ('link_kind', 'ALTER TABLE ports ADD COLUMN link_kind TEXT'),
+)
+
+
+def get_vif_details_digest(vif_details):
+    """Returns the SHA-256 digest of the vif_details of a port.
+
+    :param vif_details: the ``binding:vif_details`` dictionary of the port
+    :returns: the hexadecimal digest, independent of the order of the keys
+    """
+    serialized = json.dumps(vif_details or {}, sort_keys=True)
+    return hashlib.sha256(serialized.encode('utf-8')).hexdigest()
+
+
+class Journal(object):
+    """The journal of the bound ports stored in an SQLite database.
+
+    :param path: the path of the database file, created if it does not exist
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False,
+                                           isolation_level=None)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        self._connection.execute(_SCHEMA)
+        columns = set(row[1] for row in self._connection.execute(
+            'PRAGMA table_info(ports)'))
+        for column, statement in _MIGRATIONS:
+            if column not in columns:
+                self._connection.execute(statement)
+
+    def record_bind(self, port_id, endpoint_id, ifname, peer_name, vif_type,
+                    netns=None, vif_details=None, pending=False,
+                    link_kind=None):
+        """Records a bound port, replacing its previous record if any.
+
+        :param port_id:     the ID of the Neutron port
+        :param endpoint_id: the ID of the endpoint as string
+        :param ifname:      the name of the host side of the veth pair
+        :param peer_name:   the name of the peer
+        :param vif_type:    the vif_type of the port
+        :param netns:       the network namespace of the peer, if any
+        :param vif_details: the ``binding:vif_details`` of the port
+        :param pending:     whether the port is being bound
+        :param link_kind:   the kind of the interface of the port, e.g.,
+                            ``veth`` or ``macvlan``
+        """
+        with self._lock:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO ports VALUES '
+                '(?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (port_id, endpoint_id, ifname, peer_name, vif_type, netns,
+                 get_vif_details_digest(vif_details), time.time(),
+                 int(pending), link_kind))
+
+    def record_unbind(self, port_id):
+        """Removes the record of an unbound port.
+
+        :param port_id: the ID of the Neutron port
+        """
+        with self._lock:
+            self._connection.execute('DELETE FROM ports WHERE port_id = ?',
+                                     (port_id,))
+
+    def get(self, port_id):
+        """Returns the ``Entry`` of the port or None if it is not bound."""
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT * FROM ports WHERE port_id = ?',
+                (port_id,)).fetchone()
+        return Entry(*row) if row is not None else None
+
+    def get_entries(self):
+        """Returns the ``Entry`` of every bound port."""
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT * FROM ports ORDER BY port_id').fetchall()
+        return [Entry(*row) for row in rows]
+
+    def get_port_ids(self):
+        """Returns the set of the IDs of the bound and pending ports."""
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT port_id FROM ports').fetchall()
+        return set(row[0] for row in rows)
+
+    def get_pending_port_ids(self, since=None):
+        """Returns the set of the IDs of the ports being bound.
+
+        :param since: the time the ports must have been recorded as pending
+                      after, any time if None
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT port_id FROM ports WHERE pending AND updated_at >= ?',
+                (since or 0,)).fetchall()
+        return set(row[0] for row in rows)
+
+    def expire_pending(self, before, kept=()):
+        """Removes the records of the ports pending since before a time.
+
+        The ports recorded as pending for too long are the leftovers of
+        binds that were interrupted, e.g., by a crash.
+
+        :param before: the time the ports were recorded as pending before
+        :param kept:   the IDs of the ports whose record is kept anyway,
+                       e.g., because they are still being bound
+        :returns: the set of the IDs of the ports whose record was removed
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT port_id FROM ports WHERE pending AND updated_at < ?',
+                (before,)).fetchall()
+            expired = set(row[0] for row in rows).difference(kept)
+            for port_id in expired:
+                self._connection.execute(
+                    'DELETE FROM ports WHERE port_id = ? AND pending',
+                    (port_id,))
+        return expired
+
+    def compact(self):
+        """Folds the write-ahead log into the database file."""
+        with self._lock:
+            self._connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
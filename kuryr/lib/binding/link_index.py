@@ -0,0 +1,183 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""In-process index of the host network interfaces.
+
+The index is filled by a single link dump and then kept up to date with the
+RTM_NEWLINK and RTM_DELLINK notifications of the RTNLGRP_LINK netlink
+multicast group, so looking an interface up by its name does not require
+dumping the whole link table of the host.
+
+The notifications are processed a little after the changes they report.
+The links deleted by the process are dropped from the index by the same
+call, and a link just created is looked up among the links notified after
+its creation was requested, so neither is confused with the link that
+had its name before.
+"""
+
+import errno
+import threading
+import time
+
+from oslo_log import log
+import pyroute2
+from pyroute2.netlink import rtnl
+
+
+LOG = log.getLogger(__name__)
+
+IFF_UP = 0x1
+RTM_NEWLINK = 'RTM_NEWLINK'
+RTM_DELLINK = 'RTM_DELLINK'
+
+
+class LinkIndex(object):
+    """Maps the names of the host interfaces to their index and flags."""
+
+    def __init__(self):
+        self._links = {}
+        self._names = {}
+        # The indexes of the links deleted by the process whose RTM_DELLINK
+        # was not processed yet.
+        self._deleted = set()
+        self._sequence = 0
+        self._cond = threading.Condition()
+        self._events = None
+        self._thread = None
+        self._running = False
+
+    def start(self):
+        """Subscribes to the link notifications and fills the index up.
+
+        The notifications socket is bound before the initial dump is done so
+        that no change happening in between is lost.
+        """
+        self._events = pyroute2.IPRoute()
+        self._events.bind(groups=rtnl.RTMGRP_LINK)
+        self._resync()
+        self._running = True
+        self._thread = threading.Thread(target=self._watch,
+                                        name='kuryr-link-index')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stops following the link notifications."""
+        self._running = False
+        if self._events is not None:
+            self._events.close()
+            self._events = None
+
+    def _resync(self):
+        ipr = pyroute2.IPRoute()
+        try:
+            links = ipr.get_links()
+        finally:
+            ipr.close()
+        with self._cond:
+            self._links.clear()
+            self._names.clear()
+            self._deleted.clear()
+            for link in links:
+                self._update(link)
+            self._cond.notify_all()
+
+    def _update(self, msg):
+        index = msg['index']
+        old_name = self._names.pop(index, None)
+        if old_name is not None:
+            self._links.pop(old_name, None)
+        if msg['event'] == RTM_DELLINK:
+            self._deleted.discard(index)
+            return
+        if index in self._deleted:
+            return
+        ifname = msg.get_attr('IFLA_IFNAME')
+        self._sequence += 1
+        self._names[index] = ifname
+        self._links[ifname] = (index, msg['flags'], self._sequence)
+
+    def _watch(self):
+        while self._running:
+            try:
+                msgs = self._events.get()
+            except (OSError, pyroute2.NetlinkError) as e:
+                if not self._running:
+                    return
+                if getattr(e, 'errno', None) == errno.ENOBUFS or (
+                        getattr(e, 'code', None) == errno.ENOBUFS):
+                    # Notifications were dropped by the kernel, the index can
+                    # only be trusted again after a new dump.
+                    LOG.warning('Link notifications were lost, '
+                                'resynchronizing the link index.')
+                    self._resync()
+                    continue
+                LOG.exception('Stopped following the link notifications.')
+                return
+            with self._cond:
+                for msg in msgs:
+                    if msg.get('event') in (RTM_NEWLINK, RTM_DELLINK):
+                        self._update(msg)
+                self._cond.notify_all()
+
+    @property
+    def sequence(self):
+        """The number of the last link notification processed.
+
+        It is meant to be read before creating a link and passed to
+        ``lookup`` to wait for the notification of the new link.
+        """
+        with self._cond:
+            return self._sequence
+
+    def forget(self, index):
+        """Drops a link the process deleted from the index.
+
+        The notifications of the link processed until its RTM_DELLINK are
+        ignored.
+
+        :param index: the index of the deleted link
+        """
+        with self._cond:
+            ifname = self._names.pop(index, None)
+            if ifname is not None:
+                self._links.pop(ifname, None)
+            self._deleted.add(index)
+
+    def lookup(self, ifname, timeout=0, since=None):
+        """Returns the index of the interface with the given name.
+
+        :param ifname:  the name of the interface
+        :param timeout: seconds to wait for the interface to show up, useful
+                        right after it was created
+        :param since:   the ``sequence`` the interface must have been
+                        notified after, e.g., read before creating it
+        :returns: the index of the interface or None if it does not exist
+        """
+        deadline = time.time() + timeout
+        with self._cond:
+            while True:
+                link = self._links.get(ifname)
+                if link is not None and (since is None or link[2] > since):
+                    return link[0]
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+
+    def is_up(self, ifname):
+        """Returns whether the interface with the given name is up."""
+        with self._cond:
+            link = self._links.get(ifname)
+        if link is None:
+            return False
+        return bool(link[1] & IFF_UP)
@@ -0,0 +1,212 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Handles of the network namespaces of the containers.
+
+A handle keeps the network namespace file open, so the veth peers can be
+created in the namespace by file descriptor, and a netlink socket opened in
+the namespace, so their addresses, routes and state can be configured there.
+The handles are kept in a small LRU cache since the ports of a container are
+usually bound in a row.
+"""
+
+import collections
+import contextlib
+import os
+import threading
+
+from oslo_log import log
+import pyroute2
+from pyroute2 import netns as pyroute2_netns
+
+from kuryr.lib import utils
+
+
+LOG = log.getLogger(__name__)
+
+
+def get_netns_path(netns):
+    """Returns the path of the network namespace file.
+
+    :param netns: the path of the namespace file or the name of a Docker
+                  network namespace, i.e., a file in
+                  ``utils.DOCKER_NETNS_BASE``
+    :returns: the absolute path of the namespace file
+    """
+    if os.path.isabs(netns):
+        return netns
+    return os.path.join(utils.DOCKER_NETNS_BASE, netns)
+
+
+def _open_iproute(netns_fd):
+    # setns only moves the calling thread, the socket created by a
+    # short-lived thread stays in the namespace once the thread is gone.
+    result = {}
+
+    def _open():
+        try:
+            pyroute2_netns.setns(netns_fd)
+            result['iproute'] = pyroute2.IPRoute()
+        except Exception as e:
+            result['error'] = e
+
+    thread = threading.Thread(target=_open, name='kuryr-netns')
+    thread.start()
+    thread.join()
+    if 'error' in result:
+        raise result['error']
+    return result['iproute']
+
+
+class NetnsHandle(object):
+    """The open file and netlink socket of a network namespace.
+
+    The handle is counted out of the cache by its users and is only closed
+    once it is out of the cache and no user holds it any more, so its file
+    descriptor cannot be reused for another namespace while it is in use.
+
+    :param path: the path of the namespace file
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.fd = os.open(path, os.O_RDONLY)
+        self._ino = os.fstat(self.fd).st_ino
+        self._iproute = None
+        self._iproute_lock = threading.Lock()
+        self._users = 0
+        self._retired = False
+
+    @property
+    def iproute(self):
+        """The ``pyroute2.IPRoute`` opened in the namespace."""
+        with self._iproute_lock:
+            if self._iproute is None:
+                self._iproute = _open_iproute(self.fd)
+            return self._iproute
+
+    def is_current(self):
+        """Returns whether the path still refers to the open namespace.
+
+        The namespace file of a restarted container is bind-mounted again
+        at the same path for a new namespace.
+        """
+        try:
+            return os.stat(self.path).st_ino == self._ino
+        except OSError:
+            return False
+
+    def close(self):
+        with self._iproute_lock:
+            if self._iproute is not None:
+                self._iproute.close()
+                self._iproute = None
+        os.close(self.fd)
+
+
+class NetnsCache(object):
+    """LRU cache of the handles of the network namespaces.
+
+    The handles are taken with ``checkout`` and given back with ``checkin``,
+    or with the ``use`` context manager. A handle evicted or invalidated
+    while it is checked out is closed by its last ``checkin``.
+
+    :param maxsize: the maximum number of handles kept open
+    """
+
+    def __init__(self, maxsize):
+        self._maxsize = maxsize
+        self._handles = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def _retire(self, handle):
+        # Must be called with the lock held, returns the handle to close.
+        handle._retired = True
+        if handle._users == 0:
+            return handle
+        return None
+
+    @staticmethod
+    def _close(handles):
+        for handle in handles:
+            if handle is not None:
+                handle.close()
+
+    def checkout(self, netns):
+        """Takes the handle of the network namespace, opening it if needed.
+
+        The handle must be given back with ``checkin``.
+
+        :param netns: the path or the Docker name of the namespace
+        :returns: the ``NetnsHandle`` of the namespace
+        :raises: OSError if the namespace file cannot be opened
+        """
+        path = get_netns_path(netns)
+        closed = []
+        try:
+            with self._lock:
+                handle = self._handles.pop(path, None)
+                if handle is not None and not handle.is_current():
+                    closed.append(self._retire(handle))
+                    handle = None
+                if handle is None:
+                    handle = NetnsHandle(path)
+                handle._users += 1
+                self._handles[path] = handle
+                while len(self._handles) > self._maxsize:
+                    _, evicted = self._handles.popitem(last=False)
+                    closed.append(self._retire(evicted))
+                return handle
+        finally:
+            self._close(closed)
+
+    def checkin(self, handle):
+        """Gives back a handle taken with ``checkout``.
+
+        :param handle: the ``NetnsHandle`` returned by ``checkout``
+        """
+        with self._lock:
+            handle._users -= 1
+            if not (handle._retired and handle._users == 0):
+                return
+        handle.close()
+
+    @contextlib.contextmanager
+    def use(self, netns):
+        """Checks the handle of the network namespace out for the block.
+
+        :param netns: the path or the Docker name of the namespace
+        :raises: OSError if the namespace file cannot be opened
+        """
+        handle = self.checkout(netns)
+        try:
+            yield handle
+        finally:
+            self.checkin(handle)
+
+    def invalidate(self, netns):
+        """Drops the handle of the network namespace, if it is cached.
+
+        The handle is closed once it is no longer checked out.
+        """
+        with self._lock:
+            handle = self._handles.pop(get_netns_path(netns), None)
+            if handle is not None:
+                handle = self._retire(handle)
+        self._close([handle])
+
+    def clear(self):
+        with self._lock:
+            handles = [self._retire(handle)
+                       for handle in self._handles.values()]
+            self._handles.clear()
+        self._close(handles)
@@ -0,0 +1,189 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""What binding a Neutron port needs, derived once from the Neutron data.
+
+Binding, unbinding and retrying a port all need the names of its veth pair,
+its addresses with their prefix lengths, its gateways, its MTU, its MAC
+address and its vif_details in the form passed to the binding executables.
+A ``BindingPlan`` derives them once from the port, subnet and network
+dictionaries of python-neutronclient so they can be passed around or cached
+instead of being derived again by every call.
+"""
+
+import netaddr
+from oslo_config import cfg
+
+from kuryr.lib import utils
+
+
+DATAPATH_PROFILE_KEY = 'kuryr_datapath_profile'
+DEFAULT_NETWORK_MTU = 1500
+FALLBACK_VIF_TYPE = 'unbound'
+FIXED_IP_KEY = 'fixed_ips'
+IP_ADDRESS_KEY = 'ip_address'
+KIND_IPVLAN = 'ipvlan'
+KIND_MACVLAN = 'macvlan'
+KIND_VETH = 'veth'
+LINK_KIND_KEY = 'kuryr_link_kind'
+MAC_ADDRESS_KEY = 'mac_address'
+SUBNET_ID_KEY = 'subnet_id'
+SUB_INTERFACE_KINDS = (KIND_IPVLAN, KIND_MACVLAN)
+UPLINK_KEY = 'kuryr_uplink'
+VIF_TYPE_KEY = 'binding:vif_type'
+VIF_DETAILS_KEY = 'binding:vif_details'
+
+
+def get_ip_addresses(neutron_port, subnets_dict):
+    """Returns the addresses to be set on the container side of the veth.
+
+    :param neutron_port: a port dictionary returned from python-neutronclient
+    :param subnets_dict: the subnets of the network of the port by ID
+    :returns: a tuple of tuples of the IP address and its prefix length. The
+              prefix length is None when it is embedded in the address
+    """
+    fixed_ips = neutron_port.get(FIXED_IP_KEY, [])
+    if not fixed_ips and (IP_ADDRESS_KEY in neutron_port):
+        return ((neutron_port[IP_ADDRESS_KEY], None),)
+    ip_addresses = []
+    for fixed_ip in fixed_ips:
+        if IP_ADDRESS_KEY in fixed_ip and (SUBNET_ID_KEY in fixed_ip):
+            subnet = subnets_dict[fixed_ip[SUBNET_ID_KEY]]
+            cidr = netaddr.IPNetwork(subnet['cidr'])
+            ip_addresses.append((fixed_ip[IP_ADDRESS_KEY], cidr.prefixlen))
+    return tuple(ip_addresses)
+
+
+def get_gateways(neutron_port, subnets_dict):
+    """Returns the gateways of the subnets of the port, one per IP version.
+
+    :param neutron_port: a port dictionary returned from python-neutronclient
+    :param subnets_dict: the subnets of the network of the port by ID
+    :returns: a tuple of the gateway addresses sorted by IP version
+    """
+    gateways = {}
+    for fixed_ip in neutron_port.get(FIXED_IP_KEY, []):
+        subnet = subnets_dict.get(fixed_ip.get(SUBNET_ID_KEY))
+        if not subnet or not subnet.get('gateway_ip'):
+            continue
+        version = netaddr.IPAddress(subnet['gateway_ip']).version
+        gateways.setdefault(version, subnet['gateway_ip'])
+    return tuple(gateways[version] for version in sorted(gateways))
+
+
+def get_network_tag(neutron_network, key):
+    """Returns the value of the ``<key>=<value>`` tag of the network.
+
+    :param neutron_network: a network dictionary returned from
+                            python-neutronclient, or None
+    :param key:             the key of the tag, e.g., ``kuryr_link_kind``
+    :returns: the value of the first tag with the key, or None
+    """
+    prefix = key + '='
+    for tag in (neutron_network or {}).get('tags') or ():
+        if tag.startswith(prefix):
+            return tag[len(prefix):]
+    return None
+
+
+def get_mtu(neutron_network):
+    if neutron_network is None:
+        return DEFAULT_NETWORK_MTU
+    return neutron_network.get('mtu', DEFAULT_NETWORK_MTU)
+
+
+class BindingPlan(object):
+    """The data derived from a Neutron port to bind or unbind it.
+
+    The subnets and the network are only needed to configure the veth pair
+    and can be omitted to unbind the port. The kind of the interface and the
+    uplink of the sub-interfaces are the given ones, otherwise taken from
+    the ``kuryr_link_kind`` and ``kuryr_uplink`` keys of the vif_details of
+    the port, from the ``kuryr_link_kind=<kind>`` and
+    ``kuryr_uplink=<interface>`` tags of the network or from the
+    ``[binding]`` options, in that order. The name of the datapath profile
+    is taken from the ``kuryr_datapath_profile`` key of the vif_details, or
+    from the ``[binding]`` options.
+
+    :param neutron_port:    a port dictionary returned from
+                            python-neutronclient
+    :param neutron_subnets: a list of all subnets under network to which the
+                            port belongs
+    :param neutron_network: the network the port belongs to
+    :param link_kind:       the kind of the interface of the port, i.e.,
+                            ``veth``, ``ipvlan`` or ``macvlan``
+    :param uplink:          the host interface of the sub-interface
+    """
+
+    # Only the fields of the port read by the binding and the unbinding are
+    # kept, not the port itself, so the cached plans stay small.
+    __slots__ = ('port_id', 'vif_type', 'ifname', 'peer_name', 'mac_address',
+                 'fixed_ips', 'device_owner', 'network_id', 'tenant_id',
+                 'ip_addresses', 'gateways', 'mtu', 'raw_vif_details',
+                 'vif_details', 'link_kind', 'uplink', 'datapath_profile')
+
+    def __init__(self, neutron_port, neutron_subnets=None,
+                 neutron_network=None, link_kind=None, uplink=None):
+        subnets_dict = {subnet['id']: subnet
+                        for subnet in neutron_subnets or ()}
+        self.port_id = neutron_port['id']
+        self.vif_type = neutron_port.get(VIF_TYPE_KEY, FALLBACK_VIF_TYPE)
+        self.ifname, self.peer_name = utils.get_veth_pair_names(self.port_id)
+        self.mac_address = neutron_port[MAC_ADDRESS_KEY].lower()
+        self.fixed_ips = neutron_port.get(FIXED_IP_KEY, [])
+        self.device_owner = neutron_port.get('device_owner')
+        self.network_id = neutron_port.get('network_id')
+        self.tenant_id = neutron_port.get('tenant_id')
+        if neutron_subnets is None:
+            self.ip_addresses = ()
+            self.gateways = ()
+        else:
+            self.ip_addresses = get_ip_addresses(neutron_port, subnets_dict)
+            self.gateways = get_gateways(neutron_port, subnets_dict)
+        self.mtu = get_mtu(neutron_network)
+        self.raw_vif_details = neutron_port.get(VIF_DETAILS_KEY)
+        vif_details = self.raw_vif_details or {}
+        self.vif_details = utils.string_mappings(vif_details)
+        self.link_kind = (
+            link_kind or vif_details.get(LINK_KIND_KEY) or
+            get_network_tag(neutron_network, LINK_KIND_KEY) or
+            cfg.CONF.binding.link_kind)
+        self.uplink = (
+            uplink or vif_details.get(UPLINK_KEY) or
+            get_network_tag(neutron_network, UPLINK_KEY) or
+            cfg.CONF.binding.uplink_interface)
+        self.datapath_profile = vif_details.get(
+            DATAPATH_PROFILE_KEY, cfg.CONF.binding.datapath_profile)
+
+    def get_port(self):
+        """Returns a port dictionary with the fields kept by the plan.
+
+        It is what the binding drivers that do not take the plan are given.
+        """
+        return {'id': self.port_id,
+                MAC_ADDRESS_KEY: self.mac_address,
+                FIXED_IP_KEY: self.fixed_ips,
+                'device_owner': self.device_owner,
+                'network_id': self.network_id,
+                'tenant_id': self.tenant_id,
+                VIF_TYPE_KEY: self.vif_type,
+                VIF_DETAILS_KEY: self.raw_vif_details}
+
+    @property
+    def is_sub_interface(self):
+        """Whether the port is given an ipvlan or macvlan sub-interface."""
+        return self.link_kind in SUB_INTERFACE_KINDS
+
+    def __repr__(self):
+        return ('<BindingPlan port_id={0} vif_type={1} ifname={2} '
+                'link_kind={3}>'.format(self.port_id, self.vif_type,
+                                        self.ifname, self.link_kind))
@@ -0,0 +1,319 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Garbage collection of the leftovers of the ports no longer bound.
+
+The veth pairs and OVS ports of the ports that should not be bound anymore,
+e.g., after the agent crashed in the middle of unbinding them, are found
+with a single dump of the host links and a read of the OVSDB replica of the
+in-process ``ovs`` driver, or a single ``ovs-vsctl find`` when the ports are
+plugged by the ``ovs`` binding executable, then removed in rate-limited
+batches.
+"""
+
+import collections
+import errno
+import json
+import sqlite3
+import time
+
+from oslo_concurrency import processutils
+from oslo_config import cfg
+from oslo_log import log
+import pyroute2
+
+from kuryr.lib import binding
+from kuryr.lib.binding import plan
+from kuryr.lib import constants
+from kuryr.lib import exceptions
+from kuryr.lib import metrics
+from kuryr.lib import utils
+
+
+LOG = log.getLogger(__name__)
+
+# The kinds of the host interfaces named after the Neutron ports.
+_PORT_LINK_KINDS = (binding.KIND_VETH,) + plan.SUB_INTERFACE_KINDS
+# The owner external ID set on the OVS interfaces plugged by kuryr.
+OVS_OWNER = 'kuryr'
+
+OvsInterface = collections.namedtuple('OvsInterface',
+                                      ['uuid', 'name', 'iface_id', 'owner'])
+
+
+def _get_kind(link):
+    linkinfo = link.get_attr('IFLA_LINKINFO')
+    if not linkinfo:
+        return None
+    return linkinfo.get_attr('IFLA_INFO_KIND')
+
+
+def _batches(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _execute_vsctl(*args):
+    return processutils.execute(
+        'ovs-vsctl', '--timeout={0}'.format(cfg.CONF.binding.ovsdb_timeout),
+        *args, run_as_root=True,
+        root_helper=cfg.CONF.binding.root_helper or None)
+
+
+class VsctlOvsPorts(object):
+    """Finds and removes the OVS interfaces plugged by kuryr with ovs-vsctl.
+
+    It stands in for the in-process ``ovs`` driver when the ports are plugged
+    by the ``ovs`` binding executable, which sets the same owner external ID
+    on the interfaces.
+    """
+
+    def get_owned_interfaces(self):
+        """Returns the OVS interfaces plugged by kuryr.
+
+        :returns: a list of ``OvsInterface``, empty if they could not be read
+        """
+        try:
+            stdout, _ = _execute_vsctl(
+                '--format=json', '--columns=_uuid,name,external_ids', 'find',
+                'Interface', 'external_ids:owner={0}'.format(OVS_OWNER))
+            interfaces = []
+            for row_uuid, name, external_ids in json.loads(stdout)['data']:
+                # The maps are encoded as ["map", [[key, value], ...]].
+                external_ids = dict(external_ids[1])
+                interfaces.append(OvsInterface(
+                    row_uuid[1], name, external_ids.get('iface-id'),
+                    external_ids.get('owner')))
+        except (processutils.ProcessExecutionError, OSError, ValueError,
+                KeyError, IndexError):
+            LOG.warning('Could not find the OVS interfaces plugged by kuryr.',
+                        exc_info=True)
+            return []
+        return interfaces
+
+    @staticmethod
+    def get_link_names(interface):
+        """Returns the names of the links created along the OVS interface.
+
+        :param interface: an ``OvsInterface`` plugged by kuryr
+        :returns: the names of the hybrid plug bridge and of its veth when
+                  the interface was plugged through one, otherwise an empty
+                  list
+        """
+        if not interface.iface_id:
+            return []
+        br_name, veth_lb, veth_ovs = utils.get_hybrid_plug_names(
+            interface.iface_id)
+        if interface.name != veth_ovs:
+            return []
+        return [veth_lb, br_name]
+
+    def unplug(self, port_names):
+        """Unplugs the OVS ports in a single transaction.
+
+        :param port_names: the names of the ports to unplug
+        :raises: kuryr.common.exceptions.BindingFailure
+        """
+        args = []
+        for port_name in port_names:
+            args.extend(('--', '--if-exists', 'del-port', port_name))
+        try:
+            _execute_vsctl(*args)
+        except (processutils.ProcessExecutionError, OSError) as e:
+            raise exceptions.BindingFailure(
+                'Could not unplug {0}: {1}'.format(', '.join(port_names), e))
+
+
+class Reconciler(object):
+    """Removes the veth pairs and OVS ports of the ports not bound anymore.
+
+    Only the veth, ipvlan and macvlan interfaces named after a Neutron port
+    are considered, so the pairs of the veth pool and the tap devices of
+    other services are left alone. Only the OVS interfaces whose owner is
+    kuryr are.
+
+    :param ipr:            the ``pyroute2.IPRoute`` instance of the host
+    :param ovs_driver:     the in-process ``ovs`` binding driver or the
+                           ``VsctlOvsPorts`` whose OVS interfaces are
+                           reconciled too, if any
+    :param batch_size:     the number of removals done before pausing
+    :param batch_interval: seconds to pause between two batches
+    """
+
+    def __init__(self, ipr, ovs_driver=None, batch_size=20,
+                 batch_interval=0.5):
+        self._ipr = ipr
+        self._ovs_driver = ovs_driver
+        self._batch_size = batch_size
+        self._batch_interval = batch_interval
+
+    def find_strays(self, port_ids):
+        """Returns the links and OVS ports of the ports not in port_ids.
+
+        :param port_ids: the IDs of the Neutron ports that should be bound,
+                         including the ones being bound, or a callable
+                         returning them. The callable is called once the
+                         links and OVS ports are read, so a port whose
+                         binding started before it is not missed
+        :returns: the tuple of the dictionary mapping the names of the stray
+                  links to their index and of the list of the names of the
+                  stray OVS ports
+        """
+        host_links = list(self._ipr.get_links())
+        interfaces = []
+        if self._ovs_driver is not None:
+            interfaces = list(self._ovs_driver.get_owned_interfaces())
+        port_ids = set(port_ids() if callable(port_ids) else port_ids)
+        ifnames = set(utils.get_veth_pair_names(port_id)[0]
+                      for port_id in port_ids)
+        links = {}
+        stray_links = {}
+        for link in host_links:
+            name = link.get_attr('IFLA_IFNAME')
+            links[name] = link['index']
+            if (name.startswith(constants.VETH_PREFIX) and
+                    name not in ifnames and
+                    _get_kind(link) in _PORT_LINK_KINDS):
+                stray_links[name] = link['index']
+
+        stray_ports = []
+        if self._ovs_driver is not None:
+            for interface in interfaces:
+                if interface.iface_id in port_ids:
+                    continue
+                stray_ports.append(interface.name)
+                for name in self._ovs_driver.get_link_names(interface):
+                    if name in links:
+                        stray_links[name] = links[name]
+        return stray_links, stray_ports
+
+    def _pause(self):
+        if self._batch_interval > 0:
+            time.sleep(self._batch_interval)
+
+    def reconcile(self, port_ids):
+        """Removes the links and OVS ports of the ports not in port_ids.
+
+        The failures to remove a link or a batch of OVS ports are logged and
+        do not stop the reconciliation.
+
+        :param port_ids: the IDs of the Neutron ports that should be bound,
+                         including the ones being bound, or a callable
+                         returning them, see ``find_strays``
+        :returns: the tuple of the sorted names of the removed links and of
+                  the removed OVS ports
+        """
+        stray_links, stray_ports = self.find_strays(port_ids)
+        removed_ports = []
+        removed_links = []
+        first = True
+        for batch in _batches(sorted(stray_ports), self._batch_size):
+            if not first:
+                self._pause()
+            first = False
+            try:
+                with metrics.timed(metrics.CLEANUP, 'ovs'):
+                    self._ovs_driver.unplug(batch)
+            except exceptions.BindingFailure:
+                LOG.exception('Could not remove the stray OVS ports %s.',
+                              ', '.join(batch))
+                continue
+            removed_ports.extend(batch)
+
+        for batch in _batches(sorted(stray_links.items()), self._batch_size):
+            if not first:
+                self._pause()
+            first = False
+            with metrics.timed(metrics.CLEANUP):
+                for name, index in batch:
+                    try:
+                        self._ipr.link('del', index=index)
+                    except pyroute2.NetlinkError as e:
+                        # Deleting one end of a veth pair removes the other.
+                        if e.code != errno.ENODEV:
+                            LOG.warning('Could not remove the stray link '
+                                        '%(name)s: %(error)s',
+                                        {'name': name, 'error': e})
+                            continue
+                    removed_links.append(name)
+
+        if removed_links or removed_ports:
+            LOG.info('Removed %(links)d stray links and %(ports)d stray OVS '
+                     'ports.', {'links': len(removed_links),
+                                'ports': len(removed_ports)})
+        return removed_links, removed_ports
+
+
+def reconcile(port_ids):
+    """Removes the leftovers of the ports that should not be bound.
+
+    The ports being bound, ensured or unbound by this process and the ports
+    recorded as pending in the journal of the bound ports for less than
+    ``[binding] journal_pending_timeout`` seconds are kept as well. The
+    records pending for longer are the leftovers of interrupted binds, they
+    are removed and so are the interfaces of their ports. The journal alone
+    is not a complete list of the ports to keep, the ports bound before it
+    was enabled are not in it. The journal is compacted once done.
+
+    The OVS ports are reconciled when the ``ovs`` vif_type is bound, through
+    the in-process driver when it is loaded and with ``ovs-vsctl``
+    otherwise. The removals are rate-limited by the
+    ``[binding] reconcile_batch_size`` and ``reconcile_batch_interval``
+    options.
+
+    :param port_ids: the IDs of the Neutron ports that should be bound on the
+                     host
+    :returns: the tuple of the sorted names of the removed links and of the
+              removed OVS ports
+    """
+    port_ids = set(port_ids)
+    port_journal = binding.get_journal()
+
+    def get_port_ids():
+        kept = port_ids | binding.get_in_flight_port_ids()
+        if port_journal is None:
+            return kept
+        deadline = time.time() - cfg.CONF.binding.journal_pending_timeout
+        try:
+            kept |= port_journal.get_pending_port_ids(since=deadline)
+            expired = port_journal.expire_pending(deadline, kept)
+        except sqlite3.Error:
+            # The ports being bound by another process could be taken for
+            # strays.
+            raise exceptions.KuryrException(
+                'Could not read the pending ports from the journal.')
+        if expired:
+            LOG.info('Expired the pending ports %s of interrupted binds.',
+                     ', '.join(sorted(expired)))
+        return kept
+
+    ovs_driver = binding.get_driver('ovs')
+    if ovs_driver is not None and not hasattr(ovs_driver,
+                                              'get_owned_interfaces'):
+        # The ports are plugged by the ovs binding executable.
+        ovs_driver = VsctlOvsPorts()
+    # The socket shared by the binds is not safe to use from another thread
+    # at the same time, the pass gets a socket of its own.
+    ipr = pyroute2.IPRoute()
+    try:
+        reconciler = Reconciler(ipr, ovs_driver,
+                                cfg.CONF.binding.reconcile_batch_size,
+                                cfg.CONF.binding.reconcile_batch_interval)
+        removed = reconciler.reconcile(get_port_ids)
+    finally:
+        ipr.close()
+    if port_journal is not None:
+        try:
+            port_journal.compact()
+        except sqlite3.Error:
+            LOG.warning('Could not compact the journal.', exc_info=True)
+    return removed
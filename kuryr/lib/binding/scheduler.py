@@ -0,0 +1,202 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Admission control of the binding operations.
+
+A burst of binds otherwise runs all their executables and netlink requests
+at once, and every one of them gets slow as the CPUs, ovs-vswitchd and the
+RTNL lock of the kernel are contended. The scheduler limits the number of
+operations running at once per vif_type and queues the others, unbinds
+first since they free resources. An operation is refused when the queue is
+full or when it waited for longer than the admission timeout, so the
+latency of the admitted ones stays bounded.
+"""
+
+import contextlib
+from concurrent import futures
+import heapq
+import itertools
+import threading
+import time
+
+from kuryr.lib import exceptions
+from kuryr.lib import metrics
+
+
+UNBIND_PRIORITY = 0
+BIND_PRIORITY = 1
+
+
+class _Slots(object):
+
+    __slots__ = ('limit', 'active', 'waiters')
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.active = 0
+        self.waiters = []
+
+
+class BindingScheduler(object):
+    """Limits the concurrent binding operations per vif_type.
+
+    :param limit:      the maximum number of operations running at once for
+                       the vif_types without a limit of their own
+    :param limits:     a dictionary of the limits of some vif_types
+    :param max_queued: the maximum number of operations waiting for a slot,
+                       unbounded if 0
+    :param timeout:    seconds an operation waits for a slot before being
+                       refused, unbounded if None
+    """
+
+    def __init__(self, limit, limits=None, max_queued=0, timeout=None):
+        self._limit = limit
+        self._limits = limits or {}
+        self._max_queued = max_queued
+        self._timeout = timeout
+        self._slots = {}
+        self._queued = 0
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+
+    def _get_slots(self, vif_type):
+        slots = self._slots.get(vif_type)
+        if slots is None:
+            slots = _Slots(self._limits.get(vif_type, self._limit))
+            self._slots[vif_type] = slots
+        return slots
+
+    @property
+    def timeout(self):
+        """The seconds an operation waits for a slot, unbounded if None."""
+        return self._timeout
+
+    def _enqueue(self, slots, vif_type, priority, future=None):
+        if self._max_queued and self._queued >= self._max_queued:
+            raise exceptions.BindingAdmissionFailure(
+                'The queue of the binding operations is full.')
+        # The waiters are ordered by priority and then by arrival, the third
+        # element is set once the waiter is given a slot and the last one is
+        # the future of the waiters which do not block.
+        waiter = [priority, next(self._sequence), False, future]
+        heapq.heappush(slots.waiters, waiter)
+        self._queued += 1
+        metrics.get_sink().gauge(metrics.QUEUE_DEPTH, vif_type,
+                                 len(slots.waiters))
+        return waiter
+
+    def _dequeue(self, slots, vif_type, waiter):
+        slots.waiters.remove(waiter)
+        heapq.heapify(slots.waiters)
+        self._queued -= 1
+        metrics.get_sink().gauge(metrics.QUEUE_DEPTH, vif_type,
+                                 len(slots.waiters))
+
+    def _acquire(self, vif_type, priority):
+        start = time.time()
+        with self._cond:
+            slots = self._get_slots(vif_type)
+            if slots.active < slots.limit and not slots.waiters:
+                slots.active += 1
+                return
+            waiter = self._enqueue(slots, vif_type, priority)
+            while not waiter[2]:
+                remaining = None
+                if self._timeout is not None:
+                    remaining = start + self._timeout - time.time()
+                    if remaining <= 0:
+                        self._dequeue(slots, vif_type, waiter)
+                        raise exceptions.BindingAdmissionFailure(
+                            'No binding slot for the vif_type {0} was free '
+                            'within {1} seconds.'.format(vif_type,
+                                                         self._timeout))
+                self._cond.wait(remaining)
+
+    def release(self, vif_type):
+        """Gives the slot of the vif_type back, e.g., to the next waiter.
+
+        :param vif_type: the vif_type the slot was given for
+        """
+        with self._cond:
+            slots = self._slots[vif_type]
+            if slots.waiters:
+                # The slot is handed over to the first waiter.
+                waiter = heapq.heappop(slots.waiters)
+                self._queued -= 1
+                metrics.get_sink().gauge(metrics.QUEUE_DEPTH, vif_type,
+                                         len(slots.waiters))
+                waiter[2] = True
+                if waiter[3] is not None:
+                    waiter[3].set_result(None)
+                self._cond.notify_all()
+            else:
+                slots.active -= 1
+
+    def request(self, vif_type, priority=BIND_PRIORITY):
+        """Requests a slot of the vif_type without waiting for it.
+
+        It is meant for the callers which cannot block, e.g., coroutines.
+        The slot is queued for like ``admit`` does, and must be given back
+        with ``release`` once it is given, or with ``cancel`` if the caller
+        gives up on it. The admission timeout is left to the caller.
+
+        :param vif_type: the vif_type of the port to bind or unbind
+        :param priority: ``UNBIND_PRIORITY`` or ``BIND_PRIORITY``
+        :returns: a ``concurrent.futures.Future`` whose result is set once
+                  the slot is given
+        :raises: kuryr.lib.exceptions.BindingAdmissionFailure
+        """
+        future = futures.Future()
+        with self._cond:
+            slots = self._get_slots(vif_type)
+            if slots.active < slots.limit and not slots.waiters:
+                slots.active += 1
+                future.set_result(None)
+            else:
+                self._enqueue(slots, vif_type, priority, future)
+        return future
+
+    def cancel(self, vif_type, future):
+        """Gives up on the slot requested with ``request``.
+
+        The slot is given back if it was already given.
+
+        :param vif_type: the vif_type the slot was requested for
+        :param future:   the future returned by ``request``
+        """
+        with self._cond:
+            slots = self._slots[vif_type]
+            for waiter in slots.waiters:
+                if waiter[3] is future:
+                    self._dequeue(slots, vif_type, waiter)
+                    return
+        self.release(vif_type)
+
+    @contextlib.contextmanager
+    def admit(self, vif_type, priority=BIND_PRIORITY):
+        """Runs the enclosed block once a slot of the vif_type is free.
+
+        The time spent waiting for the slot is reported as the
+        ``queue_wait`` phase and the number of waiters as the
+        ``queue_depth`` gauge.
+
+        :param vif_type: the vif_type of the port the block binds or unbinds
+        :param priority: ``UNBIND_PRIORITY`` or ``BIND_PRIORITY``, the
+                         waiters with the lowest value are admitted first
+        :raises: kuryr.lib.exceptions.BindingAdmissionFailure
+        """
+        with metrics.timed(metrics.QUEUE_WAIT, vif_type):
+            self._acquire(vif_type, priority)
+        try:
+            yield
+        finally:
+            self.release(vif_type)
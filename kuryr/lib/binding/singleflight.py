@@ -0,0 +1,121 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Coalescing of the concurrent operations on the same port.
+
+Front-ends retrying or receiving duplicate events may bind the same port
+twice at once, and the two binds then race on the same veth pair, up to the
+cleanup of the one failing tearing down the veth pair of the other. The
+operations on a port are run one at a time in the order they were
+requested, and a request for the same operation as the last one requested
+for the port, still pending or running, shares its outcome instead of being
+run again.
+"""
+
+import collections
+from concurrent import futures
+import threading
+
+
+class SingleFlight(object):
+    """Runs the operations on each key one at a time, sharing duplicates."""
+
+    def __init__(self):
+        self._flights = collections.defaultdict(collections.deque)
+        self._lock = threading.Lock()
+
+    def do(self, key, operation, func, *args, **kwargs):
+        """Runs the operation on the key unless the same one is requested.
+
+        :param key:       the key the operations are serialized on, e.g.,
+                          the ID of the port
+        :param operation: the name of the operation, the requests with the
+                          same name are coalesced
+        :param func:      the function performing the operation
+        :returns: the value returned by ``func``, possibly by the call of
+                  another thread
+        :raises: the exception raised by ``func``, possibly in the call of
+                 another thread
+        """
+        flight, future = self.enter(key, operation)
+        if flight is None:
+            return future.result()
+        return self.run(key, flight, future, func, *args, **kwargs)
+
+    def enter(self, key, operation):
+        """Requests the operation on the key without waiting.
+
+        It is meant for the callers which cannot block until the previous
+        operations on the key are done, e.g., batches and coroutines. A
+        flight that is entered must be left with ``leave``, or with ``run``,
+        once the operation is done.
+
+        :param key:       the key the operations are serialized on
+        :param operation: the name of the operation
+        :returns: a tuple of the flight the caller has to run and the future
+                  of the previous operation on the key it has to wait for
+                  first, if any. The flight is None if the same operation is
+                  already requested, the future is then the one of the
+                  outcome to share
+        """
+        with self._lock:
+            flights = self._flights[key]
+            if flights and flights[-1][0] == operation:
+                return None, flights[-1][1]
+            previous = flights[-1][1] if flights else None
+            flight = (operation, futures.Future())
+            flights.append(flight)
+        return flight, previous
+
+    def run(self, key, flight, previous, func, *args, **kwargs):
+        """Runs the entered flight once the previous operation is done.
+
+        :param key:      the key the flight was entered on
+        :param flight:   the flight returned by ``enter``
+        :param previous: the future of the previous operation returned by
+                         ``enter``
+        :param func:     the function performing the operation
+        :returns: the value returned by ``func``
+        :raises: the exception raised by ``func``
+        """
+        try:
+            if previous is not None:
+                futures.wait([previous])
+            result = func(*args, **kwargs)
+        except Exception as e:
+            self.leave(key, flight, exception=e)
+            raise
+        self.leave(key, flight, result)
+        return result
+
+    def leave(self, key, flight, result=None, exception=None):
+        """Sets the outcome of the flight shared with its duplicates.
+
+        :param key:       the key the flight was entered on
+        :param flight:    the flight returned by ``enter``
+        :param result:    the value the operation returned
+        :param exception: the exception the operation raised, if any
+        """
+        if exception is not None:
+            flight[1].set_exception(exception)
+        else:
+            flight[1].set_result(result)
+        with self._lock:
+            flights = self._flights[key]
+            flights.remove(flight)
+            if not flights:
+                del self._flights[key]
+
+    def keys(self):
+        """Returns the set of the keys with operations in flight."""
+        with self._lock:
+            return set(self._flights)
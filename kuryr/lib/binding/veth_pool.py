@@ -0,0 +1,156 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Warm pool of pre-created veth pairs.
+
+Creating the veth pair is one of the slowest steps of binding a port on a
+busy host. The pool keeps a number of anonymous veth pairs ready so that
+binding a port only has to rename one of them, and creates new pairs in the
+background when the number of ready pairs falls to the low watermark.
+"""
+
+import collections
+import threading
+
+from oslo_log import log
+import pyroute2
+
+from kuryr.lib.binding import iproute
+from kuryr.lib import utils
+
+
+LOG = log.getLogger(__name__)
+
+POOL_VETH_PREFIX = 'kvp'
+POOL_PEER_PREFIX = 'kvc'
+_POOL_NAME_SUFFIX_LEN = 10
+
+
+class VethPool(object):
+    """Keeps veth pairs ready to be handed to the ports being bound.
+
+    :param ipr:           the ``pyroute2.IPRoute`` instance the pool fills
+                          itself up with, which must not be used by other
+                          threads
+    :param size:          the number of veth pairs to keep ready
+    :param low_watermark: the number of ready veth pairs at or below which
+                          the pool is refilled
+    :param link_index:    the ``kuryr.lib.binding.link_index.LinkIndex`` used
+                          to look the created interfaces up, if any
+    """
+
+    def __init__(self, ipr, size, low_watermark, link_index=None):
+        self._ipr = ipr
+        self._size = size
+        self._low_watermark = low_watermark
+        self._link_index = link_index
+        self._pairs = collections.deque()
+        self._lock = threading.Lock()
+        self._refilling = False
+
+    def __len__(self):
+        return len(self._pairs)
+
+    def start(self):
+        """Adopts the pairs left by a previous run and fills the pool up."""
+        hosts = {}
+        peers = {}
+        for link in self._ipr.get_links():
+            ifname = link.get_attr('IFLA_IFNAME')
+            if ifname.startswith(POOL_VETH_PREFIX):
+                hosts[ifname[len(POOL_VETH_PREFIX):]] = link['index']
+            elif ifname.startswith(POOL_PEER_PREFIX):
+                peers[ifname[len(POOL_PEER_PREFIX):]] = link['index']
+        with self._lock:
+            for suffix, host_index in hosts.items():
+                if suffix in peers:
+                    self._pairs.append((host_index, peers[suffix]))
+        self._schedule_refill()
+
+    def _create_pair(self):
+        suffix = utils.get_random_string(_POOL_NAME_SUFFIX_LEN)
+        ifname = POOL_VETH_PREFIX + suffix
+        peer_name = POOL_PEER_PREFIX + suffix
+        since = iproute.get_sequence(self._link_index)
+        self._ipr.link('add', ifname=ifname, kind=iproute.KIND_VETH,
+                       peer=peer_name)
+        timeout = iproute.LINK_NOTIFICATION_TIMEOUT
+        host_index = iproute.lookup_link(self._ipr, ifname,
+                                         self._link_index, timeout, since)
+        peer_index = iproute.lookup_link(self._ipr, peer_name,
+                                         self._link_index, timeout, since)
+        return host_index, peer_index
+
+    def _refill(self):
+        try:
+            while len(self._pairs) < self._size:
+                try:
+                    pair = self._create_pair()
+                except pyroute2.NetlinkError:
+                    LOG.exception('Could not create a veth pair for the '
+                                  'pool.')
+                    return
+                if None in pair:
+                    LOG.warning('A veth pair created for the pool could '
+                                'not be found.')
+                    return
+                with self._lock:
+                    self._pairs.append(pair)
+        finally:
+            with self._lock:
+                self._refilling = False
+
+    def _remove_pair(self, ipr, host_index):
+        try:
+            iproute.delete_link(ipr, host_index, self._link_index)
+        except pyroute2.NetlinkError:
+            pass
+
+    def _schedule_refill(self):
+        with self._lock:
+            if self._refilling or len(self._pairs) > self._low_watermark:
+                return
+            self._refilling = True
+        thread = threading.Thread(target=self._refill,
+                                  name='kuryr-veth-pool-refill')
+        thread.daemon = True
+        thread.start()
+
+    def acquire(self, ipr, ifname, peer_name):
+        """Hands a ready veth pair out under the given names.
+
+        :param ipr:       the ``pyroute2.IPRoute`` instance of the caller,
+                          the one of the pool is used by its refill thread
+        :param ifname:    the name to give to the host side of the pair
+        :param peer_name: the name to give to the container side of the pair
+        :returns: the tuple of the indexes of the host and the container
+                  sides of the pair or None if the pool is empty
+        """
+        while True:
+            with self._lock:
+                if not self._pairs:
+                    pair = None
+                    break
+                pair = self._pairs.popleft()
+            host_index, peer_index = pair
+            try:
+                ipr.link('set', index=host_index, ifname=ifname)
+                ipr.link('set', index=peer_index, ifname=peer_name)
+                break
+            except pyroute2.NetlinkError:
+                # The pair was removed or renamed by somebody else, it is
+                # dropped and the next one is tried.
+                LOG.warning('Could not take the pooled veth pair %s out of '
+                            'the pool.', pair)
+                self._remove_pair(ipr, host_index)
+        self._schedule_refill()
+        return pair
@@ -0,0 +1,176 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Read-through caches of Neutron resources."""
+
+import collections
+import threading
+import time
+
+from oslo_config import cfg
+
+from kuryr.lib import exceptions
+from kuryr.lib import utils
+
+_NEUTRON_RESOURCE_CACHE = None
+
+
+class TTLCache(object):
+    """A thread-safe mapping bounded in size whose entries expire.
+
+    When the cache is full, the least recently used entry is evicted.
+
+    :param maxsize: the maximum number of entries
+    :param ttl:     the number of seconds an entry is valid for
+    :param timer:   the function returning the current time in seconds
+    """
+
+    def __init__(self, maxsize, ttl, timer=time.time):
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._timer = timer
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        """Returns the value cached for the key if it has not expired."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return default
+            expiration, value = entry
+            if expiration <= self._timer():
+                return default
+            self._entries[key] = entry
+            return value
+
+    def set(self, key, value):
+        """Caches the value for the key, evicting the LRU entry if needed."""
+        with self._lock:
+            self._entries.pop(key, None)
+            while len(self._entries) >= self._maxsize:
+                self._entries.popitem(last=False)
+            self._entries[key] = (self._timer() + self._ttl, value)
+
+    def get_or_load(self, key, loader):
+        """Returns the cached value or caches the one returned by loader."""
+        value = self.get(key)
+        if value is None:
+            value = loader()
+            self.set(key, value)
+        return value
+
+    def pop(self, key):
+        """Drops the entry of the key if there is one."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Drops all the entries."""
+        with self._lock:
+            self._entries.clear()
+
+
+class NeutronResourceCache(object):
+    """Caches the Neutron networks, subnets and subnetpools.
+
+    The subnets are cached per network, so the data
+    ``kuryr.lib.binding.port_bind`` needs for a network is obtained without
+    any round-trip to Neutron while it is cached.
+
+    :param neutron_client: the ``neutronclient.v2_0.client.Client`` to load
+                           the resources with, the shared one by default
+    :param maxsize:        the maximum number of entries of each kind
+    :param ttl:            the number of seconds an entry is valid for
+    """
+
+    def __init__(self, neutron_client=None, maxsize=None, ttl=None):
+        if maxsize is None:
+            maxsize = cfg.CONF.neutron.resource_cache_size
+        if ttl is None:
+            ttl = cfg.CONF.neutron.resource_cache_ttl
+        self._neutron_client = neutron_client
+        self._networks = TTLCache(maxsize, ttl)
+        self._subnets = TTLCache(maxsize, ttl)
+        self._subnetpools = TTLCache(maxsize, ttl)
+
+    @property
+    def neutron_client(self):
+        if self._neutron_client is None:
+            self._neutron_client = utils.get_neutron_client()
+        return self._neutron_client
+
+    def get_network(self, network_id):
+        """Returns the network dictionary of the given network ID."""
+        return self._networks.get_or_load(
+            network_id,
+            lambda: self.neutron_client.show_network(network_id)['network'])
+
+    def get_subnets(self, network_id):
+        """Returns the list of the subnets of the given network ID."""
+        return self._subnets.get_or_load(
+            network_id,
+            lambda: self.neutron_client.list_subnets(
+                network_id=network_id)['subnets'])
+
+    def _load_subnetpool(self, name):
+        subnetpools = self.neutron_client.list_subnetpools(
+            name=name)['subnetpools']
+        if not subnetpools:
+            raise exceptions.NoResourceException(
+                "No subnetpool named {0} was found.".format(name))
+        if len(subnetpools) > 1:
+            raise exceptions.DuplicatedResourceException(
+                "Multiple subnetpools named {0} were found.".format(name))
+        return subnetpools[0]
+
+    def get_subnetpool(self, subnet_cidr):
+        """Returns the subnetpool Kuryr created for the given CIDR.
+
+        :param subnet_cidr: the allocation CIDR of the subnetpool, which name
+                            is given by ``utils.get_neutron_subnetpool_name``
+        :raises: kuryr.common.exceptions.NoResourceException,
+                 kuryr.common.exceptions.DuplicatedResourceException
+        """
+        name = utils.get_neutron_subnetpool_name(subnet_cidr)
+        return self._subnetpools.get_or_load(
+            name, lambda: self._load_subnetpool(name))
+
+    def invalidate_network(self, network_id):
+        """Drops the cached network and subnets of the given network ID."""
+        self._networks.pop(network_id)
+        self._subnets.pop(network_id)
+
+    def invalidate_subnetpool(self, subnet_cidr):
+        """Drops the cached subnetpool of the given CIDR."""
+        self._subnetpools.pop(utils.get_neutron_subnetpool_name(subnet_cidr))
+
+    def clear(self):
+        """Drops all the cached resources."""
+        self._networks.clear()
+        self._subnets.clear()
+        self._subnetpools.clear()
+
+
+def get_neutron_resource_cache():
+    """Returns the process-wide cache of Neutron resources.
+
+    :returns: the already cached or newly created ``NeutronResourceCache``
+              instance
+    """
+    global _NEUTRON_RESOURCE_CACHE
+    if _NEUTRON_RESOURCE_CACHE is None:
+        _NEUTRON_RESOURCE_CACHE = NeutronResourceCache()
+    return _NEUTRON_RESOURCE_CACHE
@@ -57,16 +57,302 @@ neutron_opts = [
                help=_('Type of the neutron endpoint to use. This endpoint '
                       'will be looked up in the keystone catalog and should '
                       'be one of public, internal or admin.')),
+    cfg.IntOpt('connection_pool_size',
+               default=10,
+               min=1,
+               help=_('Maximum number of keep-alive HTTP connections to '
+                      'Neutron shared by the threads using the cached '
+                      'Neutron client.')),
+    cfg.IntOpt('token_refresh_margin',
+               default=120,
+               min=0,
+               help=_('Seconds before the expiration of the cached token at '
+                      'which a new token is requested.')),
+    cfg.IntOpt('resource_cache_ttl',
+               default=60,
+               min=0,
+               help=_('Seconds the networks, subnets and subnetpools read '
+                      'from Neutron are cached for.')),
+    cfg.IntOpt('resource_cache_size',
+               default=1024,
+               min=1,
+               help=_('Maximum number of networks, subnets and subnetpools '
+                      'of each kind kept in the Neutron resource cache. The '
+                      'least recently used ones are evicted first.')),
 ]
 
 binding_opts = [
     cfg.StrOpt('veth_dst_prefix',
                default='eth',
                help=('The name prefix of the veth endpoint put inside the '
-                     'container.'))
+                     'container.')),
+    cfg.StrOpt('netlink_backend',
+               default='ipdb',
+               choices=['ipdb', 'iproute'],
+               help=_('The pyroute2 API used to create and configure the veth '
+                      'pairs. "iproute" issues the link and address requests '
+                      'directly instead of keeping the IPDB in-memory mirror '
+                      'of all the interfaces, addresses and routes of the '
+                      'host.')),
+    cfg.BoolOpt('link_index',
+                default=False,
+                help=_('Keep an in-process index of the host interfaces, '
+                       'filled by a single dump and kept up to date with '
+                       'link notifications, and look the veth endpoints up '
+                       'in it instead of dumping the link table on each '
+                       'lookup.')),
+    cfg.IntOpt('veth_pool_size',
+               default=0,
+               min=0,
+               help=_('Number of veth pairs created in advance and kept '
+                      'ready to be renamed and configured for the ports '
+                      'being bound. Only used by the "iproute" netlink '
+                      'backend. 0 disables the pool.')),
+    cfg.IntOpt('veth_pool_low_watermark',
+               default=5,
+               min=0,
+               help=_('Number of ready veth pairs at or below which the pool '
+                      'is refilled in the background.')),
+    cfg.StrOpt('metrics_sink',
+               default='noop',
+               choices=['noop', 'statsd', 'prometheus'],
+               help=_('Where the durations and outcomes of the binding '
+                      'phases are reported. "statsd" sends them over UDP to '
+                      'the statsd_host and statsd_port, "prometheus" keeps '
+                      'them in memory as histograms that can be dumped in '
+                      'the Prometheus text format.')),
+    cfg.StrOpt('statsd_host',
+               default='127.0.0.1',
+               help=_('Host of the statsd daemon the binding metrics are '
+                      'sent to.')),
+    cfg.PortOpt('statsd_port',
+                default=8125,
+                help=_('Port of the statsd daemon the binding metrics are '
+                       'sent to.')),
+    cfg.StrOpt('statsd_prefix',
+               default='kuryr.binding',
+               help=_('Prefix of the names of the binding metrics sent to '
+                      'statsd.')),
+    cfg.BoolOpt('use_privsep',
+                default=False,
+                help=_('Run the binding executables in a long-lived '
+                       'privileged helper, configured in the '
+                       '[kuryr_privileged] section, instead of spawning the '
+                       'root helper for each of them.')),
+    cfg.StrOpt('root_helper',
+               default='sudo',
+               help=_('Command the binding executables are run with when '
+                      'the process is not running as root, e.g., '
+                      '"sudo kuryr-rootwrap /etc/kuryr/rootwrap.conf". '
+                      'The executables are run directly by root.')),
+    cfg.IntOpt('netns_cache_size',
+               default=16,
+               min=1,
+               help=_('Number of container network namespaces whose file '
+                      'and netlink socket are kept open between the binds '
+                      'of their ports.')),
+    cfg.IntOpt('reconcile_batch_size',
+               default=20,
+               min=1,
+               help=_('Number of stray links or OVS ports the reconciler '
+                      'removes before pausing.')),
+    cfg.FloatOpt('reconcile_batch_interval',
+                 default=0.5,
+                 min=0,
+                 help=_('Seconds the reconciler pauses between two batches '
+                        'of removals, leaving room for the binds of the '
+                        'node.')),
+    cfg.BoolOpt('use_coprocess',
+                default=False,
+                help=_('Start the binding executables supporting the '
+                       'coprocess protocol once and send them the bind and '
+                       'unbind requests as JSON lines over their stdin. The '
+                       'other executables are still run once per request. '
+                       'Ignored when use_privsep is enabled.')),
+    cfg.IntOpt('coprocess_timeout',
+               default=60,
+               min=1,
+               help=_('Seconds to wait for a binding coprocess to answer a '
+                      'request before restarting it.')),
+    cfg.ListOpt('native_drivers',
+                default=[],
+                help=_('The vif_types bound by the in-process drivers '
+                       'registered in the kuryr.binding.drivers entry point '
+                       'namespace instead of the executables in bindir. '
+                       'kuryr provides the "ovs" and "tap" drivers. All the '
+                       'vif_types are bound by their executable by '
+                       'default.')),
+    cfg.StrOpt('integration_bridge',
+               default='br-int',
+               help=_('Name of the OVS integration bridge the in-process ovs '
+                      'driver plugs the ports into.')),
+    cfg.StrOpt('ovsdb_connection',
+               default='unix:/var/run/openvswitch/db.sock',
+               help=_('Connection string of the local ovsdb-server the '
+                      'in-process ovs driver keeps connected to.')),
+    cfg.IntOpt('ovsdb_timeout',
+               default=10,
+               min=1,
+               help=_('Seconds to wait for an OVSDB transaction to '
+                      'complete.')),
+    cfg.FloatOpt('ovsdb_batch_window',
+                 default=0,
+                 min=0,
+                 help=_('Seconds the in-process ovs driver waits for more '
+                        'ports to plug or unplug before committing them in '
+                        'a single OVSDB transaction. 0 disables the '
+                        'batching.')),
+    cfg.IntOpt('ovsdb_batch_size',
+               default=50,
+               min=1,
+               help=_('Maximum number of ports plugged or unplugged in a '
+                      'single OVSDB transaction.')),
+    cfg.StrOpt('journal_path',
+               help=_('Path of the SQLite database recording the ports '
+                      'bound on the host, e.g., '
+                      '/var/lib/kuryr/binding.db. The ports are not '
+                      'recorded if it is not set.')),
+    cfg.IntOpt('journal_pending_timeout',
+               default=300,
+               min=1,
+               help=_('Seconds after which a port recorded as being bound in '
+                      'the journal, and not being bound by the process, is '
+                      'taken for the leftover of an interrupted bind. The '
+                      'reconciliation then removes its record and its '
+                      'interfaces.')),
+    cfg.IntOpt('iproute_pool_size',
+               default=0,
+               min=0,
+               help=_('Maximum number of netlink sockets the concurrent '
+                      'binds check out of a pool. 0 makes all the binds '
+                      'share a single socket.')),
+    cfg.IntOpt('iproute_rcvbuf',
+               default=0,
+               min=0,
+               help=_('Size in bytes of the receive buffer of the pooled '
+                      'netlink sockets. 0 keeps the default of the '
+                      'kernel.')),
+    cfg.IntOpt('iproute_sndbuf',
+               default=0,
+               min=0,
+               help=_('Size in bytes of the send buffer of the pooled '
+                      'netlink sockets. 0 keeps the default of the '
+                      'kernel.')),
+    cfg.IntOpt('max_concurrent_bindings',
+               default=0,
+               min=0,
+               help=_('Maximum number of ports of the same vif_type bound or '
+                      'unbound at once, the others wait in a queue where '
+                      'the unbinds come first. 0 disables the admission '
+                      'control.')),
+    cfg.DictOpt('vif_type_concurrency',
+                default={},
+                help=_('Maximum number of ports bound or unbound at once for '
+                       'some vif_types, e.g., "ovs:16,bridge:4", overriding '
+                       'max_concurrent_bindings.')),
+    cfg.IntOpt('binding_queue_size',
+               default=1000,
+               min=0,
+               help=_('Maximum number of binding operations waiting for '
+                      'admission, the ones beyond are refused. 0 does not '
+                      'bound the queue.')),
+    cfg.FloatOpt('binding_queue_timeout',
+                 default=60,
+                 min=0,
+                 help=_('Seconds a binding operation waits for admission '
+                        'before being refused. 0 waits forever.')),
+    cfg.IntOpt('unbind_workers',
+               default=8,
+               min=1,
+               help=_('Number of ports port_unbind_many unbinds at once.')),
+    cfg.StrOpt('link_kind',
+               default='veth',
+               choices=['veth', 'ipvlan', 'macvlan'],
+               help=_('The kind of the interface given to the containers. '
+                      '"veth" creates a veth pair which host side is plugged '
+                      'by the driver of the vif_type of the port. "ipvlan" '
+                      'and "macvlan" create a sub-interface of '
+                      'uplink_interface instead, which saves the veth and '
+                      'the bridge or OVS hops on flat and provider networks. '
+                      'It is overridden by the kuryr_link_kind key of the '
+                      'binding:vif_details of the port and by the '
+                      'kuryr_link_kind=<kind> tag of its network.')),
+    cfg.StrOpt('uplink_interface',
+               help=_('The host interface the ipvlan and macvlan '
+                      'sub-interfaces are created on. It is overridden by '
+                      'the kuryr_uplink key of the binding:vif_details of '
+                      'the port and by the kuryr_uplink=<interface> tag of '
+                      'its network.')),
+    cfg.StrOpt('ipvlan_mode',
+               default='l2',
+               choices=['l2', 'l3', 'l3s'],
+               help=_('The mode of the ipvlan sub-interfaces.')),
+    cfg.StrOpt('macvlan_mode',
+               default='bridge',
+               choices=['private', 'vepa', 'bridge', 'passthru'],
+               help=_('The mode of the macvlan sub-interfaces.')),
+    cfg.StrOpt('datapath_profile',
+               help=_('The name of the datapath profile applied to the '
+                      'interfaces kuryr creates, whose settings are read '
+                      'from the [datapath_profile:<name>] section. It is '
+                      'overridden by the kuryr_datapath_profile key of the '
+                      'binding:vif_details of the port.')),
+    cfg.ListOpt('datapath_profiles',
+                default=[],
+                help=_('The names of the datapath profiles the ports can be '
+                       'given in their binding:vif_details, in addition to '
+                       'datapath_profile. Binding a port given any other '
+                       'profile fails.')),
+]
+
+DATAPATH_PROFILE_GROUP_PREFIX = 'datapath_profile:'
+# The group the options of the datapath profiles are listed under in the
+# sample configuration, each profile has a section of its own.
+DATAPATH_PROFILE_SAMPLE_GROUP = DATAPATH_PROFILE_GROUP_PREFIX + '<name>'
+
+datapath_profile_opts = [
+    cfg.IntOpt('txqueuelen',
+               min=0,
+               help=_('The length of the transmit queue of both ends of the '
+                      'veth pair.')),
+    cfg.BoolOpt('gso',
+                help=_('Whether the generic segmentation offload is on. It '
+                       'is left as is when unset.')),
+    cfg.BoolOpt('gro',
+                help=_('Whether the generic receive offload is on. It is '
+                       'left as is when unset.')),
+    cfg.BoolOpt('tso',
+                help=_('Whether the TCP segmentation offload is on. It is '
+                       'left as is when unset.')),
+    cfg.IntOpt('num_tx_queues',
+               min=1,
+               help=_('The number of transmit queues of both ends of the '
+                      'veth pair, or of the sub-interface. It can only be '
+                      'set when the veth pair is created with the iproute '
+                      'netlink backend or in the network namespace of the '
+                      'container, binding the port fails otherwise.')),
+    cfg.IntOpt('num_rx_queues',
+               min=1,
+               help=_('The number of receive queues of both ends of the veth '
+                      'pair, with the same restrictions as num_tx_queues.')),
+    cfg.StrOpt('qdisc',
+               help=_('The root queueing discipline of both ends of the veth '
+                      'pair, e.g., "fq_codel", "fq" or "noqueue".')),
 ]
 
 
+def register_datapath_profile_opts(conf, name):
+    """Registers the options of a datapath profile.
+
+    :param conf: the configuration object
+    :param name: the name of the profile
+    :returns: the group of the options of the profile
+    """
+    group = DATAPATH_PROFILE_GROUP_PREFIX + name
+    conf.register_opts(datapath_profile_opts, group=group)
+    return conf[group]
+
+
 def register_neutron_opts(conf):
     conf.register_group(neutron_group)
     conf.register_opts(neutron_opts, group=neutron_group)
@@ -23,6 +23,15 @@ class BindingFailure(KuryrException):
     """
 
 
+class BindingAdmissionFailure(KuryrException):
+    """Exception represents the binding is not admitted.
+
+    This exception is thrown when the queue of the bindings waiting for a
+    free slot is full or when the binding waited longer than the admission
+    timeout, and Kuryr does not proceed with it.
+    """
+
+
 class BindingNotSupportedFailure(KuryrException):
     """Exception represents the vif type binding not support.
 
@@ -31,6 +40,14 @@ class BindingNotSupportedFailure(KuryrException):
     """
 
 
+class BindingTimeoutFailure(KuryrException):
+    """Exception represents the binding operation did not finish in time.
+
+    This exception is thrown when the deadline given to a bulk binding
+    operation passes before the operation on a port is done.
+    """
+
+
 class DuplicatedResourceException(KuryrException):
     """Exception represents there're multiple resources for the ID.
 
@@ -0,0 +1,242 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Latency and outcome metrics of the binding phases.
+
+Each phase of binding or unbinding a port is timed and reported with its
+outcome and the vif_type of the port to the sink selected with the
+``[binding] metrics_sink`` option.
+"""
+
+import collections
+import contextlib
+import socket
+import threading
+
+from oslo_config import cfg
+from oslo_log import log
+from oslo_utils import excutils
+from oslo_utils import timeutils
+
+
+LOG = log.getLogger(__name__)
+
+NOOP_SINK = 'noop'
+STATSD_SINK = 'statsd'
+PROMETHEUS_SINK = 'prometheus'
+UNKNOWN_VIF_TYPE = 'unknown'
+
+VETH_CREATE = 'veth_create'
+ADDRESS_CONFIG = 'address_config'
+LINK_CONFIG = 'link_config'
+SCRIPT = 'script'
+PLUG = 'plug'
+CLEANUP = 'cleanup'
+QUEUE_WAIT = 'queue_wait'
+QUEUE_DEPTH = 'queue_depth'
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0)
+
+_SINK = None
+_SINK_LOCK = threading.Lock()
+
+
+class MetricsSink(object):
+    """Receives the measures of the binding phases and does nothing."""
+
+    def observe(self, phase, vif_type, duration, succeeded):
+        """Records a measure of a binding phase.
+
+        :param phase:     the name of the binding phase
+        :param vif_type:  the vif_type of the port
+        :param duration:  the duration of the phase in seconds
+        :param succeeded: whether the phase succeeded
+        """
+
+    def gauge(self, name, vif_type, value):
+        """Records the current value of a gauge, e.g., a queue depth.
+
+        :param name:     the name of the gauge
+        :param vif_type: the vif_type the gauge is about
+        :param value:    the current value
+        """
+
+
+class StatsdSink(MetricsSink):
+    """Sends the measures as statsd timers and counters over UDP.
+
+    The vif_type is attached to the metrics as a DogStatsD tag.
+    """
+
+    def __init__(self, host, port, prefix):
+        self._address = (host, port)
+        self._prefix = prefix
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def observe(self, phase, vif_type, duration, succeeded):
+        tags = '|#vif_type:{0}'.format(vif_type)
+        result = 'success' if succeeded else 'failure'
+        payload = '\n'.join([
+            '{0}.{1}:{2:.3f}|ms{3}'.format(self._prefix, phase,
+                                           duration * 1000, tags),
+            '{0}.{1}.{2}:1|c{3}'.format(self._prefix, phase, result, tags),
+        ])
+        self._send(payload)
+
+    def gauge(self, name, vif_type, value):
+        self._send('{0}.{1}:{2}|g|#vif_type:{3}'.format(
+            self._prefix, name, value, vif_type))
+
+    def _send(self, payload):
+        try:
+            self._socket.sendto(payload.encode('utf-8'), self._address)
+        except socket.error:
+            LOG.debug('Could not send the binding metrics to statsd.',
+                      exc_info=True)
+
+
+class HistogramSink(MetricsSink):
+    """Keeps the measures in memory as histograms per phase and vif_type.
+
+    The histograms can be exposed with ``dump`` in the Prometheus text
+    format.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self._buckets = tuple(sorted(buckets))
+        self._histograms = collections.defaultdict(
+            lambda: [[0] * len(self._buckets), 0, 0.0])
+        self._results = collections.defaultdict(int)
+        self._gauges = {}
+        self._lock = threading.Lock()
+
+    def observe(self, phase, vif_type, duration, succeeded):
+        key = (phase, vif_type)
+        with self._lock:
+            histogram = self._histograms[key]
+            for i, bound in enumerate(self._buckets):
+                if duration <= bound:
+                    histogram[0][i] += 1
+            histogram[1] += 1
+            histogram[2] += duration
+            result = 'success' if succeeded else 'failure'
+            self._results[key + (result,)] += 1
+
+    def gauge(self, name, vif_type, value):
+        with self._lock:
+            self._gauges[(name, vif_type)] = value
+
+    def get_gauge(self, name, vif_type):
+        """Returns the last value of the gauge or None."""
+        with self._lock:
+            return self._gauges.get((name, vif_type))
+
+    def get_count(self, phase, vif_type, succeeded=True):
+        """Returns the number of measures with the given outcome."""
+        result = 'success' if succeeded else 'failure'
+        with self._lock:
+            return self._results.get((phase, vif_type, result), 0)
+
+    def dump(self):
+        """Returns the histograms in the Prometheus text exposition format."""
+        lines = [
+            '# HELP kuryr_binding_phase_seconds Duration of the binding '
+            'phases.',
+            '# TYPE kuryr_binding_phase_seconds histogram',
+        ]
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            results = sorted(self._results.items())
+            gauges = sorted(self._gauges.items())
+        for (phase, vif_type), (counts, count, total) in histograms:
+            labels = 'phase="{0}",vif_type="{1}"'.format(phase, vif_type)
+            for bound, bucket_count in zip(self._buckets, counts):
+                lines.append(
+                    'kuryr_binding_phase_seconds_bucket{{{0},le="{1}"}} '
+                    '{2}'.format(labels, bound, bucket_count))
+            lines.append(
+                'kuryr_binding_phase_seconds_bucket{{{0},le="+Inf"}} '
+                '{1}'.format(labels, count))
+            lines.append('kuryr_binding_phase_seconds_sum{{{0}}} '
+                         '{1}'.format(labels, total))
+            lines.append('kuryr_binding_phase_seconds_count{{{0}}} '
+                         '{1}'.format(labels, count))
+        lines.append('# HELP kuryr_binding_phase_total Outcomes of the '
+                     'binding phases.')
+        lines.append('# TYPE kuryr_binding_phase_total counter')
+        for (phase, vif_type, result), count in results:
+            lines.append(
+                'kuryr_binding_phase_total{{phase="{0}",vif_type="{1}",'
+                'result="{2}"}} {3}'.format(phase, vif_type, result, count))
+        if gauges:
+            lines.append('# HELP kuryr_binding_gauge Current values of the '
+                         'binding gauges.')
+            lines.append('# TYPE kuryr_binding_gauge gauge')
+        for (name, vif_type), value in gauges:
+            lines.append(
+                'kuryr_binding_gauge{{name="{0}",vif_type="{1}"}} '
+                '{2}'.format(name, vif_type, value))
+        return '\n'.join(lines) + '\n'
+
+
+def _create_sink():
+    sink = cfg.CONF.binding.metrics_sink
+    if sink == STATSD_SINK:
+        return StatsdSink(cfg.CONF.binding.statsd_host,
+                          cfg.CONF.binding.statsd_port,
+                          cfg.CONF.binding.statsd_prefix)
+    if sink == PROMETHEUS_SINK:
+        return HistogramSink()
+    return MetricsSink()
+
+
+def get_sink():
+    """Returns the configured metrics sink.
+
+    :returns: the already cached or newly created ``MetricsSink`` instance
+    """
+    global _SINK
+    if _SINK is None:
+        with _SINK_LOCK:
+            if _SINK is None:
+                _SINK = _create_sink()
+    return _SINK
+
+
+def set_sink(sink):
+    """Replaces the metrics sink, e.g., with a custom ``MetricsSink``.
+
+    :param sink: the ``MetricsSink`` instance to use or None to create the
+                 configured one again
+    """
+    global _SINK
+    _SINK = sink
+
+
+@contextlib.contextmanager
+def timed(phase, vif_type=None):
+    """Times the enclosed block and reports it as the given binding phase.
+
+    The phase is reported as failed if the block raises an exception.
+
+    :param phase:    the name of the binding phase
+    :param vif_type: the vif_type of the port being bound or unbound
+    """
+    vif_type = vif_type or UNKNOWN_VIF_TYPE
+    watch = timeutils.StopWatch().start()
+    try:
+        yield
+    except Exception:
+        with excutils.save_and_reraise_exception():
+            get_sink().observe(phase, vif_type, watch.elapsed(), False)
+    else:
+        get_sink().observe(phase, vif_type, watch.elapsed(), True)
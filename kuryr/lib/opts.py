@@ -35,6 +35,7 @@ _core_opts_with_logging += _options.generic_log_opts
 _kuryr_opts = [
     (None, list(itertools.chain(_core_opts_with_logging))),
     ('binding', config.binding_opts),
+    (config.DATAPATH_PROFILE_SAMPLE_GROUP, config.datapath_profile_opts),
 ]
 
 
@@ -0,0 +1,139 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Long-lived privileged helpers running the binding executables.
+
+The helpers are oslo.privsep daemons started once through the root helper.
+The binding requests are then sent to them over their unix socket instead of
+spawning a sudo or rootwrap process for each of them.
+
+The ``default`` helper only runs the bind and unbind subcommands of the
+executables in ``bindir``. Entering the network namespace of a container
+needs CAP_SYS_ADMIN, which is only given to the ``netns_admin`` helper
+setting the offloads of an interface.
+"""
+
+import os
+
+from oslo_concurrency import processutils
+from oslo_config import cfg
+from oslo_privsep import capabilities
+from oslo_privsep import priv_context
+
+from kuryr.lib import config
+
+default = priv_context.PrivContext(
+    __name__,
+    cfg_section='kuryr_privileged',
+    pypath=__name__ + '.default',
+    capabilities=[capabilities.CAP_NET_ADMIN,
+                  capabilities.CAP_DAC_OVERRIDE],
+)
+
+netns_admin = priv_context.PrivContext(
+    __name__,
+    cfg_section='kuryr_privileged_netns',
+    pypath=__name__ + '.netns_admin',
+    capabilities=[capabilities.CAP_NET_ADMIN,
+                  capabilities.CAP_SYS_ADMIN],
+)
+
+BINDING_SUBCOMMANDS = ('bind', 'unbind')
+OFFLOAD_FEATURES = ('gso', 'gro', 'tso')
+OFFLOAD_STATES = ('on', 'off')
+# The exit code of a command the helper refuses to run, as the shells do
+# for a command that cannot be executed.
+REFUSED_EXIT_CODE = 126
+
+
+def _refuse(reason):
+    return REFUSED_EXIT_CODE, '', reason
+
+
+def _run(*cmd):
+    try:
+        stdout, stderr = processutils.execute(*cmd)
+    except processutils.ProcessExecutionError as e:
+        return e.exit_code, e.stdout, e.stderr
+    return 0, stdout, stderr
+
+
+def _get_bindir():
+    # The helper runs in its own process, where the consumer of the library
+    # did not register the options.
+    cfg.CONF.register_opts(config.core_opts)
+    return os.path.realpath(cfg.CONF.bindir)
+
+
+def _is_binding_command(cmd):
+    if len(cmd) < 2 or cmd[1] not in BINDING_SUBCOMMANDS:
+        return False
+    exec_path = os.path.realpath(cmd[0])
+    return os.path.dirname(exec_path) == _get_bindir()
+
+
+def _is_valid_ifname(ifname):
+    return (0 < len(ifname) < 16 and not ifname.startswith('-') and
+            '/' not in ifname and not any(c.isspace() for c in ifname))
+
+
+@default.entrypoint
+def execute_binding(*cmd):
+    """Runs a binding executable with the privileges of the helper.
+
+    Only the bind and unbind subcommands of the executables in ``bindir``
+    are run, the symbolic links being resolved first.
+
+    The failures are returned instead of raised because the attributes of
+    ``processutils.ProcessExecutionError`` do not survive the way privsep
+    sends exceptions back to the caller.
+
+    :param cmd: the binding executable and its arguments
+    :returns: the tuple of the exit code, stdout and stderr of the
+              executable, the exit code being ``REFUSED_EXIT_CODE`` for a
+              command that is not allowed
+    """
+    if not _is_binding_command(cmd):
+        return _refuse('Only the {0} subcommands of the executables in {1} '
+                       'are run.'.format(' and '.join(BINDING_SUBCOMMANDS),
+                                         _get_bindir()))
+    return _run(*cmd)
+
+
+@netns_admin.entrypoint
+def set_offloads(ifname, offload_args, netns_path=None):
+    """Sets the offloads of an interface with ethtool.
+
+    :param ifname:       the name of the interface
+    :param offload_args: the features and their states, as returned by
+                         ``DatapathProfile.get_offload_args``
+    :param netns_path:   the absolute path of the network namespace file
+                         of the interface, if any
+    :returns: the tuple of the exit code, stdout and stderr of ethtool, the
+              exit code being ``REFUSED_EXIT_CODE`` for invalid arguments
+    """
+    offload_args = tuple(offload_args)
+    if not _is_valid_ifname(ifname):
+        return _refuse('Invalid interface name {0!r}.'.format(ifname))
+    if (not offload_args or len(offload_args) % 2 or
+            any(feature not in OFFLOAD_FEATURES
+                for feature in offload_args[::2]) or
+            any(state not in OFFLOAD_STATES
+                for state in offload_args[1::2])):
+        return _refuse('Invalid offloads {0!r}.'.format(offload_args))
+    cmd = ('ethtool', '--offload', ifname) + offload_args
+    if netns_path is not None:
+        if not os.path.isabs(netns_path):
+            return _refuse('Invalid network namespace path {0!r}.'.format(
+                netns_path))
+        cmd = ('nsenter', '--net=' + netns_path) + cmd
+    return _run(*cmd)
@@ -11,12 +11,18 @@
 # under the License.
 
 import hashlib
+import os
 import random
+import shlex
 import socket
+import threading
 
 from keystoneauth1 import loading as ks_loading
 from neutronclient.v2_0 import client
+from oslo_concurrency import processutils
 from oslo_config import cfg
+import requests
+from requests import adapters
 
 from kuryr.lib import config as kuryr_config
 from kuryr.lib import constants as const
@@ -24,16 +30,62 @@ from kuryr.lib import constants as const
 DOCKER_NETNS_BASE = '/var/run/docker/netns'
 PORT_POSTFIX = 'port'
 
+_NEUTRON_CLIENT_CACHE = {}
+_NEUTRON_CLIENT_LOCK = threading.Lock()
+
+
+def _get_neutron_client_key():
+    """Returns a hashable snapshot of the Neutron auth configuration."""
+    group = kuryr_config.neutron_group.name
+    auth_type = cfg.CONF[group].auth_type
+    if auth_type:
+        # The options of the auth plugin are only registered when the plugin
+        # is loaded, they are registered beforehand to be part of the key.
+        cfg.CONF.register_opts(
+            ks_loading.get_auth_plugin_conf_options(auth_type), group=group)
+    return tuple(sorted((name, repr(value))
+                        for name, value in cfg.CONF[group].items()))
+
+
+def _get_requests_session():
+    """Returns a requests session with a bounded keep-alive pool."""
+    pool_size = cfg.CONF.neutron.connection_pool_size
+    http_session = requests.Session()
+    for prefix in ('http://', 'https://'):
+        http_session.mount(prefix, adapters.HTTPAdapter(
+            pool_connections=1, pool_maxsize=pool_size, pool_block=True))
+    return http_session
+
 
 def get_neutron_client(*args, **kwargs):
-    auth_plugin = ks_loading.load_auth_from_conf_options(
-        cfg.CONF, kuryr_config.neutron_group.name)
-    session = ks_loading.load_session_from_conf_options(cfg.CONF,
-                                                        'neutron',
-                                                        auth=auth_plugin)
-    return client.Client(session=session,
-                         auth=auth_plugin,
-                         endpoint_type=cfg.CONF.neutron.endpoint_type)
+    """Returns the Neutron client for the current configuration.
+
+    The clients are cached per Neutron auth configuration and shared by all
+    the threads of the process, so the token and the HTTP connections are
+    reused across calls. The token is renewed when it is about to expire in
+    less than ``[neutron] token_refresh_margin`` seconds.
+
+    :returns: the already cached or newly created
+              ``neutronclient.v2_0.client.Client`` instance
+    """
+    key = _get_neutron_client_key()
+    with _NEUTRON_CLIENT_LOCK:
+        neutron_client = _NEUTRON_CLIENT_CACHE.get(key)
+        if neutron_client is None:
+            auth_plugin = ks_loading.load_auth_from_conf_options(
+                cfg.CONF, kuryr_config.neutron_group.name)
+            if hasattr(auth_plugin, 'MIN_TOKEN_LIFE_SECONDS'):
+                auth_plugin.MIN_TOKEN_LIFE_SECONDS = (
+                    cfg.CONF.neutron.token_refresh_margin)
+            session = ks_loading.load_session_from_conf_options(
+                cfg.CONF, 'neutron', auth=auth_plugin,
+                session=_get_requests_session())
+            neutron_client = client.Client(
+                session=session,
+                auth=auth_plugin,
+                endpoint_type=cfg.CONF.neutron.endpoint_type)
+            _NEUTRON_CLIENT_CACHE[key] = neutron_client
+    return neutron_client
 
 
 def get_hostname():
@@ -49,6 +101,17 @@ def get_veth_pair_names(port_id):
     return ifname, peer_name
 
 
+def get_hybrid_plug_names(port_id):
+    """Returns the names of the links of the OVS hybrid plug of a port.
+
+    :param port_id: the ID of the Neutron port
+    :returns: the tuple of the names of the Linux bridge and of the sides of
+              the veth pair plugged into it and into OVS
+    """
+    suffix = port_id[:const.HYBRID_NAME_LEN]
+    return 'qbr' + suffix, 'qvb' + suffix, 'qvo' + suffix
+
+
 def get_neutron_subnetpool_name(subnet_cidr):
     """Returns a Neutron subnetpool name.
 
@@ -100,3 +163,25 @@ def get_random_string(length):
     """Get a random hex string of the specified length."""
 
     return "{0:0{1}x}".format(random.getrandbits(length * 4), length)
+
+
+def get_root_command(*cmd):
+    """Returns the command to run as root the way the binding executables are.
+
+    Like ``processutils.execute``, the command is left as is when the
+    process is running as root and prefixed with ``[binding] root_helper``
+    otherwise.
+
+    :param cmd: the command and its arguments
+    :returns: the tuple of the arguments of the command to run
+    :raises: processutils.NoRootWrapSpecified
+    """
+    cmd = tuple(str(c) for c in cmd)
+    if os.geteuid() == 0:
+        return cmd
+    root_helper = cfg.CONF.binding.root_helper
+    if not root_helper:
+        raise processutils.NoRootWrapSpecified(
+            message='Command requested root, but did not specify a root '
+                    'helper.')
+    return tuple(shlex.split(root_helper)) + cmd
@@ -11,6 +11,7 @@
 # under the License.
 
 from oslo_config import cfg
+from oslo_config import fixture as config_fixture
 from oslotest import base
 
 from kuryr.lib import config
@@ -26,6 +27,7 @@ class TestCase(base.BaseTestCase):
         CONF.register_opts(config.core_opts)
         CONF.register_opts(config.binding_opts, 'binding')
         config.register_neutron_opts(CONF)
+        self.config_fixture = self.useFixture(config_fixture.Config(CONF))
 
     @staticmethod
     def _get_fake_networks(neutron_network_id):
@@ -0,0 +1,178 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+import sys
+import unittest
+import uuid
+
+import mock
+from oslo_concurrency import processutils
+
+from kuryr.lib import binding
+from kuryr.lib import constants
+from kuryr.lib import exceptions
+from kuryr.lib import utils
+from kuryr.tests.unit import base
+
+# The coroutines of aio cannot even be compiled before Python 3.5.
+ASYNC_SUPPORTED = sys.version_info >= (3, 5)
+if ASYNC_SUPPORTED:
+    import asyncio
+
+    from kuryr.lib.binding import aio
+    from kuryr.lib.binding import scheduler
+
+AsyncMock = getattr(mock, 'AsyncMock', mock.MagicMock)
+
+FAKE_BINDIR = os.path.join(os.path.dirname(__file__), os.pardir, os.pardir,
+                           os.pardir, os.pardir, 'usr', 'libexec', 'kuryr')
+
+
+@unittest.skipIf(not ASYNC_SUPPORTED, 'asyncio requires Python 3.5')
+class AsyncBindingTest(base.TestCase):
+    """Unit tests for the coroutine versions of binding."""
+
+    def setUp(self):
+        super(AsyncBindingTest, self).setUp()
+        self.config_fixture.config(bindir=FAKE_BINDIR)
+        binding._DRIVER_REGISTRY = None
+        self.addCleanup(setattr, binding, '_DRIVER_REGISTRY', None)
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+        fake_docker_network_id = utils.get_hash()
+        self.fake_endpoint_id = utils.get_hash()
+        fake_neutron_v4_subnet_id = str(uuid.uuid4())
+        fake_neutron_v6_subnet_id = str(uuid.uuid4())
+        self.fake_port = self._get_fake_port(
+            self.fake_endpoint_id, fake_docker_network_id,
+            str(uuid.uuid4()), constants.PORT_STATUS_ACTIVE,
+            fake_neutron_v4_subnet_id, fake_neutron_v6_subnet_id)['port']
+        self.fake_subnets = self._get_fake_subnets(
+            self.fake_endpoint_id, fake_docker_network_id,
+            fake_neutron_v4_subnet_id, fake_neutron_v6_subnet_id)['subnets']
+        self.ifname, self.peer_name = utils.get_veth_pair_names(
+            self.fake_port['id'])
+        patcher = mock.patch('os.geteuid', return_value=1000)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _mock_process(self, mock_create_subprocess_exec, returncode=0):
+        process = mock.Mock(returncode=returncode)
+        process.communicate = AsyncMock(return_value=(b'fake_stdout',
+                                                      b'fake_stderr'))
+        mock_create_subprocess_exec.return_value = process
+
+    @mock.patch('asyncio.create_subprocess_exec', new_callable=AsyncMock)
+    @mock.patch('kuryr.lib.binding.cleanup_veth')
+    @mock.patch('kuryr.lib.binding._configure_veth')
+    def test_port_bind(self, mock_configure_veth, mock_cleanup_veth,
+                       mock_create_subprocess_exec):
+        mock_configure_veth.return_value = (self.ifname, self.peer_name)
+        self._mock_process(mock_create_subprocess_exec)
+
+        result = self.loop.run_until_complete(aio.port_bind(
+            self.fake_endpoint_id, self.fake_port, self.fake_subnets))
+
+        self.assertEqual((self.ifname, self.peer_name,
+                          ('fake_stdout', 'fake_stderr')), result)
+        mock_configure_veth.assert_called_once_with(mock.ANY, None, None)
+        binding_plan = mock_configure_veth.call_args[0][0]
+        self.assertEqual(self.ifname, binding_plan.ifname)
+        cmd = mock_create_subprocess_exec.call_args[0]
+        self.assertEqual('sudo', cmd[0])
+        self.assertEqual('bind', cmd[2])
+        mock_cleanup_veth.assert_not_called()
+
+    @mock.patch('asyncio.create_subprocess_exec', new_callable=AsyncMock)
+    def test_execute_as_root(self, mock_create_subprocess_exec):
+        self._mock_process(mock_create_subprocess_exec)
+
+        with mock.patch('os.geteuid', return_value=0):
+            self.loop.run_until_complete(aio._execute('/fake/ovs', 'bind'))
+
+        mock_create_subprocess_exec.assert_called_once_with(
+            '/fake/ovs', 'bind', stdout=mock.ANY, stderr=mock.ANY)
+
+    @mock.patch('asyncio.create_subprocess_exec', new_callable=AsyncMock)
+    @mock.patch('kuryr.lib.binding.cleanup_veth')
+    @mock.patch('kuryr.lib.binding._configure_veth')
+    def test_port_bind_failure(self, mock_configure_veth, mock_cleanup_veth,
+                               mock_create_subprocess_exec):
+        mock_configure_veth.return_value = (self.ifname, self.peer_name)
+        self._mock_process(mock_create_subprocess_exec, returncode=1)
+
+        self.assertRaises(
+            processutils.ProcessExecutionError,
+            self.loop.run_until_complete,
+            aio.port_bind(self.fake_endpoint_id, self.fake_port,
+                          self.fake_subnets))
+        mock_cleanup_veth.assert_called_once_with(self.ifname, 'unbound')
+
+    @mock.patch('kuryr.lib.binding._configure_veth')
+    def test_port_bind_not_supported(self, mock_configure_veth):
+        self.fake_port['binding:vif_type'] = 'fake'
+
+        self.assertRaises(
+            exceptions.BindingNotSupportedFailure,
+            self.loop.run_until_complete,
+            aio.port_bind(self.fake_endpoint_id, self.fake_port,
+                          self.fake_subnets))
+        mock_configure_veth.assert_not_called()
+
+    @mock.patch('kuryr.lib.binding._configure_veth')
+    def test_port_bind_shares_flight(self, mock_configure_veth):
+        # The port is being bound through the synchronous API.
+        flight, future = binding._SINGLE_FLIGHT.enter(self.fake_port['id'],
+                                                      'bind')
+        self.assertIsNone(future)
+        self.loop.call_later(0.05, binding._SINGLE_FLIGHT.leave,
+                             self.fake_port['id'], flight, 'fake_result')
+
+        result = self.loop.run_until_complete(aio.port_bind(
+            self.fake_endpoint_id, self.fake_port, self.fake_subnets))
+
+        self.assertEqual('fake_result', result)
+        mock_configure_veth.assert_not_called()
+        self.assertEqual(set(), binding._SINGLE_FLIGHT.keys())
+
+    @mock.patch('kuryr.lib.binding._configure_veth')
+    @mock.patch('kuryr.lib.binding.get_scheduler')
+    def test_port_bind_admission_timeout(self, mock_get_scheduler,
+                                         mock_configure_veth):
+        binding_scheduler = scheduler.BindingScheduler(1, timeout=0.05)
+        mock_get_scheduler.return_value = binding_scheduler
+
+        # The only slot is held by a synchronous bind.
+        with binding_scheduler.admit('unbound'):
+            self.assertRaises(
+                exceptions.BindingAdmissionFailure,
+                self.loop.run_until_complete,
+                aio.port_bind(self.fake_endpoint_id, self.fake_port,
+                              self.fake_subnets))
+
+        mock_configure_veth.assert_not_called()
+        self.assertEqual(0, binding_scheduler._queued)
+        self.assertEqual(0, binding_scheduler._slots['unbound'].active)
+
+    @mock.patch('asyncio.create_subprocess_exec', new_callable=AsyncMock)
+    @mock.patch('kuryr.lib.binding.cleanup_veth')
+    def test_port_unbind(self, mock_cleanup_veth,
+                         mock_create_subprocess_exec):
+        self._mock_process(mock_create_subprocess_exec)
+
+        result = self.loop.run_until_complete(aio.port_unbind(
+            self.fake_endpoint_id, self.fake_port))
+
+        self.assertEqual(('fake_stdout', 'fake_stderr'), result)
+        self.assertEqual('unbind', mock_create_subprocess_exec.call_args[0][2])
+        mock_cleanup_veth.assert_called_once_with(self.ifname, 'unbound')
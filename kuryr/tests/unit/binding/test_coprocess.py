@@ -0,0 +1,228 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+import sys
+import tempfile
+import threading
+
+import mock
+from oslo_concurrency import processutils
+
+from kuryr.lib import binding
+from kuryr.lib.binding import coprocess
+from kuryr.lib.binding import plan
+from kuryr.tests.unit import base
+
+FAKE_COPROCESS = '''
+import json
+import sys
+
+if sys.argv[1] != 'coprocess':
+    sys.exit(1)
+print(json.dumps({'version': 1}))
+sys.stdout.flush()
+for line in sys.stdin:
+    request = json.loads(line)
+    exit_code = 1 if request['ifname'] == 'fail' else 0
+    print(json.dumps({'id': request['id'], 'exit_code': exit_code,
+                      'stdout': request['command'] + ' ' +
+                      request['port_id'],
+                      'stderr': json.dumps(request['vif_details'])}))
+    sys.stdout.flush()
+'''
+
+# Answers the requests two at a time in the reverse order.
+FAKE_PIPELINED = '''
+import json
+import sys
+
+print(json.dumps({'version': 1}))
+sys.stdout.flush()
+requests = []
+for line in iter(sys.stdin.readline, ''):
+    requests.append(json.loads(line))
+    if len(requests) == 2:
+        for request in reversed(requests):
+            print(json.dumps({'id': request['id'], 'exit_code': 0,
+                              'stdout': request['ifname']}))
+        sys.stdout.flush()
+        requests = []
+'''
+
+FAKE_ARGV_ONLY = '''
+import sys
+
+sys.stderr.write('Invalid command %s.' % sys.argv[1])
+sys.exit(1)
+'''
+
+
+class CoprocessTest(base.TestCase):
+    """Unit tests for the binding coprocess protocol."""
+
+    def setUp(self):
+        super(CoprocessTest, self).setUp()
+        # The fake executables are run by the Python interpreter instead of
+        # the root helper.
+        self.config_fixture.config(group='binding',
+                                   root_helper=sys.executable)
+        patcher = mock.patch('os.geteuid', return_value=1000)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(coprocess.stop_all)
+        self.port = {'id': 'fake_port_id',
+                     'mac_address': 'fa:16:3e:20:57:c3',
+                     'network_id': 'fake_network_id',
+                     'tenant_id': 'fake_tenant_id',
+                     'binding:vif_details': {'port_filter': True}}
+
+    def _get_plan(self, ifname):
+        binding_plan = plan.BindingPlan(self.port)
+        binding_plan.ifname = ifname
+        return binding_plan
+
+    def _write_script(self, source):
+        fd, path = tempfile.mkstemp(suffix='.py')
+        with os.fdopen(fd, 'w') as f:
+            f.write(source)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_execute(self):
+        path = self._write_script(FAKE_COPROCESS)
+
+        process = coprocess.get_coprocess(path)
+
+        self.assertEqual(1, process.version)
+        self.assertEqual(('bind fake_port_id', '{"port_filter": true}'),
+                         process.execute('bind', 'fake_endpoint_id',
+                                         self._get_plan('tapfake')))
+        self.assertEqual('unbind fake_port_id',
+                         process.execute('unbind', 'fake_endpoint_id',
+                                         self._get_plan('tapfake'))[0])
+        e = self.assertRaises(processutils.ProcessExecutionError,
+                              process.execute, 'bind', 'fake_endpoint_id',
+                              self._get_plan('fail'))
+        self.assertEqual(1, e.exit_code)
+        self.assertIs(process, coprocess.get_coprocess(path))
+
+    def test_execute_pipelined(self):
+        process = coprocess.get_coprocess(self._write_script(FAKE_PIPELINED))
+        results = {}
+
+        def _execute(ifname):
+            results[ifname] = process.execute('bind', 'fake_endpoint_id',
+                                              self._get_plan(ifname))[0]
+
+        # The first request is answered only once the second one is sent.
+        threads = [threading.Thread(target=_execute, args=(ifname,))
+                   for ifname in ('tapfake1', 'tapfake2')]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+
+        self.assertEqual({'tapfake1': 'tapfake1', 'tapfake2': 'tapfake2'},
+                         results)
+
+    def test_restart(self):
+        path = self._write_script(FAKE_COPROCESS)
+        process = coprocess.get_coprocess(path)
+
+        process.stop()
+
+        self.assertRaises(processutils.ProcessExecutionError,
+                          process.execute, 'bind', 'fake_endpoint_id',
+                          self._get_plan('tapfake'))
+        restarted = coprocess.get_coprocess(path)
+        self.assertIsNot(process, restarted)
+        self.assertTrue(restarted.is_running())
+
+    def test_argv_only(self):
+        path = self._write_script(FAKE_ARGV_ONLY)
+
+        self.assertIsNone(coprocess.get_coprocess(path))
+        with mock.patch.object(coprocess.Coprocess, 'start') as mock_start:
+            self.assertIsNone(coprocess.get_coprocess(path))
+        mock_start.assert_not_called()
+
+    @mock.patch('subprocess.Popen')
+    def test_use_privsep(self, mock_popen):
+        self.config_fixture.config(group='binding', use_privsep=True)
+
+        self.assertIsNone(coprocess.get_coprocess(
+            self._write_script(FAKE_COPROCESS)))
+        mock_popen.assert_not_called()
+
+    def test_stop(self):
+        process = coprocess.Coprocess('/fake/ovs', 1)
+        mock_process = mock.Mock()
+        mock_process.poll.return_value = None
+        process._process = mock_process
+
+        with mock.patch('kuryr.lib.binding.coprocess.time') as mock_time:
+            mock_time.time.side_effect = [0, 0, 1, 100]
+            process.stop()
+
+        mock_process.terminate.assert_called_once_with()
+        mock_time.sleep.assert_called_with(coprocess.STOP_POLL_INTERVAL)
+        mock_process.kill.assert_called_once_with()
+        mock_process.wait.assert_called_once_with()
+        self.assertFalse(process.is_running())
+
+    def test_start_outside_lock(self):
+        path = self._write_script(FAKE_COPROCESS)
+        started = threading.Event()
+        release = threading.Event()
+        self.addCleanup(release.set)
+        real_start = coprocess.Coprocess.start
+
+        def fake_start(process):
+            if process._exec_path == 'slow':
+                started.set()
+                release.wait(5)
+                return False
+            return real_start(process)
+
+        with mock.patch.object(coprocess.Coprocess, 'start', fake_start):
+            results = []
+            slow = threading.Thread(target=lambda: results.append(
+                coprocess.get_coprocess('slow')))
+            slow.start()
+            self.assertTrue(started.wait(5))
+
+            # The hello of another executable does not wait for it.
+            self.assertTrue(coprocess.get_coprocess(path).is_running())
+            self.assertTrue(slow.is_alive())
+            release.set()
+            slow.join(5)
+        self.assertEqual([None], results)
+        self.assertIsNone(coprocess.get_coprocess('slow'))
+
+    @mock.patch('kuryr.lib.binding._execute',
+                return_value=('fake_stdout', 'fake_stderr'))
+    @mock.patch('kuryr.lib.binding.coprocess.get_coprocess',
+                return_value=None)
+    def test_run_binding_fallback(self, mock_get_coprocess, mock_execute):
+        self.config_fixture.config(group='binding', use_coprocess=True)
+
+        binding_plan = plan.BindingPlan(self.port)
+
+        self.assertEqual(('fake_stdout', 'fake_stderr'),
+                         binding._run_binding('/fake/ovs', 'unbind',
+                                              'fake_endpoint_id',
+                                              binding_plan))
+        mock_get_coprocess.assert_called_once_with('/fake/ovs')
+        mock_execute.assert_called_once_with(
+            '/fake/ovs', *binding._get_unbind_args('fake_endpoint_id',
+                                                   binding_plan))
@@ -0,0 +1,89 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+from oslo_config import cfg
+
+from kuryr.lib.binding import datapath
+from kuryr.lib import config
+from kuryr.lib import exceptions
+from kuryr.tests.unit import base
+
+
+class DatapathProfileTest(base.TestCase):
+    """Unit tests for the datapath profiles."""
+
+    @mock.patch('kuryr.lib.binding.datapath._PROFILES', None)
+    def test_get_profile(self):
+        self.config_fixture.config(group='binding',
+                                   datapath_profiles=['fast'])
+        config.register_datapath_profile_opts(cfg.CONF, 'fast')
+        self.config_fixture.config(group='datapath_profile:fast',
+                                   txqueuelen=10000, gso=True, tso=False,
+                                   num_tx_queues=4, qdisc='fq_codel')
+
+        profile = datapath.get_profile('fast')
+
+        self.assertEqual('fast', profile.name)
+        self.assertEqual(10000, profile.txqueuelen)
+        self.assertEqual({'num_tx_queues': 4},
+                         profile.get_creation_attributes())
+        self.assertEqual(('gso', 'on', 'tso', 'off'),
+                         profile.get_offload_args())
+        self.assertEqual('fq_codel', profile.qdisc)
+        self.assertIn('datapath_profile:fast', cfg.CONF)
+
+    @mock.patch('kuryr.lib.binding.datapath._PROFILES', None)
+    def test_get_profile_unset(self):
+        self.config_fixture.config(group='binding', datapath_profile='empty')
+
+        profile = datapath.get_profile('empty')
+
+        self.assertIsNone(profile.txqueuelen)
+        self.assertEqual({}, profile.get_creation_attributes())
+        self.assertEqual((), profile.get_offload_args())
+
+    @mock.patch('kuryr.lib.binding.datapath._PROFILES', None)
+    def test_get_profile_not_configured(self):
+        self.config_fixture.config(group='binding',
+                                   datapath_profiles=['fast'])
+
+        self.assertRaises(exceptions.VethCreationFailure,
+                          datapath.get_profile, 'slow')
+        self.assertNotIn('datapath_profile:slow', cfg.CONF)
+
+    @mock.patch('kuryr.lib.binding.datapath._PROFILES', None)
+    def test_load_profiles(self):
+        self.config_fixture.config(group='binding', datapath_profile='fast',
+                                   datapath_profiles=['fast', 'bulk'])
+
+        profiles = datapath.load_profiles()
+
+        self.assertEqual({'fast', 'bulk'}, set(profiles))
+        self.assertIs(profiles['bulk'], datapath.get_profile('bulk'))
+
+    def test_apply_profile(self):
+        ipr = mock.Mock()
+
+        datapath.apply_profile(ipr, 5, datapath.DatapathProfile(
+            'fast', txqueuelen=10000, qdisc='fq'))
+
+        ipr.link.assert_called_once_with('set', index=5, txqlen=10000)
+        ipr.tc.assert_called_once_with('replace', kind='fq', index=5)
+
+    def test_apply_empty_profile(self):
+        ipr = mock.Mock()
+
+        datapath.apply_profile(ipr, 5, datapath.DatapathProfile('empty'))
+
+        ipr.link.assert_not_called()
+        ipr.tc.assert_not_called()
@@ -0,0 +1,370 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import errno
+import socket
+
+import mock
+import pyroute2
+
+from kuryr.lib.binding import iproute
+from kuryr.lib import exceptions
+from kuryr.tests.unit import base
+
+
+class IPRouteBindingTest(base.TestCase):
+    """Unit tests for the IPRoute based veth configuration."""
+
+    def setUp(self):
+        super(IPRouteBindingTest, self).setUp()
+        self.ipr = mock.Mock()
+        self.indexes = {}
+        self.ipr.link_lookup.side_effect = (
+            lambda ifname: [self.indexes[ifname]]
+            if ifname in self.indexes else [])
+
+    def _create_veth(self, command, ifname, kind, peer):
+        self.indexes[ifname] = 1
+        self.indexes[peer] = 2
+
+    def test_configure_veth(self):
+        self.ipr.link.side_effect = (
+            lambda command, **kwargs: self._create_veth(command, **kwargs)
+            if command == 'add' else None)
+
+        iproute.configure_veth(self.ipr, 'tapfake', 't_cfake',
+                               [('192.168.1.2', 24), ('fe80::2/64', None)],
+                               1450, 'fa:16:3e:20:57:c3')
+
+        self.ipr.link.assert_has_calls([
+            mock.call('add', ifname='tapfake', kind=iproute.KIND_VETH,
+                      peer='t_cfake'),
+            mock.call('set', index=1, state='up'),
+            mock.call('set', index=2, mtu=1450, address='fa:16:3e:20:57:c3'),
+            mock.call('set', index=2, state='up')])
+        self.ipr.addr.assert_has_calls([
+            mock.call('add', index=2, address='192.168.1.2', mask=24),
+            mock.call('add', index=2, address='fe80::2', mask=64)])
+
+    def test_configure_veth_link_attributes(self):
+        self.ipr.link.side_effect = (
+            lambda command, **kwargs: self.indexes.update(
+                {'tapfake': 1, 't_cfake': 2}) if command == 'add' else None)
+
+        iproute.configure_veth(self.ipr, 'tapfake', 't_cfake', [], 1500,
+                               'fa:16:3e:20:57:c3',
+                               link_attributes={'num_tx_queues': 4})
+
+        self.ipr.link.assert_any_call(
+            'add', ifname='tapfake', kind=iproute.KIND_VETH,
+            peer={'ifname': 't_cfake', 'num_tx_queues': 4}, num_tx_queues=4)
+
+    def test_configure_veth_reuse(self):
+        self.indexes.update({'tapfake': 1, 't_cfake': 2})
+        self.ipr.addr.side_effect = pyroute2.NetlinkError(errno.EEXIST)
+
+        iproute.configure_veth(self.ipr, 'tapfake', 't_cfake',
+                               [('192.168.1.2', 24)], 1500,
+                               'fa:16:3e:20:57:c3')
+
+        self.assertNotIn(mock.call('add', ifname='tapfake',
+                                   kind=iproute.KIND_VETH, peer='t_cfake'),
+                         self.ipr.link.call_args_list)
+        self.ipr.link.assert_called_with('set', index=2, state='up')
+
+    def test_configure_veth_creation_failure(self):
+        self.ipr.link.side_effect = pyroute2.NetlinkError(errno.EPERM)
+
+        self.assertRaises(exceptions.VethCreationFailure,
+                          iproute.configure_veth, self.ipr, 'tapfake',
+                          't_cfake', [], 1500, 'fa:16:3e:20:57:c3')
+
+    def test_configure_veth_address_failure(self):
+        self.indexes.update({'tapfake': 1, 't_cfake': 2})
+        self.ipr.addr.side_effect = pyroute2.NetlinkError(errno.EINVAL)
+
+        self.assertRaises(exceptions.VethCreationFailure,
+                          iproute.configure_veth, self.ipr, 'tapfake',
+                          't_cfake', [('192.168.1.2', 24)], 1500,
+                          'fa:16:3e:20:57:c3')
+
+    def test_configure_veth_link_index(self):
+        fake_link_index = mock.Mock(sequence=42)
+        fake_link_index.lookup.side_effect = [None, 1, 2]
+
+        iproute.configure_veth(self.ipr, 'tapfake', 't_cfake', [], 1500,
+                               'fa:16:3e:20:57:c3', link_index=fake_link_index)
+
+        # The pair created is looked up among the links notified after.
+        fake_link_index.lookup.assert_has_calls([
+            mock.call('tapfake', 0, None),
+            mock.call('tapfake', iproute.LINK_NOTIFICATION_TIMEOUT, 42),
+            mock.call('t_cfake', iproute.LINK_NOTIFICATION_TIMEOUT, 42)])
+        self.ipr.link_lookup.assert_not_called()
+        self.ipr.link.assert_called_with('set', index=2, state='up')
+
+    def test_configure_veth_stale_link_index(self):
+        # The link index has not processed the deletion of the old pair.
+        fake_link_index = mock.Mock(sequence=42)
+        fake_link_index.lookup.side_effect = [7, 8]
+
+        def fake_link(command, **kwargs):
+            if command == 'add':
+                self._create_veth(command, **kwargs)
+            elif kwargs.get('index') in (7, 8):
+                raise pyroute2.NetlinkError(errno.ENODEV)
+
+        self.ipr.link.side_effect = fake_link
+
+        iproute.configure_veth(self.ipr, 'tapfake', 't_cfake', [], 1500,
+                               'fa:16:3e:20:57:c3', link_index=fake_link_index)
+
+        self.ipr.link.assert_has_calls([
+            mock.call('set', index=7, state='up'),
+            mock.call('add', ifname='tapfake', kind=iproute.KIND_VETH,
+                      peer='t_cfake'),
+            mock.call('set', index=1, state='up'),
+            mock.call('set', index=2, mtu=1500,
+                      address='fa:16:3e:20:57:c3'),
+            mock.call('set', index=2, state='up')])
+
+    def test_create_veths(self):
+        fake_link_index = mock.Mock(sequence=42)
+        fake_link_index.lookup.side_effect = [1, 2]
+
+        def fake_link(command, ifname, kind, peer):
+            if ifname == 'tapfake2':
+                raise pyroute2.NetlinkError(errno.EEXIST)
+
+        self.ipr.link.side_effect = fake_link
+
+        created = iproute.create_veths(
+            self.ipr, [('tapfake1', 't_cfake1'), ('tapfake2', 't_cfake2')],
+            fake_link_index)
+
+        # Both pairs are requested before the first one is looked up.
+        self.assertEqual({'tapfake1': (1, 2)}, created)
+        self.assertEqual(2, self.ipr.link.call_count)
+        fake_link_index.lookup.assert_has_calls([
+            mock.call('tapfake1', iproute.LINK_NOTIFICATION_TIMEOUT, 42),
+            mock.call('t_cfake1', iproute.LINK_NOTIFICATION_TIMEOUT, 42)])
+
+    def test_delete_link(self):
+        fake_link_index = mock.Mock()
+
+        iproute.delete_link(self.ipr, 7, fake_link_index)
+
+        self.ipr.link.assert_called_once_with('del', index=7)
+        fake_link_index.forget.assert_called_once_with(7)
+
+    def test_configure_veth_in_netns(self):
+        self.indexes['tapfake'] = 5
+        netns_ipr = mock.Mock()
+        netns_ipr.link_lookup.return_value = [3]
+        netns_handle = mock.Mock(fd=42, iproute=netns_ipr)
+
+        iproute.configure_veth_in_netns(
+            self.ipr, netns_handle, 'tapfake', 'eth0', [('192.168.1.2', 24)],
+            1450, 'fa:16:3e:20:57:c3', ['192.168.1.1', 'fe80::1'])
+
+        self.ipr.link.assert_has_calls([
+            mock.call('add', ifname='tapfake', kind=iproute.KIND_VETH,
+                      peer={'ifname': 'eth0', 'net_ns_fd': 42,
+                            'address': 'fa:16:3e:20:57:c3', 'mtu': 1450}),
+            mock.call('set', index=5, state='up')])
+        netns_ipr.link_lookup.assert_called_once_with(ifname='eth0')
+        netns_ipr.addr.assert_called_once_with(
+            'add', index=3, address='192.168.1.2', mask=24)
+        netns_ipr.link.assert_called_once_with('set', index=3, state='up')
+        netns_ipr.route.assert_has_calls([
+            mock.call('replace', dst='0.0.0.0/0', gateway='192.168.1.1',
+                      oif=3, family=socket.AF_INET),
+            mock.call('replace', dst='::/0', gateway='fe80::1', oif=3,
+                      family=socket.AF_INET6)])
+
+    def test_configure_veth_in_netns_existing(self):
+        self.indexes['tapfake'] = 5
+        self.ipr.link.side_effect = pyroute2.NetlinkError(errno.EEXIST)
+        netns_handle = mock.Mock(fd=42)
+
+        self.assertRaises(exceptions.VethCreationFailure,
+                          iproute.configure_veth_in_netns, self.ipr,
+                          netns_handle, 'tapfake', 'eth0', [], 1500,
+                          'fa:16:3e:20:57:c3')
+        # The interface of the running container is left alone.
+        self.assertEqual(1, self.ipr.link.call_count)
+        netns_handle.iproute.link.assert_not_called()
+
+    def test_configure_veth_in_netns_missing_peer(self):
+        self.indexes['tapfake'] = 5
+        netns_handle = mock.Mock(fd=42)
+        netns_handle.iproute.link_lookup.return_value = []
+
+        self.assertRaises(exceptions.VethCreationFailure,
+                          iproute.configure_veth_in_netns, self.ipr,
+                          netns_handle, 'tapfake', 'eth0', [], 1500,
+                          'fa:16:3e:20:57:c3')
+
+    def test_configure_sub_interface(self):
+        self.indexes['eth1'] = 4
+        self.ipr.link.side_effect = (
+            lambda command, **kwargs: self.indexes.update(
+                {kwargs['ifname']: 6}) if command == 'add' else None)
+
+        iproute.configure_sub_interface(
+            self.ipr, 'eth1', 'tapfake', iproute.KIND_IPVLAN, 'l3',
+            [('192.168.1.2', 24)], 1450, 'fa:16:3e:20:57:c3',
+            ['192.168.1.1'])
+
+        self.ipr.link.assert_has_calls([
+            mock.call('add', ifname='tapfake', kind=iproute.KIND_IPVLAN,
+                      link=4, mtu=1450, ipvlan_mode=1),
+            mock.call('set', index=6, state='up')])
+        self.ipr.addr.assert_called_once_with(
+            'add', index=6, address='192.168.1.2', mask=24)
+        # The default routes of the host are left alone.
+        self.ipr.route.assert_not_called()
+
+    def test_configure_sub_interface_link_attributes(self):
+        self.indexes['eth1'] = 4
+        self.ipr.link.side_effect = (
+            lambda command, **kwargs: self.indexes.update(
+                {kwargs['ifname']: 6}) if command == 'add' else None)
+
+        iproute.configure_sub_interface(
+            self.ipr, 'eth1', 'tapfake', iproute.KIND_IPVLAN, 'l3',
+            [('192.168.1.2', 24)], 1450, 'fa:16:3e:20:57:c3',
+            link_attributes={'num_tx_queues': 4})
+
+        self.ipr.link.assert_any_call(
+            'add', ifname='tapfake', kind=iproute.KIND_IPVLAN, link=4,
+            mtu=1450, ipvlan_mode=1, num_tx_queues=4)
+
+    def test_configure_sub_interface_in_netns(self):
+        self.indexes['eth1'] = 4
+        netns_ipr = mock.Mock()
+        netns_ipr.link_lookup.return_value = [5]
+        netns_handle = mock.Mock(fd=42, iproute=netns_ipr)
+
+        iproute.configure_sub_interface(
+            self.ipr, 'eth1', 'eth0', 'macvlan', 'bridge',
+            [('192.168.1.2', 24)], 1450, 'fa:16:3e:20:57:c3',
+            ['192.168.1.1'], netns_handle=netns_handle)
+
+        netns_ipr.link.assert_called_once_with('set', index=5, state='up')
+        self.ipr.link.assert_called_once_with(
+            'add', ifname='eth0', kind='macvlan', link=4, mtu=1450,
+            macvlan_mode='bridge', address='fa:16:3e:20:57:c3',
+            net_ns_fd=42)
+        netns_ipr.addr.assert_called_once_with(
+            'add', index=5, address='192.168.1.2', mask=24)
+        netns_ipr.route.assert_called_once_with(
+            'replace', dst='0.0.0.0/0', gateway='192.168.1.1', oif=5,
+            family=socket.AF_INET)
+
+    def test_configure_sub_interface_exists(self):
+        self.indexes['eth1'] = 4
+        self.ipr.link.side_effect = pyroute2.NetlinkError(errno.EEXIST)
+        netns_handle = mock.Mock(fd=42)
+
+        self.assertRaises(exceptions.VethCreationFailure,
+                          iproute.configure_sub_interface, self.ipr, 'eth1',
+                          'eth0', iproute.KIND_IPVLAN, 'l2', [], 1500,
+                          'fa:16:3e:20:57:c3', netns_handle=netns_handle)
+        # The existing interface of the container is left alone.
+        self.assertEqual(1, self.ipr.link.call_count)
+        netns_handle.iproute.link.assert_not_called()
+
+    def test_configure_sub_interface_missing_uplink(self):
+        self.assertRaises(exceptions.VethCreationFailure,
+                          iproute.configure_sub_interface, self.ipr, 'eth1',
+                          'tapfake', iproute.KIND_IPVLAN, 'l2', [], 1500,
+                          'fa:16:3e:20:57:c3')
+        self.ipr.link.assert_not_called()
+
+    def _get_link(self, flags, mtu=None, address=None, master=None):
+        attrs = {'IFLA_MTU': mtu, 'IFLA_ADDRESS': address,
+                 'IFLA_MASTER': master}
+        link = mock.MagicMock()
+        link.__getitem__.side_effect = {'flags': flags}.__getitem__
+        link.get_attr.side_effect = attrs.get
+        return link
+
+    def _get_addr(self, address, prefixlen):
+        addr = mock.MagicMock()
+        addr.__getitem__.side_effect = {'prefixlen': prefixlen}.__getitem__
+        addr.get_attr.return_value = address
+        return addr
+
+    def test_ensure_veth_unchanged(self):
+        links = {1: self._get_link(iproute.IFF_UP, master=7),
+                 2: self._get_link(iproute.IFF_UP, 1450,
+                                   'FA:16:3E:20:57:C3')}
+        self.ipr.get_links.side_effect = lambda index: [links[index]]
+        self.ipr.get_addr.return_value = [
+            self._get_addr('192.168.1.2', 24),
+            self._get_addr('fe80::2', 64)]
+
+        master = iproute.ensure_veth(
+            self.ipr, 1, self.ipr, 2,
+            [('192.168.1.2', 24), ('fe80:0::2/64', None)], 1450,
+            'fa:16:3e:20:57:c3')
+
+        self.assertEqual(7, master)
+        self.ipr.link.assert_not_called()
+        self.ipr.addr.assert_not_called()
+
+    def test_ensure_veth_changed(self):
+        links = {1: self._get_link(0),
+                 2: self._get_link(0, 1500, 'fa:16:3e:20:57:c3')}
+        self.ipr.get_links.side_effect = lambda index: [links[index]]
+        self.ipr.get_addr.return_value = [self._get_addr('192.168.1.2', 24)]
+
+        master = iproute.ensure_veth(
+            self.ipr, 1, self.ipr, 2,
+            [('192.168.1.2', 24), ('192.168.2.2', 24)], 1450,
+            'fa:16:3e:20:57:c3')
+
+        self.assertIsNone(master)
+        self.ipr.link.assert_has_calls([
+            mock.call('set', index=1, state='up'),
+            mock.call('set', index=2, mtu=1450, state='up')])
+        self.ipr.addr.assert_called_once_with(
+            'add', index=2, address='192.168.2.2', mask=24)
+
+    def test_ensure_veth_keep_address(self):
+        link = self._get_link(iproute.IFF_UP, 1500, 'fa:16:3e:00:00:01')
+        self.ipr.get_links.return_value = [link]
+        self.ipr.get_addr.return_value = []
+
+        iproute.ensure_veth(self.ipr, 6, self.ipr, 6, [], 1500, None)
+
+        self.ipr.link.assert_not_called()
+
+    def test_ensure_veth_moved_peer(self):
+        self.ipr.get_links.return_value = [self._get_link(0, master=7)]
+
+        master = iproute.ensure_veth(self.ipr, 1, None, None,
+                                     [('192.168.1.2', 24)], 1450,
+                                     'fa:16:3e:20:57:c3')
+
+        self.assertEqual(7, master)
+        self.ipr.get_links.assert_called_once_with(1)
+        self.ipr.link.assert_called_once_with('set', index=1, state='up')
+        self.ipr.addr.assert_not_called()
+
+    def test_ensure_veth_failure(self):
+        self.ipr.get_links.side_effect = pyroute2.NetlinkError(errno.ENODEV)
+
+        self.assertRaises(exceptions.VethCreationFailure,
+                          iproute.ensure_veth, self.ipr, 1, self.ipr, 2, [],
+                          1500, 'fa:16:3e:20:57:c3')
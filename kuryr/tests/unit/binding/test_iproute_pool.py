@@ -0,0 +1,131 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import errno
+import socket
+import threading
+
+import mock
+import pyroute2
+
+from kuryr.lib import binding
+from kuryr.lib.binding import iproute
+from kuryr.lib.binding import iproute_pool
+from kuryr.lib import exceptions
+from kuryr.tests.unit import base
+
+
+@mock.patch('pyroute2.IPRoute', side_effect=lambda: mock.Mock())
+class IPRoutePoolTest(base.TestCase):
+    """Unit tests for the pool of netlink sockets."""
+
+    def test_connection_reuse(self, mock_iproute):
+        pool = iproute_pool.IPRoutePool(2, rcvbuf=1048576)
+
+        with pool.connection() as first:
+            with pool.connection() as second:
+                self.assertIsNot(first, second)
+        with pool.connection() as third:
+            self.assertIn(third, (first, second))
+
+        self.assertEqual(2, mock_iproute.call_count)
+        first.setsockopt.assert_called_once_with(
+            socket.SOL_SOCKET, socket.SO_RCVBUF, 1048576)
+
+    def test_checkout_waits(self, mock_iproute):
+        pool = iproute_pool.IPRoutePool(1)
+        ipr = pool.checkout()
+        checked_out = []
+
+        thread = threading.Thread(
+            target=lambda: checked_out.append(pool.checkout()))
+        thread.start()
+        thread.join(0.2)
+        self.assertEqual([], checked_out)
+
+        pool.checkin(ipr)
+        thread.join()
+        self.assertEqual([ipr], checked_out)
+        self.assertEqual(1, mock_iproute.call_count)
+
+    def test_connection_enobufs(self, mock_iproute):
+        pool = iproute_pool.IPRoutePool(1)
+
+        def _fail():
+            with pool.connection() as ipr:
+                failed.append(ipr)
+                raise pyroute2.NetlinkError(errno.ENOBUFS)
+
+        failed = []
+        self.assertRaises(pyroute2.NetlinkError, _fail)
+        failed[0].close.assert_called_once_with()
+
+        with pool.connection() as ipr:
+            self.assertIsNot(failed[0], ipr)
+        self.assertEqual(2, mock_iproute.call_count)
+
+    def test_connection_enobufs_wrapped(self, mock_iproute):
+        pool = iproute_pool.IPRoutePool(1)
+
+        def _fail():
+            with pool.connection() as ipr:
+                failed.append(ipr)
+                ipr.link_lookup.return_value = []
+                ipr.link.side_effect = pyroute2.NetlinkError(errno.ENOBUFS)
+                iproute.configure_veth(ipr, 'tapfake', 't_cfake',
+                                       [('192.168.1.2', 24)], 1450,
+                                       'fa:16:3e:20:57:c3')
+
+        failed = []
+        self.assertRaises(exceptions.VethCreationFailure, _fail)
+        failed[0].close.assert_called_once_with()
+
+        with pool.connection() as ipr:
+            self.assertIsNot(failed[0], ipr)
+
+    def test_connection_other_error(self, mock_iproute):
+        pool = iproute_pool.IPRoutePool(1)
+
+        def _fail():
+            with pool.connection():
+                raise pyroute2.NetlinkError(errno.EEXIST)
+
+        self.assertRaises(pyroute2.NetlinkError, _fail)
+        with pool.connection() as ipr:
+            ipr.close.assert_not_called()
+        self.assertEqual(1, mock_iproute.call_count)
+
+    def test_close(self, mock_iproute):
+        pool = iproute_pool.IPRoutePool(2)
+        idle = pool.checkout()
+        busy = pool.checkout()
+        pool.checkin(idle)
+
+        pool.close()
+
+        idle.close.assert_called_once_with()
+        busy.close.assert_not_called()
+        pool.checkin(busy)
+        busy.close.assert_called_once_with()
+
+    def test_iproute_connection(self, mock_iproute):
+        self.config_fixture.config(group='binding', iproute_pool_size=2)
+        with mock.patch.object(binding, '_IPROUTE_POOL_CACHE', None):
+            with binding.iproute_connection() as ipr:
+                self.assertEqual(1, mock_iproute.call_count)
+            self.assertIs(ipr, binding.get_iproute_pool().checkout())
+
+        self.config_fixture.config(group='binding', iproute_pool_size=0)
+        self.assertIsNone(binding.get_iproute_pool())
+        with mock.patch.object(binding, 'get_iproute') as mock_get_iproute:
+            with binding.iproute_connection() as ipr:
+                self.assertIs(mock_get_iproute.return_value, ipr)
@@ -0,0 +1,139 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+import sqlite3
+import time
+import uuid
+
+import fixtures
+
+from kuryr.lib.binding import journal
+from kuryr.tests.unit import base
+
+
+class JournalTest(base.TestCase):
+    """Unit tests for the journal of the bound ports."""
+
+    def setUp(self):
+        super(JournalTest, self).setUp()
+        self.path = os.path.join(self.useFixture(fixtures.TempDir()).path,
+                                 'binding.db')
+        self.journal = journal.Journal(self.path)
+        self.addCleanup(self.journal.close)
+        self.port_id = str(uuid.uuid4())
+
+    def test_record_bind(self):
+        self.journal.record_bind(self.port_id, 'fake_endpoint_id', 'tapfake',
+                                 't_cfake', 'ovs', '/proc/42/ns/net',
+                                 {'port_filter': True})
+
+        entry = self.journal.get(self.port_id)
+        self.assertEqual(
+            (self.port_id, 'fake_endpoint_id', 'tapfake', 't_cfake', 'ovs',
+             '/proc/42/ns/net'), entry[:6])
+        self.assertEqual(
+            journal.get_vif_details_digest({'port_filter': True}),
+            entry.vif_details_digest)
+        self.assertEqual({self.port_id}, self.journal.get_port_ids())
+
+    def test_record_link_kind(self):
+        self.journal.record_bind(self.port_id, 'fake_endpoint_id', 'tapfake',
+                                 'eth0', 'ovs', '/proc/42/ns/net',
+                                 link_kind='macvlan')
+
+        self.assertEqual('macvlan', self.journal.get(self.port_id).link_kind)
+
+    def test_record_unbind(self):
+        self.journal.record_bind(self.port_id, 'fake_endpoint_id', 'tapfake',
+                                 't_cfake', 'ovs')
+
+        self.journal.record_unbind(self.port_id)
+
+        self.assertIsNone(self.journal.get(self.port_id))
+        self.assertEqual([], self.journal.get_entries())
+
+    def test_record_pending(self):
+        self.journal.record_bind(self.port_id, 'fake_endpoint_id', 'tapfake',
+                                 't_cfake', 'ovs', pending=True)
+
+        self.assertTrue(self.journal.get(self.port_id).pending)
+        self.assertEqual({self.port_id}, self.journal.get_pending_port_ids())
+        self.assertEqual({self.port_id}, self.journal.get_port_ids())
+
+        self.journal.record_bind(self.port_id, 'fake_endpoint_id', 'tapfake',
+                                 't_cfake', 'ovs')
+
+        self.assertFalse(self.journal.get(self.port_id).pending)
+        self.assertEqual(set(), self.journal.get_pending_port_ids())
+
+    def test_expire_pending(self):
+        self.journal.record_bind(self.port_id, 'fake_endpoint_id', 'tapfake',
+                                 't_cfake', 'ovs', pending=True)
+        kept_port_id = str(uuid.uuid4())
+        self.journal.record_bind(kept_port_id, 'fake_endpoint_id', 'tapfake',
+                                 't_cfake', 'ovs', pending=True)
+        bound_port_id = str(uuid.uuid4())
+        self.journal.record_bind(bound_port_id, 'fake_endpoint_id', 'tapfake',
+                                 't_cfake', 'ovs')
+        later = time.time() + 1
+
+        self.assertEqual(set(),
+                         self.journal.get_pending_port_ids(since=later))
+        self.assertEqual({self.port_id},
+                         self.journal.expire_pending(later, {kept_port_id}))
+        self.assertIsNone(self.journal.get(self.port_id))
+        self.assertEqual({kept_port_id, bound_port_id},
+                         self.journal.get_port_ids())
+
+    def test_migrate(self):
+        path = os.path.join(os.path.dirname(self.path), 'old.db')
+        connection = sqlite3.connect(path)
+        connection.execute(
+            'CREATE TABLE ports (port_id TEXT PRIMARY KEY, endpoint_id TEXT, '
+            'ifname TEXT NOT NULL, peer_name TEXT NOT NULL, '
+            'vif_type TEXT NOT NULL, netns TEXT, '
+            'vif_details_digest TEXT NOT NULL, updated_at REAL NOT NULL)')
+        connection.execute(
+            'INSERT INTO ports VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (self.port_id, 'fake_endpoint_id', 'tapfake', 't_cfake', 'ovs',
+             None, 'fake_digest', 0.0))
+        connection.commit()
+        connection.close()
+
+        migrated = journal.Journal(path)
+        self.addCleanup(migrated.close)
+
+        self.assertEqual(0, migrated.get(self.port_id).pending)
+        self.assertIsNone(migrated.get(self.port_id).link_kind)
+        self.assertEqual(set(), migrated.get_pending_port_ids())
+
+    def test_reopen(self):
+        self.journal.record_bind(self.port_id, 'fake_endpoint_id', 'tapfake',
+                                 't_cfake', 'tap')
+        self.journal.record_bind(self.port_id, 'fake_endpoint_id', 'tapfake',
+                                 't_cfake', 'ovs')
+        self.journal.compact()
+
+        reopened = journal.Journal(self.path)
+        self.addCleanup(reopened.close)
+
+        entries = reopened.get_entries()
+        self.assertEqual(1, len(entries))
+        self.assertEqual('ovs', entries[0].vif_type)
+
+    def test_get_vif_details_digest(self):
+        self.assertEqual(
+            journal.get_vif_details_digest({'a': 1, 'b': 2}),
+            journal.get_vif_details_digest({'b': 2, 'a': 1}))
+        self.assertEqual(journal.get_vif_details_digest(None),
+                         journal.get_vif_details_digest({}))
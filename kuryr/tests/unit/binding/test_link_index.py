@@ -0,0 +1,105 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+
+from kuryr.lib.binding import link_index
+from kuryr.tests.unit import base
+
+
+class FakeLinkMessage(dict):
+
+    def __init__(self, event, index, ifname, flags=0):
+        super(FakeLinkMessage, self).__init__(event=event, index=index,
+                                              flags=flags)
+        self.ifname = ifname
+
+    def get_attr(self, name):
+        if name == 'IFLA_IFNAME':
+            return self.ifname
+
+
+class LinkIndexTest(base.TestCase):
+    """Unit tests for the link index."""
+
+    def setUp(self):
+        super(LinkIndexTest, self).setUp()
+        self.index = link_index.LinkIndex()
+
+    @mock.patch('pyroute2.IPRoute')
+    def test_resync(self, mock_iproute):
+        mock_iproute.return_value.get_links.return_value = [
+            FakeLinkMessage(link_index.RTM_NEWLINK, 1, 'lo',
+                            link_index.IFF_UP),
+            FakeLinkMessage(link_index.RTM_NEWLINK, 7, 'tapfake')]
+
+        self.index._resync()
+
+        self.assertEqual(1, self.index.lookup('lo'))
+        self.assertEqual(7, self.index.lookup('tapfake'))
+        self.assertTrue(self.index.is_up('lo'))
+        self.assertFalse(self.index.is_up('tapfake'))
+        self.assertIsNone(self.index.lookup('t_cfake'))
+        mock_iproute.return_value.close.assert_called_once()
+
+    def test_update(self):
+        self.index._update(
+            FakeLinkMessage(link_index.RTM_NEWLINK, 7, 'tapfake'))
+        self.assertEqual(7, self.index.lookup('tapfake'))
+
+        # Renaming the link drops its previous name.
+        self.index._update(
+            FakeLinkMessage(link_index.RTM_NEWLINK, 7, 'eth0',
+                            link_index.IFF_UP))
+        self.assertIsNone(self.index.lookup('tapfake'))
+        self.assertEqual(7, self.index.lookup('eth0'))
+        self.assertTrue(self.index.is_up('eth0'))
+
+        self.index._update(
+            FakeLinkMessage(link_index.RTM_DELLINK, 7, 'eth0'))
+        self.assertIsNone(self.index.lookup('eth0'))
+        self.assertFalse(self.index.is_up('eth0'))
+
+    @mock.patch('time.time', side_effect=[0, 0, 1])
+    def test_lookup_timeout(self, mock_time):
+        with mock.patch.object(self.index._cond, 'wait') as mock_wait:
+            self.assertIsNone(self.index.lookup('tapfake', timeout=1))
+        mock_wait.assert_called_once_with(1)
+
+    def test_forget(self):
+        self.index._update(
+            FakeLinkMessage(link_index.RTM_NEWLINK, 7, 'tapfake'))
+
+        self.index.forget(7)
+
+        self.assertIsNone(self.index.lookup('tapfake'))
+        # The notifications of the link sent before its deletion are ignored.
+        self.index._update(
+            FakeLinkMessage(link_index.RTM_NEWLINK, 7, 'tapfake'))
+        self.assertIsNone(self.index.lookup('tapfake'))
+        self.index._update(
+            FakeLinkMessage(link_index.RTM_DELLINK, 7, 'tapfake'))
+        self.index._update(
+            FakeLinkMessage(link_index.RTM_NEWLINK, 9, 'tapfake'))
+        self.assertEqual(9, self.index.lookup('tapfake'))
+
+    def test_lookup_since(self):
+        self.index._update(
+            FakeLinkMessage(link_index.RTM_NEWLINK, 7, 'tapfake'))
+        since = self.index.sequence
+
+        with mock.patch.object(self.index._cond, 'wait') as mock_wait:
+            mock_wait.side_effect = lambda timeout: self.index._update(
+                FakeLinkMessage(link_index.RTM_NEWLINK, 9, 'tapfake'))
+            # The link known before the creation is not returned.
+            self.assertEqual(9, self.index.lookup('tapfake', 1, since))
+        mock_wait.assert_called_once()
@@ -0,0 +1,101 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+import tempfile
+
+import mock
+
+from kuryr.lib.binding import netns
+from kuryr.lib import utils
+from kuryr.tests.unit import base
+
+
+class NetnsCacheTest(base.TestCase):
+    """Unit tests for the cache of the network namespace handles."""
+
+    def setUp(self):
+        super(NetnsCacheTest, self).setUp()
+        self.cache = netns.NetnsCache(2)
+        self.addCleanup(self.cache.clear)
+
+    def _make_netns(self):
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_get_netns_path(self):
+        self.assertEqual(os.path.join(utils.DOCKER_NETNS_BASE, 'fake'),
+                         netns.get_netns_path('fake'))
+        self.assertEqual('/proc/1/ns/net',
+                         netns.get_netns_path('/proc/1/ns/net'))
+
+    def test_checkout(self):
+        paths = [self._make_netns() for _ in range(3)]
+
+        handle = self.cache.checkout(paths[0])
+        self.cache.checkin(handle)
+        self.assertIs(handle, self.cache.checkout(paths[0]))
+        self.cache.checkin(handle)
+        for path in paths[1:]:
+            self.cache.checkin(self.cache.checkout(path))
+
+        # The least recently used handle was closed.
+        self.assertRaises(OSError, os.fstat, handle.fd)
+        with self.cache.use(paths[0]) as other:
+            self.assertIsNot(handle, other)
+
+    def test_checkout_evicted_in_use(self):
+        paths = [self._make_netns() for _ in range(3)]
+
+        handle = self.cache.checkout(paths[0])
+        for path in paths[1:]:
+            with self.cache.use(path):
+                pass
+
+        # The evicted handle is only closed once it is checked in.
+        os.fstat(handle.fd)
+        self.cache.checkin(handle)
+        self.assertRaises(OSError, os.fstat, handle.fd)
+
+    def test_invalidate_in_use(self):
+        path = self._make_netns()
+
+        with self.cache.use(path) as handle:
+            self.cache.invalidate(path)
+            os.fstat(handle.fd)
+            with self.cache.use(path) as other:
+                self.assertIsNot(handle, other)
+        self.assertRaises(OSError, os.fstat, handle.fd)
+
+    def test_checkout_replaced(self):
+        path = self._make_netns()
+        with self.cache.use(path) as handle:
+            pass
+
+        # The namespace file is now another one.
+        os.remove(path)
+        with open(path, 'w'):
+            pass
+
+        with self.cache.use(path) as other:
+            self.assertIsNot(handle, other)
+        self.assertRaises(OSError, os.fstat, handle.fd)
+
+    @mock.patch('pyroute2.IPRoute')
+    @mock.patch('pyroute2.netns.setns')
+    def test_iproute(self, mock_setns, mock_iproute):
+        with self.cache.use(self._make_netns()) as handle:
+            self.assertIs(mock_iproute.return_value, handle.iproute)
+            self.assertIs(mock_iproute.return_value, handle.iproute)
+        mock_setns.assert_called_once_with(handle.fd)
@@ -0,0 +1,210 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import uuid
+
+import mock
+
+from kuryr.lib.binding.drivers import ovs
+from kuryr.lib.binding.drivers import ovs_batch
+from kuryr.lib.binding.drivers import ovs_index
+from kuryr.lib.binding import plan
+from kuryr.lib import exceptions
+from kuryr.tests.unit import base
+
+
+class OvsDriverTest(base.TestCase):
+    """Unit tests for the in-process OVS binding driver."""
+
+    def setUp(self):
+        super(OvsDriverTest, self).setUp()
+        self.ovsdb = mock.MagicMock()
+        self.txn = self.ovsdb.transaction.return_value.__enter__.return_value
+        self.interface_index = mock.Mock()
+        self.driver = ovs.OvsDriver(ovsdb=self.ovsdb,
+                                    interface_index=self.interface_index)
+        self.endpoint_id = 'fake_endpoint_id'
+        self.port = {'id': str(uuid.uuid4()),
+                     'mac_address': 'fa:16:3e:20:57:c3',
+                     'binding:vif_details': {}}
+
+    def test_bind(self):
+        self.driver.bind(self.endpoint_id, self.port, 'tapfake')
+
+        self.ovsdb.add_port.assert_called_once_with('br-int', 'tapfake',
+                                                    may_exist=True)
+        self.ovsdb.db_set.assert_called_once_with(
+            'Interface', 'tapfake',
+            ('external_ids', {'attached-mac': self.port['mac_address'],
+                              'iface-id': self.port['id'],
+                              'vm-uuid': self.endpoint_id,
+                              'iface-status': 'active',
+                              'owner': ovs.OWNER}))
+        # The external_ids are written even when the port already exists.
+        self.ovsdb.transaction.assert_called_once_with(check_error=True)
+        self.txn.add.assert_has_calls([
+            mock.call(self.ovsdb.add_port.return_value),
+            mock.call(self.ovsdb.db_set.return_value)])
+
+    def test_bind_plan(self):
+        binding_plan = plan.BindingPlan(self.port)
+
+        self.driver.bind_plan(self.endpoint_id, binding_plan)
+
+        self.ovsdb.add_port.assert_called_once_with(
+            'br-int', binding_plan.ifname, may_exist=True)
+        self.ovsdb.db_set.assert_called_once_with(
+            'Interface', binding_plan.ifname,
+            ('external_ids', {'attached-mac': self.port['mac_address'],
+                              'iface-id': self.port['id'],
+                              'vm-uuid': self.endpoint_id,
+                              'iface-status': 'active',
+                              'owner': ovs.OWNER}))
+
+    def test_bind_failure(self):
+        self.ovsdb.transaction.return_value.__exit__.side_effect = (
+            RuntimeError('fake'))
+
+        self.assertRaises(exceptions.BindingFailure, self.driver.bind,
+                          self.endpoint_id, self.port, 'tapfake')
+
+    def test_unbind(self):
+        self.interface_index.lookup_iface_id.return_value = (
+            ovs_index.Interface('fake_uuid', 'tapfake', self.port['id'],
+                                ovs.OWNER))
+
+        self.driver.unbind(self.endpoint_id, self.port, 'tapfake')
+
+        self.interface_index.lookup_iface_id.assert_called_once_with(
+            self.port['id'], owner=ovs.OWNER)
+        self.ovsdb.del_port.assert_called_once_with(
+            'tapfake', bridge='br-int', if_exists=True)
+        self.txn.add.assert_called_once_with(
+            self.ovsdb.del_port.return_value)
+
+    def test_unbind_not_plugged(self):
+        self.interface_index.lookup_iface_id.return_value = None
+
+        self.driver.unbind(self.endpoint_id, self.port, 'tapfake')
+
+        self.ovsdb.transaction.assert_not_called()
+
+    def _fake_links(self, mock_get_iproute, existing=()):
+        self.links = {'tapfake': 40}
+        peers = {}
+        for name in existing:
+            self.links[name] = len(self.links) + 40
+
+        def link(command, **kwargs):
+            if command == 'add':
+                self.links[kwargs['ifname']] = len(self.links) + 40
+                if kwargs.get('peer'):
+                    self.links[kwargs['peer']] = len(self.links) + 40
+                    peers[kwargs['ifname']] = kwargs['peer']
+            elif command == 'del':
+                for name, index in list(self.links.items()):
+                    if index == kwargs['index']:
+                        # Deleting a veth deletes its peer too.
+                        del self.links[name]
+                        self.links.pop(peers.get(name), None)
+
+        ipr = mock_get_iproute.return_value
+        ipr.link.side_effect = link
+        ipr.link_lookup.side_effect = (
+            lambda ifname: [self.links[ifname]] if ifname in self.links
+            else [])
+        return ipr
+
+    @mock.patch('kuryr.lib.binding.get_iproute')
+    def test_bind_hybrid_plug(self, mock_get_iproute):
+        self.port['binding:vif_details'] = {ovs.HYBRID_PLUG_KEY: True}
+        br_name, veth_lb, veth_ovs = ovs._get_hybrid_names(self.port['id'])
+        ipr = self._fake_links(mock_get_iproute)
+
+        self.driver.bind(self.endpoint_id, self.port, 'tapfake')
+
+        ipr.link.assert_any_call('add', ifname=br_name, kind=ovs.KIND_BRIDGE,
+                                 br_forward_delay=0, br_stp_state=0)
+        ipr.link.assert_any_call('add', ifname=veth_lb, kind='veth',
+                                 peer=veth_ovs)
+        self.assertEqual(veth_ovs, self.ovsdb.add_port.call_args[0][1])
+        self.assertEqual(
+            self.endpoint_id,
+            self.ovsdb.db_set.call_args[0][2][1]['vm-id'])
+
+    @mock.patch('kuryr.lib.binding.get_iproute')
+    def test_bind_hybrid_plug_retry(self, mock_get_iproute):
+        self.port['binding:vif_details'] = {ovs.HYBRID_PLUG_KEY: True}
+        br_name, veth_lb, veth_ovs = ovs._get_hybrid_names(self.port['id'])
+        ipr = self._fake_links(mock_get_iproute,
+                               (br_name, veth_lb, veth_ovs))
+
+        self.driver.bind(self.endpoint_id, self.port, 'tapfake')
+
+        self.assertNotIn('add', [c[0][0] for c in ipr.link.call_args_list])
+        self.ovsdb.add_port.assert_called_once_with('br-int', veth_ovs,
+                                                    may_exist=True)
+
+    @mock.patch('kuryr.lib.binding.get_iproute')
+    def test_bind_hybrid_plug_rollback(self, mock_get_iproute):
+        self.port['binding:vif_details'] = {ovs.HYBRID_PLUG_KEY: True}
+        br_name, veth_lb, veth_ovs = ovs._get_hybrid_names(self.port['id'])
+        self._fake_links(mock_get_iproute)
+        self.ovsdb.transaction.return_value.__exit__.side_effect = [
+            RuntimeError('fake'), None]
+
+        self.assertRaises(exceptions.BindingFailure, self.driver.bind,
+                          self.endpoint_id, self.port, 'tapfake')
+
+        # Only the veth of the container is left.
+        self.assertEqual({'tapfake': 40}, self.links)
+        self.ovsdb.del_port.assert_called_once_with(
+            veth_ovs, bridge='br-int', if_exists=True)
+
+    @mock.patch('kuryr.lib.binding.iproute.lookup_link', return_value=None)
+    @mock.patch('kuryr.lib.binding.get_iproute')
+    def test_unbind_hybrid_plug(self, mock_get_iproute, mock_lookup_link):
+        self.port['binding:vif_details'] = {ovs.HYBRID_PLUG_KEY: True}
+        _, _, veth_ovs = ovs._get_hybrid_names(self.port['id'])
+        self.interface_index.lookup_iface_id.return_value = (
+            ovs_index.Interface('fake_uuid', veth_ovs, self.port['id'],
+                                ovs.OWNER))
+
+        self.driver.unbind(self.endpoint_id, self.port, 'tapfake')
+
+        self.ovsdb.del_port.assert_called_once_with(
+            veth_ovs, bridge='br-int', if_exists=True)
+        mock_get_iproute.return_value.link.assert_not_called()
+
+    def test_bind_batched(self):
+        self.config_fixture.config(group='binding', ovsdb_batch_window=0.1)
+
+        with mock.patch.object(ovs_batch.TransactionBatcher,
+                               'submit') as mock_submit:
+            self.driver.bind(self.endpoint_id, self.port, 'tapfake')
+
+        mock_submit.assert_called_once_with(
+            self.ovsdb.add_port.return_value,
+            self.ovsdb.db_set.return_value)
+        mock_submit.return_value.result.assert_called_once_with()
+        self.ovsdb.transaction.assert_not_called()
+
+    def test_is_plugged(self):
+        self.interface_index.lookup_iface_id.return_value = (
+            ovs_index.Interface('fake_uuid', 'tapfake', self.port['id'],
+                                ovs.OWNER))
+
+        self.assertTrue(self.driver.is_plugged(self.port, 'tapfake', None))
+        self.assertFalse(self.driver.is_plugged(self.port, 'tapother', 7))
+
+        self.interface_index.lookup_iface_id.return_value = None
+        self.assertFalse(self.driver.is_plugged(self.port, 'tapfake', 7))
@@ -0,0 +1,67 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+
+from kuryr.lib.binding.drivers import ovs_batch
+from kuryr.tests.unit import base
+
+
+class TransactionBatcherTest(base.TestCase):
+    """Unit tests for the coalescing of the OVSDB commands."""
+
+    def setUp(self):
+        super(TransactionBatcherTest, self).setUp()
+        self.ovsdb = mock.MagicMock()
+        self.txn = self.ovsdb.transaction.return_value.__enter__.return_value
+        self.batcher = ovs_batch.TransactionBatcher(self.ovsdb, 0, 2)
+        # The batches are committed by the test instead of the thread.
+        self.batcher._thread = mock.Mock()
+
+    def test_batch(self):
+        futures = [self.batcher.submit(command)
+                   for command in ('cmd1', 'cmd2', 'cmd3')]
+
+        self.batcher._commit(self.batcher._next_batch())
+
+        self.ovsdb.transaction.assert_called_once_with(check_error=True)
+        self.assertEqual([mock.call('cmd1'), mock.call('cmd2')],
+                         self.txn.add.call_args_list)
+        self.assertIsNone(futures[0].result(0))
+        self.assertIsNone(futures[1].result(0))
+        self.assertFalse(futures[2].done())
+
+        self.batcher._commit(self.batcher._next_batch())
+
+        self.assertIsNone(futures[2].result(0))
+
+    def test_batch_failure(self):
+        fake_error = RuntimeError('cmd2 failed')
+        commands = []
+
+        def fake_exit(*args):
+            if 'cmd2' in commands:
+                del commands[:]
+                raise fake_error
+            del commands[:]
+
+        self.txn.add.side_effect = commands.append
+        self.ovsdb.transaction.return_value.__exit__.side_effect = fake_exit
+        futures = [self.batcher.submit(command)
+                   for command in ('cmd1', 'cmd2')]
+
+        self.batcher._commit(self.batcher._next_batch())
+
+        # One failed transaction for the batch, then one per command.
+        self.assertEqual(3, self.ovsdb.transaction.call_count)
+        self.assertIsNone(futures[0].result(0))
+        self.assertIs(fake_error, futures[1].exception(0))
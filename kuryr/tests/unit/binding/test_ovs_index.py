@@ -0,0 +1,89 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+
+from kuryr.lib.binding.drivers import ovs_index
+from kuryr.tests.unit import base
+
+
+class FakeRow(object):
+
+    def __init__(self, table, uuid, name, external_ids=None):
+        self._table = mock.Mock()
+        self._table.name = table
+        self.uuid = uuid
+        self.name = name
+        self.external_ids = external_ids or {}
+
+
+class InterfaceIndexTest(base.TestCase):
+    """Unit tests for the index of the OVS interfaces."""
+
+    def setUp(self):
+        super(InterfaceIndexTest, self).setUp()
+        self.rows = {}
+        tables = {ovs_index.INTERFACE_TABLE: mock.Mock(rows=self.rows)}
+        self.index = ovs_index.InterfaceIndex(tables)
+
+    def _notify(self, event, uuid, name, external_ids=None,
+                table=ovs_index.INTERFACE_TABLE):
+        row = FakeRow(table, uuid, name, external_ids)
+        if table == ovs_index.INTERFACE_TABLE:
+            if event == 'delete':
+                self.rows.pop(uuid, None)
+            else:
+                self.rows[uuid] = row
+        self.index.notify(event, row)
+
+    def test_lookup(self):
+        self._notify('create', 'uuid1', 'tap1',
+                     {'iface-id': 'port1', 'owner': 'kuryr'})
+        self._notify('create', 'uuid2', 'tap2', {'iface-id': 'port2'})
+
+        interface = self.index.lookup_iface_id('port1')
+        self.assertEqual(('uuid1', 'tap1', 'port1', 'kuryr'), interface)
+        self.assertEqual(interface, self.index.lookup_name('tap1'))
+        self.assertEqual(interface,
+                         self.index.lookup_iface_id('port1', owner='kuryr'))
+        self.assertIsNone(self.index.lookup_iface_id('port2', owner='kuryr'))
+        self.assertEqual([interface], self.index.get_owned('kuryr'))
+        self.assertIsNone(self.index.lookup_iface_id('port3'))
+
+    def test_update_and_delete(self):
+        self._notify('create', 'uuid1', 'tap1',
+                     {'iface-id': 'port1', 'owner': 'kuryr'})
+        self._notify('update', 'uuid1', 'tap1', {'iface-id': 'port2'})
+
+        self.assertIsNone(self.index.lookup_iface_id('port1'))
+        self.assertEqual('tap1', self.index.lookup_iface_id('port2').name)
+        self.assertEqual([], self.index.get_owned('kuryr'))
+
+        self._notify('delete', 'uuid1', 'tap1', {'iface-id': 'port2'})
+
+        self.assertIsNone(self.index.lookup_iface_id('port2'))
+        self.assertIsNone(self.index.lookup_name('tap1'))
+
+    def test_stale_entry(self):
+        self._notify('create', 'uuid1', 'tap1', {'iface-id': 'port1'})
+        # The row went away while the IDL was disconnected.
+        self.rows.clear()
+
+        self.assertIsNone(self.index.lookup_iface_id('port1'))
+        self.assertIsNone(self.index.lookup_name('tap1'))
+
+    def test_ports(self):
+        self._notify('create', 'uuid1', 'tap1', table=ovs_index.PORT_TABLE)
+        self.assertTrue(self.index.has_port('tap1'))
+
+        self._notify('delete', 'uuid1', 'tap1', table=ovs_index.PORT_TABLE)
+        self.assertFalse(self.index.has_port('tap1'))
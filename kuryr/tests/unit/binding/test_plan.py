@@ -0,0 +1,148 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import uuid
+
+import mock
+
+from kuryr.lib.binding import drivers
+from kuryr.lib.binding import plan
+from kuryr.lib import utils
+from kuryr.tests.unit import base
+
+
+class BindingPlanTest(base.TestCase):
+    """Unit tests for the binding plans."""
+
+    def setUp(self):
+        super(BindingPlanTest, self).setUp()
+        self.v4_subnet_id = str(uuid.uuid4())
+        self.v6_subnet_id = str(uuid.uuid4())
+        self.port = {
+            'id': str(uuid.uuid4()),
+            'mac_address': 'FA:16:3E:20:57:C3',
+            'binding:vif_type': 'ovs',
+            'binding:vif_details': {'port_filter': True},
+            'fixed_ips': [
+                {'subnet_id': self.v4_subnet_id,
+                 'ip_address': '192.168.1.2'},
+                {'subnet_id': self.v6_subnet_id,
+                 'ip_address': 'fe80::f816:3eff:fe20:57c4'}]}
+        self.subnets = [
+            {'id': self.v6_subnet_id, 'cidr': 'fe80::/64',
+             'gateway_ip': 'fe80::1'},
+            {'id': self.v4_subnet_id, 'cidr': '192.168.1.0/24',
+             'gateway_ip': '192.168.1.1'}]
+
+    def test_plan(self):
+        binding_plan = plan.BindingPlan(self.port, self.subnets,
+                                        {'mtu': 1450})
+
+        self.assertEqual(utils.get_veth_pair_names(self.port['id']),
+                         (binding_plan.ifname, binding_plan.peer_name))
+        self.assertEqual('ovs', binding_plan.vif_type)
+        self.assertEqual('fa:16:3e:20:57:c3', binding_plan.mac_address)
+        self.assertEqual((('192.168.1.2', 24),
+                          ('fe80::f816:3eff:fe20:57c4', 64)),
+                         binding_plan.ip_addresses)
+        self.assertEqual(('192.168.1.1', 'fe80::1'), binding_plan.gateways)
+        self.assertEqual(1450, binding_plan.mtu)
+        self.assertEqual(
+            utils.string_mappings(self.port['binding:vif_details']),
+            binding_plan.vif_details)
+        self.assertFalse(hasattr(binding_plan, '__dict__'))
+
+    def test_plan_without_subnets(self):
+        del self.port['binding:vif_type']
+
+        binding_plan = plan.BindingPlan(self.port)
+
+        self.assertEqual(plan.FALLBACK_VIF_TYPE, binding_plan.vif_type)
+        self.assertEqual((), binding_plan.ip_addresses)
+        self.assertEqual((), binding_plan.gateways)
+        self.assertEqual(plan.DEFAULT_NETWORK_MTU, binding_plan.mtu)
+
+    def test_plan_link_kind(self):
+        binding_plan = plan.BindingPlan(self.port)
+
+        self.assertEqual(plan.KIND_VETH, binding_plan.link_kind)
+        self.assertFalse(binding_plan.is_sub_interface)
+
+        self.config_fixture.config(group='binding', link_kind='ipvlan',
+                                   uplink_interface='eth1')
+        binding_plan = plan.BindingPlan(self.port)
+
+        self.assertEqual(plan.KIND_IPVLAN, binding_plan.link_kind)
+        self.assertEqual('eth1', binding_plan.uplink)
+        self.assertTrue(binding_plan.is_sub_interface)
+
+        self.port['binding:vif_details'].update(
+            {plan.LINK_KIND_KEY: plan.KIND_MACVLAN, plan.UPLINK_KEY: 'bond0'})
+        binding_plan = plan.BindingPlan(self.port)
+
+        self.assertEqual(plan.KIND_MACVLAN, binding_plan.link_kind)
+        self.assertEqual('bond0', binding_plan.uplink)
+
+    def test_plan_network_link_kind(self):
+        fake_network = {'id': 'fake_network_id', 'mtu': 1450,
+                        'tags': ['kuryr_link_kind=ipvlan',
+                                 'kuryr_uplink=eth2']}
+
+        binding_plan = plan.BindingPlan(self.port, self.subnets,
+                                        fake_network)
+
+        self.assertEqual(plan.KIND_IPVLAN, binding_plan.link_kind)
+        self.assertEqual('eth2', binding_plan.uplink)
+
+        binding_plan = plan.BindingPlan(self.port, self.subnets,
+                                        fake_network, plan.KIND_MACVLAN,
+                                        'bond0')
+
+        self.assertEqual(plan.KIND_MACVLAN, binding_plan.link_kind)
+        self.assertEqual('bond0', binding_plan.uplink)
+
+    def test_plan_datapath_profile(self):
+        self.assertIsNone(plan.BindingPlan(self.port).datapath_profile)
+
+        self.config_fixture.config(group='binding', datapath_profile='fast')
+        self.assertEqual('fast',
+                         plan.BindingPlan(self.port).datapath_profile)
+
+        self.port['binding:vif_details'][plan.DATAPATH_PROFILE_KEY] = 'bulk'
+        self.assertEqual('bulk',
+                         plan.BindingPlan(self.port).datapath_profile)
+
+    def test_driver_bind_plan(self):
+        driver = mock.Mock(spec=drivers.BindingDriver)
+        self.port.update(network_id='fake_network_id',
+                         tenant_id='fake_tenant_id')
+        binding_plan = plan.BindingPlan(self.port)
+
+        drivers.BindingDriver.bind_plan(driver, 'fake_endpoint_id',
+                                        binding_plan)
+
+        # The drivers not taking the plan get the fields it kept.
+        expected_port = dict(self.port, mac_address='fa:16:3e:20:57:c3',
+                             device_owner=None)
+        driver.bind.assert_called_once_with('fake_endpoint_id',
+                                            expected_port,
+                                            binding_plan.ifname)
+
+    def test_plan_slots(self):
+        binding_plan = plan.BindingPlan(self.port)
+
+        # The port itself is not kept.
+        self.assertFalse(hasattr(binding_plan, '__dict__'))
+        self.assertFalse(hasattr(binding_plan, 'neutron_port'))
+        self.assertEqual(self.port['fixed_ips'], binding_plan.fixed_ips)
+        self.assertEqual(self.port['binding:vif_details'],
+                         binding_plan.raw_vif_details)
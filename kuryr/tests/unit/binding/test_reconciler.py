@@ -0,0 +1,282 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import errno
+import json
+import os
+import time
+import uuid
+
+import fixtures
+import mock
+from oslo_concurrency import processutils
+import pyroute2
+
+from kuryr.lib import binding
+from kuryr.lib.binding.drivers import ovs
+from kuryr.lib.binding.drivers import ovs_index
+from kuryr.lib.binding import reconciler
+from kuryr.lib import exceptions
+from kuryr.lib import utils
+from kuryr.tests.unit import base
+
+
+class FakeLinkInfo(object):
+
+    def __init__(self, kind):
+        self.kind = kind
+
+    def get_attr(self, name):
+        if name == 'IFLA_INFO_KIND':
+            return self.kind
+
+
+class FakeLink(dict):
+
+    def __init__(self, index, ifname, kind='veth'):
+        super(FakeLink, self).__init__(index=index)
+        self.ifname = ifname
+        self.kind = kind
+
+    def get_attr(self, name):
+        if name == 'IFLA_IFNAME':
+            return self.ifname
+        if name == 'IFLA_LINKINFO':
+            return FakeLinkInfo(self.kind) if self.kind else None
+
+
+class ReconcilerTest(base.TestCase):
+    """Unit tests for the reconciler of the stray links and OVS ports."""
+
+    def setUp(self):
+        super(ReconcilerTest, self).setUp()
+        self.bound_port_id = str(uuid.uuid4())
+        self.stray_port_id = str(uuid.uuid4())
+        self.hybrid_port_id = str(uuid.uuid4())
+        self.bound_ifname = utils.get_veth_pair_names(self.bound_port_id)[0]
+        self.stray_ifname = utils.get_veth_pair_names(self.stray_port_id)[0]
+        br_name, veth_lb, veth_ovs = ovs._get_hybrid_names(
+            self.hybrid_port_id)
+        self.hybrid_names = (br_name, veth_lb, veth_ovs)
+        self.ipr = mock.Mock()
+        self.ipr.get_links.return_value = [
+            FakeLink(1, 'lo', kind=None),
+            FakeLink(2, self.bound_ifname),
+            FakeLink(3, self.stray_ifname),
+            # Tap devices of other services and pool pairs are kept.
+            FakeLink(4, 'tap0123456789a', kind='tun'),
+            FakeLink(5, 'kvp0123456789'),
+            FakeLink(6, br_name, kind='bridge'),
+            FakeLink(7, veth_lb),
+            FakeLink(8, veth_ovs)]
+        self.ovs_driver = ovs.OvsDriver(ovsdb=mock.MagicMock(),
+                                        interface_index=mock.Mock())
+        self.ovs_driver.interface_index.get_owned.return_value = [
+            ovs_index.Interface('uuid1', self.bound_ifname,
+                                self.bound_port_id, ovs.OWNER),
+            ovs_index.Interface('uuid2', self.stray_ifname,
+                                self.stray_port_id, ovs.OWNER),
+            ovs_index.Interface('uuid3', veth_ovs, self.hybrid_port_id,
+                                ovs.OWNER)]
+        self.reconciler = reconciler.Reconciler(
+            self.ipr, self.ovs_driver, batch_size=2, batch_interval=0.1)
+
+    def test_find_strays(self):
+        stray_links, stray_ports = self.reconciler.find_strays(
+            [self.bound_port_id])
+
+        self.assertEqual({self.stray_ifname: 3, self.hybrid_names[0]: 6,
+                          self.hybrid_names[1]: 7}, stray_links)
+        self.assertEqual([self.stray_ifname, self.hybrid_names[2]],
+                         stray_ports)
+        self.ipr.get_links.assert_called_once_with()
+
+    def test_find_strays_sub_interfaces(self):
+        ipvlan_port_id, macvlan_port_id = str(uuid.uuid4()), str(uuid.uuid4())
+        ipvlan_ifname = utils.get_veth_pair_names(ipvlan_port_id)[0]
+        macvlan_ifname = utils.get_veth_pair_names(macvlan_port_id)[0]
+        self.ipr.get_links.return_value = [
+            FakeLink(2, self.bound_ifname, kind='ipvlan'),
+            FakeLink(3, ipvlan_ifname, kind='ipvlan'),
+            FakeLink(4, macvlan_ifname, kind='macvlan'),
+            FakeLink(5, 'tap0123456789a', kind='tun')]
+
+        stray_links, _ = reconciler.Reconciler(self.ipr).find_strays(
+            [self.bound_port_id])
+
+        self.assertEqual({ipvlan_ifname: 3, macvlan_ifname: 4}, stray_links)
+
+    @mock.patch('time.sleep')
+    def test_reconcile(self, mock_sleep):
+        with mock.patch.object(self.ovs_driver, 'unplug') as mock_unplug:
+            removed_links, removed_ports = self.reconciler.reconcile(
+                [self.bound_port_id])
+
+        mock_unplug.assert_called_once_with(
+            sorted([self.stray_ifname, self.hybrid_names[2]]))
+        self.assertEqual(
+            sorted([self.stray_ifname, self.hybrid_names[0],
+                    self.hybrid_names[1]]), removed_links)
+        self.assertEqual(3, self.ipr.link.call_count)
+        # One batch of OVS ports and two batches of links.
+        self.assertEqual(2, mock_sleep.call_count)
+        mock_sleep.assert_called_with(0.1)
+
+    @mock.patch('time.sleep')
+    def test_reconcile_link_failure(self, mock_sleep):
+        self.reconciler = reconciler.Reconciler(self.ipr)
+        self.ipr.link.side_effect = pyroute2.NetlinkError(errno.EBUSY)
+
+        self.assertEqual(([], []),
+                         self.reconciler.reconcile([self.bound_port_id]))
+        self.ipr.link.assert_called_once_with('del', index=3)
+
+        self.ipr.link.side_effect = pyroute2.NetlinkError(errno.ENODEV)
+
+        self.assertEqual(([self.stray_ifname], []),
+                         self.reconciler.reconcile([self.bound_port_id]))
+        mock_sleep.assert_not_called()
+
+    def test_find_strays_callable(self):
+        def get_port_ids():
+            # The links are read before the ports to keep.
+            self.ipr.get_links.assert_called_once_with()
+            return [self.bound_port_id, self.stray_port_id]
+
+        stray_links, stray_ports = self.reconciler.find_strays(get_port_ids)
+
+        self.assertNotIn(self.stray_ifname, stray_links)
+        self.assertEqual([self.hybrid_names[2]], stray_ports)
+
+    @mock.patch('kuryr.lib.binding.get_in_flight_port_ids')
+    @mock.patch('kuryr.lib.binding.get_driver', return_value=None)
+    @mock.patch('kuryr.lib.binding.get_journal')
+    @mock.patch('kuryr.lib.binding.reconciler.Reconciler')
+    def test_reconcile_keeps_pending_ports(self, mock_reconciler,
+                                           mock_get_journal, mock_get_driver,
+                                           mock_get_in_flight_port_ids):
+        mock_journal = mock_get_journal.return_value
+        mock_journal.get_pending_port_ids.return_value = {'pending_port_id'}
+        mock_journal.expire_pending.return_value = set()
+        mock_get_in_flight_port_ids.return_value = {'in_flight_port_id'}
+
+        with mock.patch('pyroute2.IPRoute'):
+            reconciler.reconcile([self.bound_port_id])
+
+        get_port_ids = mock_reconciler.return_value.reconcile.call_args[0][0]
+        self.assertEqual({self.bound_port_id, 'pending_port_id',
+                          'in_flight_port_id'}, get_port_ids())
+        # The bound ports of the journal are not enough to reconcile.
+        mock_journal.get_port_ids.assert_not_called()
+        mock_journal.compact.assert_called_once_with()
+
+        mock_get_journal.return_value = None
+        with mock.patch('pyroute2.IPRoute'):
+            reconciler.reconcile([self.bound_port_id])
+        get_port_ids = mock_reconciler.return_value.reconcile.call_args[0][0]
+        self.assertEqual({self.bound_port_id, 'in_flight_port_id'},
+                         get_port_ids())
+        self.assertRaises(TypeError, reconciler.reconcile)
+
+    @mock.patch('kuryr.lib.binding._JOURNAL_CACHE', None)
+    @mock.patch('kuryr.lib.binding.get_in_flight_port_ids')
+    @mock.patch('kuryr.lib.binding.get_driver', return_value=None)
+    @mock.patch('kuryr.lib.binding.reconciler.Reconciler')
+    def test_reconcile_expires_pending_ports(self, mock_reconciler,
+                                             mock_get_driver,
+                                             mock_get_in_flight_port_ids):
+        self.config_fixture.config(
+            group='binding', journal_pending_timeout=60,
+            journal_path=os.path.join(
+                self.useFixture(fixtures.TempDir()).path, 'binding.db'))
+        port_journal = binding.get_journal()
+        self.addCleanup(port_journal.close)
+        for port_id in ('stale_port_id', 'in_flight_port_id', 'new_port_id'):
+            port_journal.record_bind(port_id, 'fake_endpoint_id', 'tapfake',
+                                     't_cfake', 'ovs', pending=True)
+        mock_get_in_flight_port_ids.return_value = {'in_flight_port_id'}
+
+        with mock.patch('time.time', return_value=time.time() + 120):
+            port_journal.record_bind('new_port_id', 'fake_endpoint_id',
+                                     'tapfake', 't_cfake', 'ovs',
+                                     pending=True)
+            with mock.patch('pyroute2.IPRoute'):
+                reconciler.reconcile([self.bound_port_id])
+            get_port_ids = (
+                mock_reconciler.return_value.reconcile.call_args[0][0])
+
+            # The interrupted bind is forgotten and its leftovers collected.
+            self.assertEqual({self.bound_port_id, 'in_flight_port_id',
+                              'new_port_id'}, get_port_ids())
+        self.assertIsNone(port_journal.get('stale_port_id'))
+        self.assertTrue(port_journal.get('in_flight_port_id').pending)
+
+    @mock.patch('kuryr.lib.binding.get_in_flight_port_ids',
+                return_value=set())
+    @mock.patch('kuryr.lib.binding.get_journal', return_value=None)
+    @mock.patch('kuryr.lib.binding.get_driver')
+    @mock.patch('kuryr.lib.binding.reconciler.Reconciler')
+    def test_reconcile_ovs_executable(self, mock_reconciler, mock_get_driver,
+                                      mock_get_journal,
+                                      mock_get_in_flight_port_ids):
+        # The ovs vif_type is bound by the executable.
+        mock_get_driver.return_value = mock.Mock(spec=['bind', 'unbind'])
+
+        with mock.patch('pyroute2.IPRoute'):
+            reconciler.reconcile([self.bound_port_id])
+
+        self.assertIsInstance(mock_reconciler.call_args[0][1],
+                              reconciler.VsctlOvsPorts)
+
+
+class VsctlOvsPortsTest(base.TestCase):
+    """Unit tests for the OVS ports found and removed with ovs-vsctl."""
+
+    @mock.patch('oslo_concurrency.processutils.execute')
+    def test_get_owned_interfaces(self, mock_execute):
+        port_id = str(uuid.uuid4())
+        _, _, veth_ovs = utils.get_hybrid_plug_names(port_id)
+        mock_execute.return_value = (json.dumps({
+            'headings': ['_uuid', 'name', 'external_ids'],
+            'data': [[['uuid', 'uuid1'], veth_ovs,
+                      ['map', [['iface-id', port_id],
+                               ['owner', 'kuryr']]]]]}), '')
+        ports = reconciler.VsctlOvsPorts()
+
+        interfaces = ports.get_owned_interfaces()
+
+        self.assertEqual([reconciler.OvsInterface('uuid1', veth_ovs, port_id,
+                                                  'kuryr')], interfaces)
+        self.assertEqual(list(utils.get_hybrid_plug_names(port_id)[1::-1]),
+                         ports.get_link_names(interfaces[0]))
+        mock_execute.assert_called_once_with(
+            'ovs-vsctl', '--timeout=10', '--format=json',
+            '--columns=_uuid,name,external_ids', 'find', 'Interface',
+            'external_ids:owner=kuryr', run_as_root=True, root_helper='sudo')
+
+    @mock.patch('oslo_concurrency.processutils.execute',
+                side_effect=OSError(errno.ENOENT, 'ovs-vsctl'))
+    def test_get_owned_interfaces_failure(self, mock_execute):
+        self.assertEqual([], reconciler.VsctlOvsPorts().get_owned_interfaces())
+
+    @mock.patch('oslo_concurrency.processutils.execute')
+    def test_unplug(self, mock_execute):
+        reconciler.VsctlOvsPorts().unplug(['tapfake1', 'qvofake2'])
+
+        mock_execute.assert_called_once_with(
+            'ovs-vsctl', '--timeout=10', '--', '--if-exists', 'del-port',
+            'tapfake1', '--', '--if-exists', 'del-port', 'qvofake2',
+            run_as_root=True, root_helper='sudo')
+
+        mock_execute.side_effect = processutils.ProcessExecutionError()
+        self.assertRaises(exceptions.BindingFailure,
+                          reconciler.VsctlOvsPorts().unplug, ['tapfake1'])
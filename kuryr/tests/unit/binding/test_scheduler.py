@@ -0,0 +1,171 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import threading
+import time
+
+import mock
+
+from kuryr.lib import binding
+from kuryr.lib.binding import scheduler
+from kuryr.lib import exceptions
+from kuryr.lib import metrics
+from kuryr.tests.unit import base
+
+
+class BindingSchedulerTest(base.TestCase):
+    """Unit tests for the admission control of the binding operations."""
+
+    def setUp(self):
+        super(BindingSchedulerTest, self).setUp()
+        self.sink = metrics.HistogramSink()
+        metrics.set_sink(self.sink)
+        self.addCleanup(metrics.set_sink, None)
+
+    def _start(self, binding_scheduler, order, name, vif_type='ovs',
+               priority=scheduler.BIND_PRIORITY):
+        def admitted():
+            with binding_scheduler.admit(vif_type, priority):
+                order.append(name)
+
+        thread = threading.Thread(target=admitted)
+        thread.start()
+        return thread
+
+    def _wait_queued(self, binding_scheduler, count):
+        for _ in range(500):
+            if binding_scheduler._queued == count:
+                return
+            time.sleep(0.01)
+        self.fail('%d operations were not queued' % count)
+
+    def test_admit_within_limit(self):
+        binding_scheduler = scheduler.BindingScheduler(2)
+
+        with binding_scheduler.admit('ovs'):
+            with binding_scheduler.admit('ovs'):
+                self.assertEqual(2, binding_scheduler._slots['ovs'].active)
+
+        self.assertEqual(0, binding_scheduler._slots['ovs'].active)
+        self.assertEqual(2, self.sink.get_count(metrics.QUEUE_WAIT, 'ovs'))
+
+    def test_limits_per_vif_type(self):
+        binding_scheduler = scheduler.BindingScheduler(1, {'bridge': 2},
+                                                       timeout=0.01)
+
+        with binding_scheduler.admit('bridge'):
+            with binding_scheduler.admit('bridge'):
+                with binding_scheduler.admit('ovs'):
+                    self.assertRaises(exceptions.BindingAdmissionFailure,
+                                      binding_scheduler._acquire, 'ovs',
+                                      scheduler.BIND_PRIORITY)
+
+    def test_queue_full(self):
+        binding_scheduler = scheduler.BindingScheduler(1, max_queued=1)
+        order = []
+
+        with binding_scheduler.admit('ovs'):
+            waiter = self._start(binding_scheduler, order, 'queued')
+            self._wait_queued(binding_scheduler, 1)
+            self.assertRaises(exceptions.BindingAdmissionFailure,
+                              binding_scheduler._acquire, 'ovs',
+                              scheduler.BIND_PRIORITY)
+            self.assertEqual(1, self.sink.get_gauge(metrics.QUEUE_DEPTH,
+                                                    'ovs'))
+        waiter.join()
+
+        self.assertEqual(['queued'], order)
+        self.assertEqual(0, self.sink.get_gauge(metrics.QUEUE_DEPTH, 'ovs'))
+
+    def test_timeout(self):
+        binding_scheduler = scheduler.BindingScheduler(1, timeout=0.05)
+
+        with binding_scheduler.admit('ovs'):
+            self.assertRaises(exceptions.BindingAdmissionFailure,
+                              binding_scheduler._acquire, 'ovs',
+                              scheduler.BIND_PRIORITY)
+
+        self.assertEqual(0, binding_scheduler._queued)
+        self.assertEqual([], binding_scheduler._slots['ovs'].waiters)
+        self.assertEqual(0, binding_scheduler._slots['ovs'].active)
+
+    def test_unbinds_first(self):
+        binding_scheduler = scheduler.BindingScheduler(1)
+        order = []
+
+        with binding_scheduler.admit('ovs'):
+            bind = self._start(binding_scheduler, order, 'bind')
+            self._wait_queued(binding_scheduler, 1)
+            unbind = self._start(binding_scheduler, order, 'unbind',
+                                 priority=scheduler.UNBIND_PRIORITY)
+            self._wait_queued(binding_scheduler, 2)
+        bind.join()
+        unbind.join()
+
+        self.assertEqual(['unbind', 'bind'], order)
+
+    def test_request(self):
+        binding_scheduler = scheduler.BindingScheduler(1)
+
+        admission = binding_scheduler.request('ovs')
+        self.assertTrue(admission.done())
+        queued = binding_scheduler.request('ovs')
+        self.assertFalse(queued.done())
+        self.assertEqual(1, binding_scheduler._queued)
+
+        binding_scheduler.release('ovs')
+        self.assertTrue(queued.done())
+        self.assertEqual(0, binding_scheduler._queued)
+        binding_scheduler.release('ovs')
+        self.assertEqual(0, binding_scheduler._slots['ovs'].active)
+
+    def test_cancel(self):
+        binding_scheduler = scheduler.BindingScheduler(1)
+        admission = binding_scheduler.request('ovs')
+        queued = binding_scheduler.request('ovs')
+
+        binding_scheduler.cancel('ovs', queued)
+        self.assertEqual(0, binding_scheduler._queued)
+        self.assertEqual([], binding_scheduler._slots['ovs'].waiters)
+        # A slot already given is given back.
+        binding_scheduler.cancel('ovs', admission)
+        self.assertEqual(0, binding_scheduler._slots['ovs'].active)
+
+
+class GetSchedulerTest(base.TestCase):
+    """Unit tests for the configuration of the admission control."""
+
+    def setUp(self):
+        super(GetSchedulerTest, self).setUp()
+        patcher = mock.patch('kuryr.lib.binding._SCHEDULER_CACHE', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_disabled(self):
+        self.assertIsNone(binding.get_scheduler())
+        self.assertEqual('done', binding._run_admitted(
+            'ovs', scheduler.BIND_PRIORITY, lambda: 'done'))
+
+    def test_get_scheduler(self):
+        self.config_fixture.config(group='binding',
+                                   max_concurrent_bindings=4,
+                                   vif_type_concurrency={'ovs': '8'},
+                                   binding_queue_size=10,
+                                   binding_queue_timeout=0)
+
+        binding_scheduler = binding.get_scheduler()
+
+        self.assertIs(binding_scheduler, binding.get_scheduler())
+        self.assertEqual(4, binding_scheduler._limit)
+        self.assertEqual({'ovs': 8}, binding_scheduler._limits)
+        self.assertEqual(10, binding_scheduler._max_queued)
+        self.assertIsNone(binding_scheduler._timeout)
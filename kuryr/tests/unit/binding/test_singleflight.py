@@ -0,0 +1,139 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import threading
+
+from kuryr.lib.binding import singleflight
+from kuryr.tests.unit import base
+
+
+class SingleFlightTest(base.TestCase):
+    """Unit tests for the coalescing of the operations on the ports."""
+
+    def setUp(self):
+        super(SingleFlightTest, self).setUp()
+        self.single_flight = singleflight.SingleFlight()
+        self.calls = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def _blocking(self, name):
+        self.calls.append(name)
+        self.started.set()
+        self.release.wait(5)
+        return name
+
+    def _recording(self, name):
+        self.calls.append(name)
+        return name
+
+    def _start(self, results, operation, func, key='port'):
+        thread = threading.Thread(target=lambda: results.append(
+            self.single_flight.do(key, operation, func, operation)))
+        thread.start()
+        return thread
+
+    def test_duplicates_share_the_flight(self):
+        results = []
+        first = self._start(results, 'bind', self._blocking)
+        self.started.wait(5)
+        second = self._start(results, 'bind', self._recording)
+
+        self.release.set()
+        first.join()
+        second.join()
+
+        self.assertEqual(['bind'], self.calls)
+        self.assertEqual(['bind', 'bind'], results)
+        self.assertEqual({}, dict(self.single_flight._flights))
+
+    def test_operations_are_serialized(self):
+        results = []
+        first = self._start(results, 'bind', self._blocking)
+        self.started.wait(5)
+        second = self._start(results, 'unbind', self._recording)
+        second.join(0.1)
+        self.assertEqual(['bind'], self.calls)
+
+        self.release.set()
+        first.join()
+        second.join()
+
+        self.assertEqual(['bind', 'unbind'], self.calls)
+
+    def test_other_keys_are_not_serialized(self):
+        results = []
+        first = self._start(results, 'bind', self._blocking)
+        self.started.wait(5)
+
+        self.assertEqual(
+            'bind', self.single_flight.do('other', 'bind', self._recording,
+                                          'bind'))
+        self.release.set()
+        first.join()
+        self.assertEqual(['bind', 'bind'], self.calls)
+
+    def test_exception_is_shared(self):
+        errors = []
+
+        def _fail():
+            self.started.set()
+            self.release.wait(5)
+            raise ValueError('fake')
+
+        def _run(func):
+            try:
+                self.single_flight.do('port', 'bind', func)
+            except ValueError as e:
+                errors.append(e)
+
+        first = threading.Thread(target=_run, args=(_fail,))
+        first.start()
+        self.started.wait(5)
+        second = threading.Thread(target=_run, args=(self._recording,))
+        second.start()
+
+        self.release.set()
+        first.join()
+        second.join()
+
+        self.assertEqual(2, len(errors))
+        self.assertIs(errors[0], errors[1])
+        self.assertEqual([], self.calls)
+
+    def test_keys(self):
+        results = []
+        first = self._start(results, 'bind', self._blocking)
+        self.started.wait(5)
+
+        self.assertEqual({'port'}, self.single_flight.keys())
+        self.release.set()
+        first.join()
+        self.assertEqual(set(), self.single_flight.keys())
+
+    def test_enter(self):
+        flight, previous = self.single_flight.enter('port', 'bind')
+        self.assertIsNone(previous)
+        shared_flight, shared = self.single_flight.enter('port', 'bind')
+        self.assertIsNone(shared_flight)
+        self.assertIs(flight[1], shared)
+        next_flight, next_previous = self.single_flight.enter('port',
+                                                              'unbind')
+        self.assertIs(flight[1], next_previous)
+
+        self.single_flight.leave('port', flight, 'bind')
+        self.assertEqual('bind', shared.result())
+        self.assertEqual(
+            'unbind', self.single_flight.run('port', next_flight,
+                                             next_previous, self._recording,
+                                             'unbind'))
+        self.assertEqual(set(), self.single_flight.keys())
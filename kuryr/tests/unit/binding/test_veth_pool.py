@@ -0,0 +1,99 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import errno
+
+import mock
+import pyroute2
+
+from kuryr.lib.binding import veth_pool
+from kuryr.tests.unit.binding import test_link_index
+from kuryr.tests.unit import base
+
+
+class VethPoolTest(base.TestCase):
+    """Unit tests for the warm pool of veth pairs."""
+
+    def setUp(self):
+        super(VethPoolTest, self).setUp()
+        self.ipr = mock.Mock()
+        self.caller_ipr = mock.Mock()
+        self.pool = veth_pool.VethPool(self.ipr, 2, 1)
+
+    @mock.patch.object(veth_pool.VethPool, '_schedule_refill')
+    def test_start_adopts_leftover_pairs(self, mock_schedule_refill):
+        self.ipr.get_links.return_value = [
+            test_link_index.FakeLinkMessage('RTM_NEWLINK', 1, 'lo'),
+            test_link_index.FakeLinkMessage('RTM_NEWLINK', 5, 'kvpabc'),
+            test_link_index.FakeLinkMessage('RTM_NEWLINK', 6, 'kvcabc'),
+            test_link_index.FakeLinkMessage('RTM_NEWLINK', 7, 'kvpdef')]
+
+        self.pool.start()
+
+        self.assertEqual(1, len(self.pool))
+        mock_schedule_refill.assert_called_once()
+
+    @mock.patch('threading.Thread')
+    @mock.patch('kuryr.lib.binding.iproute.lookup_link',
+                side_effect=[10, 11, 12, 13])
+    def test_refill(self, mock_lookup_link, mock_thread):
+        self.pool._refilling = True
+
+        self.pool._refill()
+
+        self.assertEqual(2, len(self.pool))
+        self.assertEqual(2, self.ipr.link.call_count)
+        self.assertFalse(self.pool._refilling)
+        self.assertEqual((10, 11), self.pool.acquire(self.caller_ipr,
+                                                     'tapfake', 't_cfake'))
+
+    def test_refill_failure(self):
+        self.pool._refilling = True
+        self.ipr.link.side_effect = pyroute2.NetlinkError(errno.EPERM)
+
+        self.pool._refill()
+
+        self.assertEqual(0, len(self.pool))
+        self.assertFalse(self.pool._refilling)
+
+    @mock.patch('threading.Thread')
+    def test_acquire(self, mock_thread):
+        self.pool._pairs.extend([(5, 6), (7, 8)])
+
+        self.assertEqual((5, 6), self.pool.acquire(self.caller_ipr,
+                                                   'tapfake', 't_cfake'))
+
+        # The socket of the pool is left to its refill thread.
+        self.caller_ipr.link.assert_has_calls([
+            mock.call('set', index=5, ifname='tapfake'),
+            mock.call('set', index=6, ifname='t_cfake')])
+        self.ipr.link.assert_not_called()
+        # One pair is left which is the low watermark.
+        mock_thread.return_value.start.assert_called_once()
+
+    @mock.patch('threading.Thread')
+    def test_acquire_empty(self, mock_thread):
+        self.assertIsNone(self.pool.acquire(self.caller_ipr, 'tapfake',
+                                            't_cfake'))
+        self.caller_ipr.link.assert_not_called()
+        mock_thread.return_value.start.assert_called_once()
+
+    @mock.patch('threading.Thread')
+    def test_acquire_stale_pair(self, mock_thread):
+        self.pool._pairs.extend([(5, 6), (7, 8)])
+        self.caller_ipr.link.side_effect = [
+            pyroute2.NetlinkError(errno.ENODEV), None, None, None]
+
+        self.assertEqual((7, 8), self.pool.acquire(self.caller_ipr,
+                                                   'tapfake', 't_cfake'))
+
+        self.caller_ipr.link.assert_any_call('del', index=5)
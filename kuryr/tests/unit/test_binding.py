@@ -11,23 +11,44 @@
 #    under the License.
 
 import ddt
+import errno
+import fixtures
 import mock
+import os
+import threading
 import uuid
 
+from oslo_concurrency import processutils
+from oslo_config import cfg
+import pyroute2
+
 from kuryr.lib import binding
+from kuryr.lib.binding import datapath
+from kuryr.lib.binding import plan
+from kuryr.lib.binding import scheduler
+from kuryr.lib import config
 from kuryr.lib import constants
+from kuryr.lib import exceptions
 from kuryr.lib import utils
 from kuryr.tests.unit import base
 from mock import call
 
 mock_create = mock.MagicMock()
 mock_interface = mock.MagicMock()
+FAKE_BINDIR = os.path.join(os.path.dirname(__file__), os.pardir, os.pardir,
+                           os.pardir, 'usr', 'libexec', 'kuryr')
 
 
 @ddt.ddt
 class BindingTest(base.TestCase):
     """Unit tests for binding."""
 
+    def setUp(self):
+        super(BindingTest, self).setUp()
+        self.config_fixture.config(bindir=FAKE_BINDIR)
+        binding._DRIVER_REGISTRY = None
+        self.addCleanup(setattr, binding, '_DRIVER_REGISTRY', None)
+
     @ddt.data((False), (True))
     def test_is_up(self, interface_flag):
         fake_interface = {'flags': 0x0}
@@ -37,7 +58,6 @@ class BindingTest(base.TestCase):
         else:
             self.assertEqual(False, binding._is_up(fake_interface))
 
-    @mock.patch('os.path.exists', return_value=True)
     @mock.patch('oslo_concurrency.processutils.execute',
                 return_value=('fake_stdout', 'fake_stderr'))
     @mock.patch('pyroute2.ipdb.interface.InterfacesDict.__getattribute__',
@@ -45,7 +65,7 @@ class BindingTest(base.TestCase):
     @mock.patch('pyroute2.ipdb.interface.InterfacesDict.__getitem__',
                 return_value=mock_interface)
     def test_port_bind(self, mock_getattribute, mock_getitem,
-                       mock_execute, mock_path_exists):
+                       mock_execute):
         fake_mtu = 1450
         fake_docker_network_id = utils.get_hash()
         fake_docker_endpoint_id = utils.get_hash()
@@ -68,7 +88,6 @@ class BindingTest(base.TestCase):
         expect_calls = [call.__enter__().set_mtu(fake_mtu),
                         call.__enter__().up()]
         mock_interface.assert_has_calls(expect_calls, any_order=True)
-        mock_path_exists.assert_called_once()
         mock_execute.assert_called_once()
 
     @mock.patch('kuryr.lib.binding.cleanup_veth')
@@ -87,3 +106,1086 @@ class BindingTest(base.TestCase):
         binding.port_unbind(fake_docker_endpoint_id, fake_port['port'])
         mock_execute.assert_called_once()
         mock_cleanup_veth.assert_called_once()
+
+    def _get_fake_endpoint(self, vif_type=None):
+        fake_docker_network_id = utils.get_hash()
+        fake_docker_endpoint_id = utils.get_hash()
+        fake_neutron_v4_subnet_id = str(uuid.uuid4())
+        fake_neutron_v6_subnet_id = str(uuid.uuid4())
+        fake_port = self._get_fake_port(
+            fake_docker_endpoint_id, fake_docker_network_id,
+            str(uuid.uuid4()), constants.PORT_STATUS_ACTIVE,
+            fake_neutron_v4_subnet_id, fake_neutron_v6_subnet_id)['port']
+        fake_port['binding:vif_type'] = vif_type
+        fake_port['binding:vif_details'] = {}
+        fake_subnets = self._get_fake_subnets(
+            fake_docker_endpoint_id, fake_docker_network_id,
+            fake_neutron_v4_subnet_id, fake_neutron_v6_subnet_id)
+        return (fake_docker_endpoint_id, fake_port, fake_subnets['subnets'])
+
+    @mock.patch('kuryr.lib.binding.cleanup_veth')
+    @mock.patch('oslo_concurrency.processutils.execute')
+    @mock.patch('kuryr.lib.binding._configure_veth')
+    def test_port_bind_many(self, mock_configure_veth,
+                            mock_execute, mock_cleanup_veth):
+        fake_endpoints = [self._get_fake_endpoint('ovs'),
+                          self._get_fake_endpoint('bridge'),
+                          self._get_fake_endpoint('ovs')]
+        fake_names = [utils.get_veth_pair_names(endpoint[1]['id'])
+                      for endpoint in fake_endpoints]
+        mock_configure_veth.side_effect = (
+            lambda binding_plan, *args, **kwargs: utils.get_veth_pair_names(
+                binding_plan.port_id))
+        fake_error = processutils.ProcessExecutionError()
+        mock_execute.side_effect = [('fake_stdout', 'fake_stderr'),
+                                    fake_error,
+                                    ('fake_stdout', 'fake_stderr')]
+
+        results = binding.port_bind_many(fake_endpoints)
+
+        self.assertEqual(3, len(results))
+        self.assertEqual(fake_names[0] + (('fake_stdout', 'fake_stderr'),),
+                         results[0])
+        self.assertEqual(fake_names[1] + (('fake_stdout', 'fake_stderr'),),
+                         results[1])
+        self.assertIs(fake_error, results[2])
+        # The scripts are invoked grouped by vif_type.
+        exec_paths = [c[0][0] for c in mock_execute.call_args_list]
+        self.assertEqual(['ovs', 'ovs', 'bridge'],
+                         [os.path.basename(p) for p in exec_paths])
+        mock_cleanup_veth.assert_called_once_with(fake_names[2][0], 'ovs')
+
+    @mock.patch('kuryr.lib.binding.cleanup_veth')
+    @mock.patch('oslo_concurrency.processutils.execute',
+                return_value=('fake_stdout', 'fake_stderr'))
+    @mock.patch('kuryr.lib.binding._configure_veth')
+    def test_port_bind_many_veth_failure(self, mock_configure_veth,
+                                         mock_execute, mock_cleanup_veth):
+        fake_endpoints = [self._get_fake_endpoint('ovs'),
+                          self._get_fake_endpoint('ovs')]
+        fake_error = exceptions.VethCreationFailure()
+        mock_configure_veth.side_effect = [
+            fake_error, utils.get_veth_pair_names(fake_endpoints[1][1]['id'])]
+
+        results = binding.port_bind_many(fake_endpoints)
+
+        self.assertIs(fake_error, results[0])
+        self.assertIsInstance(results[1], tuple)
+        mock_execute.assert_called_once()
+        mock_cleanup_veth.assert_not_called()
+
+    @mock.patch('kuryr.lib.binding._journal_unbind')
+    @mock.patch('kuryr.lib.binding.cleanup_veth')
+    @mock.patch('oslo_concurrency.processutils.execute',
+                return_value=('fake_stdout', 'fake_stderr'))
+    @mock.patch('kuryr.lib.binding._configure_veth')
+    def test_port_bind_many_unexpected_failure(self, mock_configure_veth,
+                                               mock_execute,
+                                               mock_cleanup_veth,
+                                               mock_journal_unbind):
+        fake_endpoints = [self._get_fake_endpoint('ovs'),
+                          self._get_fake_endpoint('ovs'),
+                          self._get_fake_endpoint('ovs')]
+        del fake_endpoints[0][1]['mac_address']
+        fake_names = utils.get_veth_pair_names(fake_endpoints[2][1]['id'])
+        fake_error = pyroute2.NetlinkError(errno.EBUSY)
+        mock_configure_veth.side_effect = [fake_error, fake_names]
+
+        results = binding.port_bind_many(fake_endpoints)
+
+        # The failures are reported per port and do not abort the batch.
+        self.assertIsInstance(results[0], KeyError)
+        self.assertIs(fake_error, results[1])
+        self.assertEqual(fake_names + (('fake_stdout', 'fake_stderr'),),
+                         results[2])
+        mock_cleanup_veth.assert_called_once_with(
+            utils.get_veth_pair_names(fake_endpoints[1][1]['id'])[0], 'ovs')
+        mock_journal_unbind.assert_called_once_with(
+            fake_endpoints[1][1]['id'])
+        mock_execute.assert_called_once()
+
+    @mock.patch('kuryr.lib.binding.iproute.configure_veth')
+    @mock.patch('kuryr.lib.binding.iproute.create_veths')
+    @mock.patch('kuryr.lib.binding.iproute.lookup_link', return_value=None)
+    @mock.patch('kuryr.lib.binding.get_iproute')
+    @mock.patch('oslo_concurrency.processutils.execute',
+                return_value=('fake_stdout', 'fake_stderr'))
+    def test_port_bind_many_iproute(self, mock_execute, mock_get_iproute,
+                                    mock_lookup_link, mock_create_veths,
+                                    mock_configure_veth):
+        self.config_fixture.config(group='binding', netlink_backend='iproute',
+                                   veth_pool_size=0)
+        fake_endpoints = [self._get_fake_endpoint('ovs'),
+                          self._get_fake_endpoint('ovs')]
+        fake_names = [utils.get_veth_pair_names(endpoint[1]['id'])
+                      for endpoint in fake_endpoints]
+        mock_create_veths.return_value = {fake_names[0][0]: (1, 2)}
+
+        results = binding.port_bind_many(fake_endpoints)
+
+        self.assertEqual([names + (('fake_stdout', 'fake_stderr'),)
+                          for names in fake_names], results)
+        # The veth pairs are all requested over a single netlink pass.
+        mock_create_veths.assert_called_once_with(
+            mock_get_iproute.return_value, fake_names, None)
+        self.assertEqual(
+            [(1, 2), None],
+            [c[1]['indexes'] for c in mock_configure_veth.call_args_list])
+
+    @mock.patch('kuryr.lib.binding.cleanup_veth')
+    @mock.patch('oslo_concurrency.processutils.execute',
+                return_value=('fake_stdout', 'fake_stderr'))
+    @mock.patch('kuryr.lib.binding._configure_veth')
+    @mock.patch('kuryr.lib.binding.get_scheduler')
+    def test_port_bind_many_admitted(self, mock_get_scheduler,
+                                     mock_configure_veth, mock_execute,
+                                     mock_cleanup_veth):
+        fake_endpoints = [self._get_fake_endpoint('ovs'),
+                          self._get_fake_endpoint('ovs')]
+        mock_configure_veth.side_effect = (
+            lambda binding_plan, *args, **kwargs: utils.get_veth_pair_names(
+                binding_plan.port_id))
+        mock_admit = mock_get_scheduler.return_value.admit
+        fake_error = exceptions.BindingAdmissionFailure()
+        # The driver of the second port is not admitted.
+        mock_admit.return_value.__enter__.side_effect = [None, None,
+                                                         fake_error]
+
+        results = binding.port_bind_many(fake_endpoints)
+
+        self.assertIsInstance(results[0], tuple)
+        self.assertIs(fake_error, results[1])
+        # The veth pairs are created in a single admitted operation.
+        self.assertEqual([mock.call('ovs', scheduler.BIND_PRIORITY)] * 3,
+                         mock_admit.call_args_list)
+        mock_execute.assert_called_once()
+        mock_cleanup_veth.assert_called_once_with(
+            utils.get_veth_pair_names(fake_endpoints[1][1]['id'])[0], 'ovs')
+
+    @mock.patch('oslo_concurrency.processutils.execute',
+                return_value=('fake_stdout', 'fake_stderr'))
+    @mock.patch('kuryr.lib.binding._configure_veth')
+    def test_port_bind_many_duplicate(self, mock_configure_veth,
+                                      mock_execute):
+        fake_endpoint = self._get_fake_endpoint('ovs')
+        fake_names = utils.get_veth_pair_names(fake_endpoint[1]['id'])
+        mock_configure_veth.return_value = fake_names
+
+        results = binding.port_bind_many([fake_endpoint, fake_endpoint])
+
+        # The second bind of the port shares the outcome of the first one.
+        self.assertEqual([fake_names + (('fake_stdout', 'fake_stderr'),)] * 2,
+                         results)
+        mock_configure_veth.assert_called_once()
+        mock_execute.assert_called_once()
+        self.assertEqual(set(), binding._SINGLE_FLIGHT.keys())
+
+    @mock.patch('oslo_concurrency.processutils.execute',
+                return_value=('fake_stdout', 'fake_stderr'))
+    @mock.patch('kuryr.lib.binding._configure_veth')
+    def test_port_bind_many_in_flight(self, mock_configure_veth,
+                                      mock_execute):
+        fake_endpoints = [self._get_fake_endpoint('ovs'),
+                          self._get_fake_endpoint('ovs')]
+        fake_names = utils.get_veth_pair_names(fake_endpoints[1][1]['id'])
+        mock_configure_veth.return_value = fake_names
+        # The first port is being unbound by another thread.
+        fake_port_id = fake_endpoints[0][1]['id']
+        flight, future = binding._SINGLE_FLIGHT.enter(fake_port_id,
+                                                      'unbind')
+        timer = threading.Timer(0.1, binding._SINGLE_FLIGHT.leave,
+                                (fake_port_id, flight, None))
+        timer.start()
+        self.addCleanup(timer.join)
+
+        results = binding.port_bind_many(fake_endpoints)
+
+        # The second port is bound by the batch, the first one once it is
+        # unbound.
+        self.assertEqual([fake_names + (('fake_stdout', 'fake_stderr'),)] * 2,
+                         results)
+        self.assertEqual(2, mock_configure_veth.call_count)
+        self.assertIs(fake_endpoints[1][1]['id'],
+                      mock_configure_veth.call_args_list[0][0][0].port_id)
+        self.assertEqual(set(), binding._SINGLE_FLIGHT.keys())
+
+    @mock.patch('oslo_concurrency.processutils.execute')
+    @mock.patch('kuryr.lib.binding.iproute.configure_sub_interface')
+    @mock.patch('kuryr.lib.binding.get_iproute')
+    def test_port_bind_sub_interface(self, mock_get_iproute,
+                                     mock_configure_sub_interface,
+                                     mock_execute):
+        self.config_fixture.config(group='binding', link_kind='macvlan',
+                                   uplink_interface='eth1')
+        fake_endpoint_id, fake_port, fake_subnets = self._get_fake_endpoint(
+            'ovs')
+        fake_ifname = utils.get_veth_pair_names(fake_port['id'])[0]
+
+        ifname, peer_name, (stdout, stderr) = binding.port_bind(
+            fake_endpoint_id, fake_port, fake_subnets)
+
+        self.assertEqual((fake_ifname, fake_ifname), (ifname, peer_name))
+        mock_configure_sub_interface.assert_called_once_with(
+            mock_get_iproute.return_value, 'eth1', fake_ifname, 'macvlan',
+            'bridge', (('192.168.1.2', 24), ('fe80::f816:3eff:fe20:57c4', 64)),
+            binding.DEFAULT_NETWORK_MTU, fake_port['mac_address'],
+            ('192.168.1.1', 'fe80::f816:3eff:fe20:57c3'), netns_handle=None,
+            link_index=None, vif_type='ovs', link_attributes=None)
+        # There is no host side to plug into OVS.
+        mock_execute.assert_not_called()
+
+    def test_port_bind_sub_interface_without_uplink(self):
+        self.config_fixture.config(group='binding', link_kind='ipvlan')
+        fake_endpoint_id, fake_port, fake_subnets = self._get_fake_endpoint(
+            'ovs')
+
+        self.assertRaises(exceptions.VethCreationFailure, binding.port_bind,
+                          fake_endpoint_id, fake_port, fake_subnets)
+
+    @mock.patch('kuryr.lib.binding.cleanup_veth')
+    @mock.patch('oslo_concurrency.processutils.execute')
+    def test_port_unbind_sub_interface(self, mock_execute,
+                                       mock_cleanup_veth):
+        self.config_fixture.config(group='binding', link_kind='ipvlan',
+                                   uplink_interface='eth1')
+        fake_endpoint_id, fake_port, fake_subnets = self._get_fake_endpoint(
+            'ovs')
+
+        binding.port_unbind(fake_endpoint_id, fake_port)
+
+        mock_execute.assert_not_called()
+        mock_cleanup_veth.assert_called_once_with(
+            utils.get_veth_pair_names(fake_port['id'])[0], 'ovs')
+
+    @mock.patch('kuryr.lib.binding._JOURNAL_CACHE', None)
+    @mock.patch('kuryr.lib.binding.get_netns_cache')
+    @mock.patch('kuryr.lib.binding.cleanup_veth')
+    @mock.patch('oslo_concurrency.processutils.execute')
+    def test_port_unbind_sub_interface_in_netns(self, mock_execute,
+                                                mock_cleanup_veth,
+                                                mock_get_netns_cache):
+        self.config_fixture.config(
+            group='binding', link_kind='ipvlan', uplink_interface='eth1',
+            journal_path=os.path.join(
+                self.useFixture(fixtures.TempDir()).path, 'binding.db'))
+        self.addCleanup(binding.get_journal().close)
+        fake_endpoint_id, fake_port, fake_subnets = self._get_fake_endpoint(
+            'ovs')
+        binding.get_journal().record_bind(
+            fake_port['id'], fake_endpoint_id,
+            utils.get_veth_pair_names(fake_port['id'])[0], 'eth1', 'ovs',
+            '/var/run/netns/fake')
+        mock_cache = mock_get_netns_cache.return_value
+        netns_ipr = mock_cache.checkout.return_value.iproute
+        netns_ipr.link_lookup.return_value = [3]
+
+        binding.port_unbind(fake_endpoint_id, fake_port)
+
+        mock_cache.checkout.assert_called_once_with('/var/run/netns/fake')
+        netns_ipr.link_lookup.assert_called_once_with(ifname='eth1')
+        netns_ipr.link.assert_called_once_with('del', index=3)
+        mock_cache.checkin.assert_called_once_with(
+            mock_cache.checkout.return_value)
+        mock_cleanup_veth.assert_not_called()
+        self.assertIsNone(binding.get_journal().get(fake_port['id']))
+
+    @mock.patch('kuryr.lib.binding._JOURNAL_CACHE', None)
+    @mock.patch('kuryr.lib.binding.cleanup_netns_link')
+    @mock.patch('kuryr.lib.binding.cleanup_veth')
+    @mock.patch('oslo_concurrency.processutils.execute')
+    def test_port_unbind_journaled_link_kind(self, mock_execute,
+                                             mock_cleanup_veth,
+                                             mock_cleanup_netns_link):
+        # The port was given a sub-interface by the tags of its network.
+        self.config_fixture.config(
+            group='binding', journal_path=os.path.join(
+                self.useFixture(fixtures.TempDir()).path, 'binding.db'))
+        self.addCleanup(binding.get_journal().close)
+        fake_endpoint_id, fake_port, fake_subnets = self._get_fake_endpoint(
+            'ovs')
+        binding.get_journal().record_bind(
+            fake_port['id'], fake_endpoint_id,
+            utils.get_veth_pair_names(fake_port['id'])[0], 'eth0', 'ovs',
+            '/var/run/netns/fake', link_kind='macvlan')
+
+        binding.port_unbind(fake_endpoint_id, fake_port)
+
+        mock_execute.assert_not_called()
+        mock_cleanup_netns_link.assert_called_once_with(
+            '/var/run/netns/fake', 'eth0', 'ovs')
+        mock_cleanup_veth.assert_not_called()
+
+    @mock.patch('kuryr.lib.binding._JOURNAL_CACHE', None)
+    @mock.patch('kuryr.lib.binding.cleanup_netns_link')
+    @mock.patch('kuryr.lib.binding.cleanup_veth')
+    @mock.patch('oslo_concurrency.processutils.execute')
+    def test_port_unbind_many_sub_interface_in_netns(
+            self, mock_execute, mock_cleanup_veth, mock_cleanup_netns_link):
+        self.config_fixture.config(
+            group='binding', link_kind='macvlan', uplink_interface='eth1',
+            journal_path=os.path.join(
+                self.useFixture(fixtures.TempDir()).path, 'binding.db'))
+        self.addCleanup(binding.get_journal().close)
+        fake_endpoints = [self._get_fake_endpoint('ovs')[:2]
+                          for _ in range(2)]
+        fake_ifnames = [utils.get_veth_pair_names(endpoint[1]['id'])[0]
+                        for endpoint in fake_endpoints]
+        binding.get_journal().record_bind(
+            fake_endpoints[0][1]['id'], fake_endpoints[0][0],
+            fake_ifnames[0], 'eth0', 'ovs', '/var/run/netns/fake')
+
+        results = binding.port_unbind_many(fake_endpoints)
+
+        for result in results:
+            self.assertNotIsInstance(result, Exception)
+        mock_execute.assert_not_called()
+        mock_cleanup_netns_link.assert_called_once_with(
+            '/var/run/netns/fake', 'eth0', 'ovs')
+        mock_cleanup_veth.assert_called_once_with(fake_ifnames[1], 'ovs')
+        self.assertEqual(set(), binding.get_journal().get_port_ids())
+
+    @mock.patch('kuryr.lib.binding._journal_unbind')
+    @mock.patch('kuryr.lib.binding.cleanup_veth')
+    @mock.patch('oslo_concurrency.processutils.execute')
+    def test_port_unbind_many(self, mock_execute, mock_cleanup_veth,
+                              mock_journal_unbind):
+        fake_endpoints = [self._get_fake_endpoint('ovs')[:2],
+                          self._get_fake_endpoint('ovs')[:2],
+                          self._get_fake_endpoint('bridge')[:2],
+                          self._get_fake_endpoint('unknown')[:2]]
+        fake_ifnames = [utils.get_veth_pair_names(endpoint[1]['id'])[0]
+                        for endpoint in fake_endpoints]
+        fake_error = processutils.ProcessExecutionError()
+
+        def fake_execute(exec_path, subcommand, port_id, *args, **kwargs):
+            if port_id == fake_endpoints[1][1]['id']:
+                raise fake_error
+            return 'fake_stdout', 'fake_stderr'
+
+        def fake_cleanup_veth(ifname, vif_type):
+            if ifname == fake_ifnames[2]:
+                raise pyroute2.NetlinkError(errno.EBUSY)
+            return 7
+
+        mock_execute.side_effect = fake_execute
+        mock_cleanup_veth.side_effect = fake_cleanup_veth
+
+        results = binding.port_unbind_many(fake_endpoints)
+
+        self.assertEqual(('fake_stdout', 'fake_stderr'), results[0])
+        self.assertIs(fake_error, results[1])
+        self.assertIsInstance(results[2], exceptions.VethDeletionFailure)
+        self.assertIsInstance(results[3],
+                              exceptions.BindingNotSupportedFailure)
+        self.assertEqual(3, mock_execute.call_count)
+        self.assertEqual(sorted([fake_ifnames[0], fake_ifnames[2]]),
+                         sorted(c[0][0] for c in
+                                mock_cleanup_veth.call_args_list))
+        mock_journal_unbind.assert_called_once_with(
+            fake_endpoints[0][1]['id'])
+
+    @mock.patch('kuryr.lib.binding._port_unbind')
+    def test_port_unbind_many_unexpected_failure(self, mock_port_unbind):
+        fake_endpoints = [self._get_fake_endpoint('ovs')[:2],
+                          self._get_fake_endpoint('ovs')[:2]]
+        fake_error = KeyError('network_id')
+
+        def fake_port_unbind(endpoint_id, neutron_port, binding_plan):
+            if neutron_port is fake_endpoints[0][1]:
+                raise fake_error
+            return 'fake_stdout', 'fake_stderr'
+
+        mock_port_unbind.side_effect = fake_port_unbind
+
+        results = binding.port_unbind_many(fake_endpoints)
+
+        self.assertEqual([fake_error, ('fake_stdout', 'fake_stderr')],
+                         results)
+
+    @mock.patch('kuryr.lib.binding.cleanup_veth')
+    @mock.patch('oslo_concurrency.processutils.execute')
+    def test_port_unbind_many_timeout(self, mock_execute,
+                                      mock_cleanup_veth):
+        fake_endpoints = [self._get_fake_endpoint('ovs')[:2],
+                          self._get_fake_endpoint('ovs')[:2]]
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        def fake_execute(exec_path, subcommand, port_id, *args, **kwargs):
+            if port_id == fake_endpoints[1][1]['id']:
+                release.wait(5)
+            return 'fake_stdout', 'fake_stderr'
+
+        mock_execute.side_effect = fake_execute
+        fake_ifname = utils.get_veth_pair_names(fake_endpoints[0][1]['id'])[0]
+
+        results = binding.port_unbind_many(fake_endpoints, timeout=0.2)
+
+        self.assertEqual(('fake_stdout', 'fake_stderr'), results[0])
+        self.assertIsInstance(results[1], exceptions.BindingTimeoutFailure)
+        mock_cleanup_veth.assert_called_once_with(fake_ifname, 'ovs')
+
+    @mock.patch('kuryr.lib.binding.cleanup_veth')
+    @mock.patch('kuryr.lib.binding._configure_veth')
+    @mock.patch('oslo_concurrency.processutils.execute')
+    def test_port_unbind_many_concurrent_bind(self, mock_execute,
+                                             mock_configure_veth,
+                                             mock_cleanup_veth):
+        fake_endpoint_id, fake_port, fake_subnets = self._get_fake_endpoint(
+            'ovs')
+        fake_names = utils.get_veth_pair_names(fake_port['id'])
+        mock_configure_veth.return_value = fake_names
+        binding_started = threading.Event()
+        release = threading.Event()
+        self.addCleanup(release.set)
+        operations = []
+
+        def fake_execute(exec_path, subcommand, *args, **kwargs):
+            operations.append(subcommand + ' started')
+            if subcommand == binding.BINDING_SUBCOMMAND:
+                binding_started.set()
+                release.wait(5)
+            operations.append(subcommand + ' done')
+            return 'fake_stdout', 'fake_stderr'
+
+        def fake_cleanup_veth(ifname, vif_type):
+            operations.append('cleanup')
+
+        mock_execute.side_effect = fake_execute
+        mock_cleanup_veth.side_effect = fake_cleanup_veth
+        bind = threading.Thread(target=binding.port_bind, args=(
+            fake_endpoint_id, fake_port, fake_subnets))
+        bind.start()
+        self.assertTrue(binding_started.wait(5))
+        unbind = threading.Thread(target=binding.port_unbind_many, args=(
+            [(fake_endpoint_id, fake_port)],))
+        unbind.start()
+        # The bulk unbind waits for the bind of the same port to finish.
+        unbind.join(0.2)
+        self.assertTrue(unbind.is_alive())
+        release.set()
+        bind.join(5)
+        unbind.join(5)
+
+        self.assertEqual(['bind started', 'bind done', 'unbind started',
+                          'unbind done', 'cleanup'], operations)
+
+    @mock.patch('kuryr.lib.binding.get_ipdb')
+    @mock.patch('kuryr.lib.binding.iproute.configure_veth')
+    @mock.patch('kuryr.lib.binding.get_iproute')
+    def test_configure_veth_iproute_backend(self, mock_get_iproute,
+                                            mock_configure_veth,
+                                            mock_get_ipdb):
+        self.config_fixture.config(group='binding',
+                                   netlink_backend='iproute')
+        fake_endpoint_id, fake_port, fake_subnets = self._get_fake_endpoint()
+
+        names = binding._configure_veth(
+            plan.BindingPlan(fake_port, fake_subnets))
+
+        self.assertEqual(utils.get_veth_pair_names(fake_port['id']), names)
+        mock_configure_veth.assert_called_once_with(
+            mock_get_iproute.return_value, names[0], names[1],
+            (('192.168.1.2', 24), ('fe80::f816:3eff:fe20:57c4', 64)),
+            binding.DEFAULT_NETWORK_MTU, fake_port['mac_address'],
+            link_index=None, indexes=None, vif_type=None,
+            link_attributes=None)
+        mock_get_ipdb.assert_not_called()
+
+    @mock.patch('kuryr.lib.binding.datapath._PROFILES', None)
+    @mock.patch('kuryr.lib.binding._execute')
+    @mock.patch('kuryr.lib.binding.get_veth_pool')
+    @mock.patch('kuryr.lib.binding.iproute.configure_veth')
+    @mock.patch('kuryr.lib.binding.get_iproute')
+    def test_configure_veth_datapath_profile(self, mock_get_iproute,
+                                             mock_configure_veth,
+                                             mock_get_veth_pool,
+                                             mock_execute):
+        self.config_fixture.config(group='binding',
+                                   netlink_backend='iproute',
+                                   datapath_profile='fast')
+        config.register_datapath_profile_opts(cfg.CONF, 'fast')
+        self.config_fixture.config(group='datapath_profile:fast',
+                                   txqueuelen=10000, gro=True,
+                                   num_rx_queues=2)
+        fake_ipr = mock_get_iproute.return_value
+        fake_ipr.link_lookup.side_effect = [[5], [6]]
+        fake_endpoint_id, fake_port, fake_subnets = self._get_fake_endpoint()
+
+        ifname, peer_name = binding._configure_veth(
+            plan.BindingPlan(fake_port, fake_subnets))
+
+        self.assertEqual({'num_rx_queues': 2},
+                         mock_configure_veth.call_args[1]['link_attributes'])
+        # The pooled veth pairs cannot be given queues.
+        mock_get_veth_pool.assert_not_called()
+        fake_ipr.link.assert_has_calls([
+            call('set', index=5, txqlen=10000),
+            call('set', index=6, txqlen=10000)])
+        mock_execute.assert_has_calls([
+            call('ethtool', '--offload', ifname, 'gro', 'on'),
+            call('ethtool', '--offload', peer_name, 'gro', 'on')])
+
+    @mock.patch('kuryr.lib.binding.datapath._PROFILES', None)
+    @mock.patch('kuryr.lib.binding._configure_veth_ipdb')
+    @mock.patch('kuryr.lib.binding.get_ipdb')
+    def test_configure_veth_datapath_profile_queues_ipdb(
+            self, mock_get_ipdb, mock_configure_veth_ipdb):
+        self.config_fixture.config(group='binding',
+                                   netlink_backend='ipdb',
+                                   datapath_profile='fast')
+        config.register_datapath_profile_opts(cfg.CONF, 'fast')
+        self.config_fixture.config(group='datapath_profile:fast',
+                                   num_tx_queues=4)
+        fake_endpoint_id, fake_port, fake_subnets = self._get_fake_endpoint()
+
+        self.assertRaises(exceptions.VethCreationFailure,
+                          binding._configure_veth,
+                          plan.BindingPlan(fake_port, fake_subnets))
+        mock_configure_veth_ipdb.assert_not_called()
+
+    @mock.patch('kuryr.lib.binding.datapath._PROFILES', None)
+    @mock.patch('kuryr.lib.binding._execute')
+    @mock.patch('kuryr.lib.binding.get_netns_cache')
+    @mock.patch('kuryr.lib.binding.iproute.configure_veth_in_netns')
+    @mock.patch('kuryr.lib.binding.get_iproute')
+    def test_configure_veth_datapath_profile_in_netns(
+            self, mock_get_iproute, mock_configure_veth_in_netns,
+            mock_get_netns_cache, mock_execute):
+        self.config_fixture.config(group='binding',
+                                   datapath_profiles=['fast'])
+        config.register_datapath_profile_opts(cfg.CONF, 'fast')
+        self.config_fixture.config(group='datapath_profile:fast',
+                                   tso=False, qdisc='fq')
+        mock_cache = mock_get_netns_cache.return_value
+        fake_handle = mock_cache.checkout.return_value
+        mock_cache.use.return_value.__enter__.return_value = fake_handle
+        fake_handle.path = '/var/run/netns/fake'
+        fake_handle.iproute.link_lookup.return_value = [3]
+        mock_get_iproute.return_value.link_lookup.return_value = [5]
+        fake_endpoint_id, fake_port, fake_subnets = self._get_fake_endpoint()
+        fake_port['binding:vif_details'] = {
+            plan.DATAPATH_PROFILE_KEY: 'fast'}
+
+        ifname, peer_name = binding._configure_veth(
+            plan.BindingPlan(fake_port, fake_subnets), 'fake')
+
+        self.assertEqual('eth0', peer_name)
+        mock_get_iproute.return_value.tc.assert_called_once_with(
+            'replace', kind='fq', index=5)
+        fake_handle.iproute.tc.assert_called_once_with(
+            'replace', kind='fq', index=3)
+        mock_execute.assert_has_calls([
+            call('ethtool', '--offload', ifname, 'tso', 'off'),
+            call('nsenter', '--net=/var/run/netns/fake', 'ethtool',
+                 '--offload', 'eth0', 'tso', 'off')])
+
+    @mock.patch('kuryr.lib.binding._execute',
+                side_effect=processutils.ProcessExecutionError())
+    @mock.patch('kuryr.lib.binding.get_iproute')
+    def test_apply_datapath_profile_failure(self, mock_get_iproute,
+                                            mock_execute):
+        mock_get_iproute.return_value.link_lookup.return_value = [5]
+        fake_endpoint_id, fake_port, fake_subnets = self._get_fake_endpoint()
+
+        self.assertRaises(exceptions.VethCreationFailure,
+                          binding._apply_datapath_profile,
+                          plan.BindingPlan(fake_port),
+                          datapath.DatapathProfile('fast', gso=False),
+                          'tapfake', 't_cfake')
+
+    @mock.patch('kuryr.lib.binding.get_link_index')
+    @mock.patch('kuryr.lib.binding.get_iproute')
+    def test_cleanup_veth_link_index(self, mock_get_iproute,
+                                     mock_get_link_index):
+        self.config_fixture.config(group='binding', link_index=True)
+        mock_get_link_index.return_value.lookup.return_value = 7
+
+        self.assertEqual(7, binding.cleanup_veth('tapfake'))
+
+        mock_get_link_index.return_value.lookup.assert_called_once_with(
+            'tapfake', 0, None)
+        mock_get_iproute.return_value.link_lookup.assert_not_called()
+        mock_get_iproute.return_value.link.assert_called_once_with(
+            'del', index=7)
+        mock_get_link_index.return_value.forget.assert_called_once_with(7)
+
+    @mock.patch('kuryr.lib.binding.get_link_index')
+    @mock.patch('kuryr.lib.binding.get_iproute')
+    def test_cleanup_veth_stale_link_index(self, mock_get_iproute,
+                                           mock_get_link_index):
+        self.config_fixture.config(group='binding', link_index=True)
+        mock_get_link_index.return_value.lookup.return_value = 7
+        fake_ipr = mock_get_iproute.return_value
+        fake_ipr.link.side_effect = pyroute2.NetlinkError(errno.ENODEV)
+        fake_ipr.link_lookup.return_value = []
+
+        # The interface was already deleted.
+        self.assertIsNone(binding.cleanup_veth('tapfake'))
+
+        fake_ipr.link_lookup.assert_called_once_with(ifname='tapfake')
+        mock_get_link_index.return_value.forget.assert_called_once_with(7)
+
+    @mock.patch('kuryr.lib.binding.get_link_index')
+    @mock.patch('kuryr.lib.binding.get_iproute')
+    def test_cleanup_veth_not_found(self, mock_get_iproute,
+                                    mock_get_link_index):
+        mock_get_iproute.return_value.link_lookup.return_value = []
+
+        self.assertIsNone(binding.cleanup_veth('tapfake'))
+
+        mock_get_link_index.assert_not_called()
+        mock_get_iproute.return_value.link.assert_not_called()
+
+    @mock.patch('kuryr.lib.binding.get_veth_pool')
+    @mock.patch('kuryr.lib.binding.iproute.configure_veth')
+    @mock.patch('kuryr.lib.binding.get_iproute')
+    def test_configure_veth_pool(self, mock_get_iproute, mock_configure_veth,
+                                 mock_get_veth_pool):
+        self.config_fixture.config(group='binding',
+                                   netlink_backend='iproute')
+        mock_get_iproute.return_value.link_lookup.return_value = []
+        mock_get_veth_pool.return_value.acquire.return_value = (5, 6)
+        fake_endpoint_id, fake_port, fake_subnets = self._get_fake_endpoint()
+
+        ifname, peer_name = binding._configure_veth(
+            plan.BindingPlan(fake_port, fake_subnets))
+
+        mock_get_veth_pool.return_value.acquire.assert_called_once_with(
+            mock_get_iproute.return_value, ifname, peer_name)
+        self.assertEqual((5, 6),
+                         mock_configure_veth.call_args[1]['indexes'])
+
+    def test_get_veth_pool_disabled(self):
+        self.assertIsNone(binding.get_veth_pool())
+
+    @mock.patch('kuryr.lib.binding._VETH_POOL_CACHE', None)
+    @mock.patch('kuryr.lib.binding.veth_pool.VethPool')
+    @mock.patch('kuryr.lib.binding.get_iproute')
+    def test_get_veth_pool_once(self, mock_get_iproute, mock_veth_pool):
+        self.config_fixture.config(group='binding', veth_pool_size=4)
+        started = threading.Event()
+        release = threading.Event()
+
+        def _start():
+            started.set()
+            release.wait(5)
+
+        mock_veth_pool.return_value.start.side_effect = _start
+        pools = []
+        threads = [threading.Thread(
+            target=lambda: pools.append(binding.get_veth_pool()))
+            for _ in range(2)]
+        threads[0].start()
+        started.wait(5)
+        threads[1].start()
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        # A single pool adopts the leftover pairs and hands them out.
+        mock_veth_pool.assert_called_once()
+        self.assertEqual([mock_veth_pool.return_value] * 2, pools)
+
+    @mock.patch('kuryr.lib.binding.cleanup_veth',
+                side_effect=pyroute2.NetlinkError(errno.EBUSY))
+    @mock.patch('oslo_concurrency.processutils.execute',
+                return_value=('fake_stdout', 'fake_stderr'))
+    def test_port_unbind_cleanup_failure(self, mock_execute,
+                                         mock_cleanup_veth):
+        fake_endpoint_id, fake_port, fake_subnets = self._get_fake_endpoint(
+            'ovs')
+
+        self.assertRaises(exceptions.VethDeletionFailure,
+                          binding.port_unbind, fake_endpoint_id, fake_port)
+
+    @mock.patch('oslo_concurrency.processutils.execute')
+    @mock.patch('kuryr.lib.privileged.execute_binding',
+                return_value=(0, 'fake_stdout', 'fake_stderr'))
+    def test_execute_privsep(self, mock_execute_binding, mock_execute):
+        self.config_fixture.config(group='binding', use_privsep=True)
+
+        self.assertEqual(('fake_stdout', 'fake_stderr'),
+                         binding._execute('/fake/ovs', 'bind'))
+        mock_execute_binding.assert_called_once_with('/fake/ovs', 'bind')
+        mock_execute.assert_not_called()
+
+    @mock.patch('kuryr.lib.privileged.execute_binding',
+                return_value=(1, 'fake_stdout', 'fake_stderr'))
+    def test_execute_privsep_failure(self, mock_execute_binding):
+        self.config_fixture.config(group='binding', use_privsep=True)
+
+        e = self.assertRaises(processutils.ProcessExecutionError,
+                              binding._execute, '/fake/ovs', 'bind')
+        self.assertEqual(1, e.exit_code)
+        self.assertEqual('fake_stderr', e.stderr)
+
+    @mock.patch('kuryr.lib.privileged.execute_binding')
+    @mock.patch('kuryr.lib.privileged.set_offloads',
+                return_value=(0, '', ''))
+    def test_set_offloads_privsep(self, mock_set_offloads,
+                                  mock_execute_binding):
+        self.config_fixture.config(group='binding', use_privsep=True)
+
+        binding._set_offloads('eth0', ('tso', 'off'), '/var/run/netns/fake')
+
+        mock_set_offloads.assert_called_once_with(
+            'eth0', ('tso', 'off'), '/var/run/netns/fake')
+        mock_execute_binding.assert_not_called()
+
+    @mock.patch('kuryr.lib.binding.cleanup_veth')
+    @mock.patch('oslo_concurrency.processutils.execute')
+    @mock.patch('kuryr.lib.binding._configure_veth')
+    @mock.patch('kuryr.lib.binding.get_driver')
+    def test_port_bind_native_driver(self, mock_get_driver,
+                                     mock_configure_veth, mock_execute,
+                                     mock_cleanup_veth):
+        fake_endpoint_id, fake_port, fake_subnets = self._get_fake_endpoint(
+            'ovs')
+        fake_names = utils.get_veth_pair_names(fake_port['id'])
+        mock_configure_veth.return_value = fake_names
+        mock_driver = mock_get_driver.return_value
+        mock_driver.phase = 'plug'
+        mock_driver.bind_plan.return_value = ('fake_stdout', '')
+
+        result = binding.port_bind(fake_endpoint_id, fake_port, fake_subnets)
+
+        self.assertEqual(fake_names + (('fake_stdout', ''),), result)
+        mock_get_driver.assert_called_once_with('ovs')
+        mock_driver.bind_plan.assert_called_once_with(fake_endpoint_id,
+                                                      mock.ANY)
+        binding_plan = mock_driver.bind_plan.call_args[0][1]
+        self.assertEqual(fake_port['id'], binding_plan.port_id)
+        self.assertEqual(fake_names[0], binding_plan.ifname)
+        mock_execute.assert_not_called()
+        mock_cleanup_veth.assert_not_called()
+
+    @mock.patch('kuryr.lib.binding.cleanup_veth')
+    @mock.patch('kuryr.lib.binding._configure_veth')
+    @mock.patch('kuryr.lib.binding.get_driver')
+    def test_port_bind_native_driver_failure(self, mock_get_driver,
+                                             mock_configure_veth,
+                                             mock_cleanup_veth):
+        fake_endpoint_id, fake_port, fake_subnets = self._get_fake_endpoint(
+            'ovs')
+        fake_names = utils.get_veth_pair_names(fake_port['id'])
+        mock_configure_veth.return_value = fake_names
+        mock_get_driver.return_value.phase = 'plug'
+        mock_get_driver.return_value.bind_plan.side_effect = (
+            exceptions.BindingFailure())
+
+        self.assertRaises(exceptions.BindingFailure, binding.port_bind,
+                          fake_endpoint_id, fake_port, fake_subnets)
+        mock_cleanup_veth.assert_called_once_with(fake_names[0], 'ovs')
+
+    @mock.patch('kuryr.lib.binding.cleanup_veth')
+    @mock.patch('oslo_concurrency.processutils.execute')
+    @mock.patch('kuryr.lib.binding.get_driver')
+    def test_port_unbind_native_driver(self, mock_get_driver,
+                                       mock_execute, mock_cleanup_veth):
+        fake_endpoint_id, fake_port, fake_subnets = self._get_fake_endpoint(
+            'ovs')
+        mock_driver = mock_get_driver.return_value
+        mock_driver.phase = 'plug'
+        mock_driver.unbind_plan.return_value = ('fake_stdout', '')
+
+        self.assertEqual(('fake_stdout', ''),
+                         binding.port_unbind(fake_endpoint_id, fake_port))
+        ifname, _ = utils.get_veth_pair_names(fake_port['id'])
+        binding_plan = mock_driver.unbind_plan.call_args[0][1]
+        self.assertEqual(ifname, binding_plan.ifname)
+        mock_execute.assert_not_called()
+        mock_cleanup_veth.assert_called_once_with(ifname, 'ovs')
+
+    @mock.patch('kuryr.lib.binding._ensure_veth')
+    @mock.patch('kuryr.lib.binding.get_driver')
+    def test_port_ensure_plugged(self, mock_get_driver, mock_ensure_veth):
+        fake_endpoint_id, fake_port, fake_subnets = self._get_fake_endpoint(
+            'ovs')
+        fake_names = utils.get_veth_pair_names(fake_port['id'])
+        mock_ensure_veth.return_value = fake_names + (7,)
+        mock_driver = mock_get_driver.return_value
+        mock_driver.is_plugged.return_value = True
+
+        result = binding.port_ensure(fake_endpoint_id, fake_port,
+                                     fake_subnets)
+
+        self.assertEqual(fake_names + (('', ''),), result)
+        mock_ensure_veth.assert_called_once_with(mock.ANY, None, None)
+        self.assertEqual(fake_port['id'],
+                         mock_ensure_veth.call_args[0][0].port_id)
+        mock_driver.is_plugged.assert_called_once_with(
+            fake_port, fake_names[0], 7)
+        mock_driver.bind_plan.assert_not_called()
+
+    @mock.patch('kuryr.lib.binding._ensure_veth')
+    @mock.patch('kuryr.lib.binding.get_driver')
+    def test_port_ensure_not_plugged(self, mock_get_driver,
+                                     mock_ensure_veth):
+        fake_endpoint_id, fake_port, fake_subnets = self._get_fake_endpoint(
+            'ovs')
+        fake_names = utils.get_veth_pair_names(fake_port['id'])
+        mock_ensure_veth.return_value = fake_names + (None,)
+        mock_driver = mock_get_driver.return_value
+        mock_driver.phase = 'plug'
+        mock_driver.is_plugged.return_value = False
+        mock_driver.bind_plan.return_value = ('fake_stdout', '')
+
+        result = binding.port_ensure(fake_endpoint_id, fake_port,
+                                     fake_subnets)
+
+        self.assertEqual(fake_names + (('fake_stdout', ''),), result)
+        mock_driver.bind_plan.assert_called_once_with(
+            fake_endpoint_id, mock_ensure_veth.call_args[0][0])
+
+    @mock.patch('kuryr.lib.binding.cleanup_veth')
+    @mock.patch('kuryr.lib.binding._ensure_veth')
+    @mock.patch('kuryr.lib.binding.get_driver')
+    def test_port_ensure_plug_failure(self, mock_get_driver,
+                                      mock_ensure_veth, mock_cleanup_veth):
+        fake_endpoint_id, fake_port, fake_subnets = self._get_fake_endpoint(
+            'ovs')
+        mock_ensure_veth.return_value = (
+            utils.get_veth_pair_names(fake_port['id']) + (None,))
+        mock_driver = mock_get_driver.return_value
+        mock_driver.phase = 'plug'
+        mock_driver.is_plugged.return_value = False
+        mock_driver.bind_plan.side_effect = exceptions.BindingFailure()
+
+        self.assertRaises(exceptions.BindingFailure, binding.port_ensure,
+                          fake_endpoint_id, fake_port, fake_subnets)
+
+        # The existing pair may be in use, it is left in place.
+        mock_cleanup_veth.assert_not_called()
+
+    @mock.patch('kuryr.lib.binding._port_bind')
+    @mock.patch('kuryr.lib.binding._ensure_veth', return_value=None)
+    @mock.patch('kuryr.lib.binding.get_driver')
+    def test_port_ensure_missing_veth(self, mock_get_driver,
+                                      mock_ensure_veth, mock_port_bind):
+        fake_endpoint_id, fake_port, fake_subnets = self._get_fake_endpoint(
+            'ovs')
+
+        result = binding.port_ensure(fake_endpoint_id, fake_port,
+                                     fake_subnets)
+
+        self.assertEqual(mock_port_bind.return_value, result)
+        mock_port_bind.assert_called_once_with(
+            fake_endpoint_id, fake_port, fake_subnets, None, None, None,
+            mock_ensure_veth.call_args[0][0])
+        mock_get_driver.return_value.bind_plan.assert_not_called()
+
+    @mock.patch('kuryr.lib.binding.iproute.ensure_veth', return_value=7)
+    @mock.patch('kuryr.lib.binding.get_iproute')
+    @mock.patch('kuryr.lib.binding.get_driver')
+    def test_port_ensure_moved_peer(self, mock_get_driver, mock_get_iproute,
+                                    mock_ensure_veth):
+        fake_endpoint_id, fake_port, fake_subnets = self._get_fake_endpoint(
+            'ovs')
+        fake_names = utils.get_veth_pair_names(fake_port['id'])
+        fake_ipr = mock_get_iproute.return_value
+        # The peer was moved into the namespace of the container.
+        fake_ipr.link_lookup.side_effect = (
+            lambda ifname: [5] if ifname == fake_names[0] else [])
+        mock_driver = mock_get_driver.return_value
+        mock_driver.is_plugged.return_value = True
+
+        result = binding.port_ensure(fake_endpoint_id, fake_port,
+                                     fake_subnets)
+
+        self.assertEqual(fake_names + (('', ''),), result)
+        mock_ensure_veth.assert_called_once_with(
+            fake_ipr, 5, None, None, mock.ANY, binding.DEFAULT_NETWORK_MTU,
+            fake_port['mac_address'], vif_type='ovs')
+        mock_driver.is_plugged.assert_called_once_with(
+            fake_port, fake_names[0], 7)
+        fake_ipr.link.assert_not_called()
+
+    @mock.patch('kuryr.lib.binding._JOURNAL_CACHE', None)
+    @mock.patch('kuryr.lib.binding._configure_veth')
+    @mock.patch('kuryr.lib.binding._ensure_veth', return_value=None)
+    @mock.patch('kuryr.lib.binding.get_driver')
+    def test_port_ensure_bind_failure_journal(self, mock_get_driver,
+                                              mock_ensure_veth,
+                                              mock_configure_veth):
+        self.config_fixture.config(
+            group='binding',
+            journal_path=os.path.join(
+                self.useFixture(fixtures.TempDir()).path, 'binding.db'))
+        self.addCleanup(binding.get_journal().close)
+        fake_endpoint_id, fake_port, fake_subnets = self._get_fake_endpoint(
+            'ovs')
+        fake_names = utils.get_veth_pair_names(fake_port['id'])
+        binding.get_journal().record_bind(
+            fake_port['id'], fake_endpoint_id, fake_names[0], fake_names[1],
+            'ovs')
+        mock_configure_veth.side_effect = exceptions.VethCreationFailure()
+
+        self.assertRaises(exceptions.VethCreationFailure,
+                          binding.port_ensure, fake_endpoint_id, fake_port,
+                          fake_subnets)
+
+        entry = binding.get_journal().get(fake_port['id'])
+        self.assertIsNotNone(entry)
+        self.assertFalse(entry.pending)
+
+    @mock.patch('kuryr.lib.binding._JOURNAL_CACHE', None)
+    @mock.patch('kuryr.lib.binding.cleanup_veth')
+    @mock.patch('kuryr.lib.binding._configure_veth')
+    @mock.patch('kuryr.lib.binding.get_driver')
+    def test_port_bind_journal(self, mock_get_driver, mock_configure_veth,
+                               mock_cleanup_veth):
+        self.config_fixture.config(
+            group='binding',
+            journal_path=os.path.join(
+                self.useFixture(fixtures.TempDir()).path, 'binding.db'))
+        fake_endpoint_id, fake_port, fake_subnets = self._get_fake_endpoint(
+            'ovs')
+        fake_names = utils.get_veth_pair_names(fake_port['id'])
+        mock_configure_veth.return_value = fake_names
+        mock_driver = mock_get_driver.return_value
+        mock_driver.phase = 'plug'
+        mock_driver.bind_plan.return_value = ('', '')
+        mock_driver.unbind_plan.return_value = ('', '')
+
+        binding.port_bind(fake_endpoint_id, fake_port, fake_subnets)
+
+        entry = binding.get_journal().get(fake_port['id'])
+        self.assertEqual((fake_port['id'], fake_endpoint_id) + fake_names +
+                         ('ovs', None), entry[:6])
+
+        binding.port_unbind(fake_endpoint_id, fake_port)
+
+        self.assertIsNone(binding.get_journal().get(fake_port['id']))
+        binding.get_journal().close()
+
+    @mock.patch('kuryr.lib.binding._JOURNAL_CACHE', None)
+    @mock.patch('kuryr.lib.binding.cleanup_veth')
+    @mock.patch('kuryr.lib.binding._configure_veth')
+    @mock.patch('kuryr.lib.binding.get_driver')
+    def test_port_bind_journal_pending(self, mock_get_driver,
+                                       mock_configure_veth,
+                                       mock_cleanup_veth):
+        self.config_fixture.config(
+            group='binding',
+            journal_path=os.path.join(
+                self.useFixture(fixtures.TempDir()).path, 'binding.db'))
+        self.addCleanup(binding.get_journal().close)
+        fake_endpoint_id, fake_port, fake_subnets = self._get_fake_endpoint(
+            'ovs')
+        mock_driver = mock_get_driver.return_value
+        mock_driver.phase = 'plug'
+
+        def fake_configure_veth(binding_plan, netns, container_ifname):
+            # The port is recorded before its veth pair is created.
+            entry = binding.get_journal().get(fake_port['id'])
+            self.assertTrue(entry.pending)
+            self.assertEqual('eth1', entry.peer_name)
+            self.assertIn(fake_port['id'], binding.get_in_flight_port_ids())
+            return binding_plan.ifname, 'eth1'
+
+        mock_configure_veth.side_effect = fake_configure_veth
+        mock_driver.bind_plan.side_effect = exceptions.BindingFailure
+
+        self.assertRaises(exceptions.BindingFailure, binding.port_bind,
+                          fake_endpoint_id, fake_port, fake_subnets,
+                          netns='/var/run/netns/fake',
+                          container_ifname='eth1')
+        self.assertIsNone(binding.get_journal().get(fake_port['id']))
+        self.assertEqual(set(), binding.get_in_flight_port_ids())
+
+        mock_driver.bind_plan.side_effect = None
+        mock_driver.bind_plan.return_value = ('', '')
+
+        binding.port_bind(fake_endpoint_id, fake_port, fake_subnets,
+                          netns='/var/run/netns/fake',
+                          container_ifname='eth1')
+
+        self.assertFalse(binding.get_journal().get(fake_port['id']).pending)
+
+    @mock.patch('stevedore.extension.ExtensionManager')
+    def test_load_drivers(self, mock_extension_manager):
+        self.config_fixture.config(group='binding', native_drivers=['tap'])
+        fake_driver = mock.Mock()
+        fake_extensions = [mock.Mock(plugin=mock.Mock(return_value=None)),
+                           mock.Mock(plugin=mock.Mock(
+                               return_value=fake_driver))]
+        fake_extensions[0].name = 'ovs'
+        fake_extensions[1].name = 'tap'
+        mock_extension_manager.return_value = fake_extensions
+
+        self.assertIs(fake_driver, binding.get_driver('tap'))
+        mock_extension_manager.assert_called_once_with(
+            binding.DRIVER_NAMESPACE)
+        # Only the enabled in-process drivers are instantiated.
+        fake_extensions[0].plugin.assert_not_called()
+        ovs_driver = binding.get_driver('ovs')
+        self.assertIsInstance(ovs_driver, binding.ScriptDriver)
+        self.assertEqual(os.path.join(FAKE_BINDIR, 'ovs'),
+                         ovs_driver.exec_path)
+        self.assertIsNone(binding.get_driver('fake'))
+
+    @mock.patch('kuryr.lib.binding._configure_veth')
+    def test_port_bind_not_supported(self, mock_configure_veth):
+        fake_endpoint_id, fake_port, fake_subnets = self._get_fake_endpoint(
+            'fake')
+
+        self.assertRaises(exceptions.BindingNotSupportedFailure,
+                          binding.port_bind, fake_endpoint_id, fake_port,
+                          fake_subnets)
+        mock_configure_veth.assert_not_called()
+
+    @mock.patch('kuryr.lib.binding.get_netns_cache')
+    @mock.patch('kuryr.lib.binding.iproute.configure_veth_in_netns')
+    @mock.patch('kuryr.lib.binding.get_iproute')
+    def test_configure_veth_netns(self, mock_get_iproute,
+                                  mock_configure_veth_in_netns,
+                                  mock_get_netns_cache):
+        fake_endpoint_id, fake_port, fake_subnets = self._get_fake_endpoint(
+            'ovs')
+        ifname, _ = utils.get_veth_pair_names(fake_port['id'])
+        mock_cache = mock_get_netns_cache.return_value
+
+        self.assertEqual(
+            (ifname, 'eth1'),
+            binding._configure_veth(plan.BindingPlan(fake_port, fake_subnets),
+                                    netns='fake_netns',
+                                    container_ifname='eth1'))
+
+        mock_cache.checkout.assert_called_once_with('fake_netns')
+        args = mock_configure_veth_in_netns.call_args[0]
+        self.assertEqual((mock_get_iproute.return_value,
+                          mock_cache.checkout.return_value, ifname, 'eth1'),
+                         args[:4])
+        self.assertEqual(binding._get_gateways(fake_port, fake_subnets),
+                         args[7])
+        mock_cache.checkin.assert_called_once_with(
+            mock_cache.checkout.return_value)
+
+    @mock.patch('kuryr.lib.binding.get_netns_cache')
+    @mock.patch('kuryr.lib.binding.iproute.configure_veth_in_netns',
+                side_effect=exceptions.VethCreationFailure)
+    @mock.patch('kuryr.lib.binding.get_iproute')
+    def test_configure_veth_netns_failure(self, mock_get_iproute,
+                                          mock_configure_veth_in_netns,
+                                          mock_get_netns_cache):
+        fake_endpoint_id, fake_port, fake_subnets = self._get_fake_endpoint(
+            'ovs')
+
+        self.assertRaises(exceptions.VethCreationFailure,
+                          binding._configure_veth,
+                          plan.BindingPlan(fake_port, fake_subnets),
+                          netns='fake_netns')
+        mock_cache = mock_get_netns_cache.return_value
+        mock_cache.invalidate.assert_called_once_with('fake_netns')
+        mock_cache.checkin.assert_called_once_with(
+            mock_cache.checkout.return_value)
+
+    def test_get_gateways(self):
+        fake_endpoint_id, fake_port, fake_subnets = self._get_fake_endpoint(
+            'ovs')
+        fake_subnets[0]['gateway_ip'] = '192.168.1.1'
+        fake_subnets[1]['gateway_ip'] = 'fe80::f816:3eff:fe1c:36a9'
+
+        self.assertEqual(('192.168.1.1', 'fe80::f816:3eff:fe1c:36a9'),
+                         binding._get_gateways(fake_port, fake_subnets))
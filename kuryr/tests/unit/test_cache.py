@@ -0,0 +1,120 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import uuid
+
+import mock
+
+from kuryr.lib import cache
+from kuryr.lib import exceptions
+from kuryr.lib import utils
+from kuryr.tests.unit import base
+
+
+class TTLCacheTest(base.TestCase):
+    """Unit tests for the TTL cache."""
+
+    def setUp(self):
+        super(TTLCacheTest, self).setUp()
+        self.now = 0
+        self.cache = cache.TTLCache(2, 10, timer=lambda: self.now)
+
+    def test_expiration(self):
+        self.cache.set('key', 'value')
+        self.now = 9
+        self.assertEqual('value', self.cache.get('key'))
+        self.now = 10
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_lru_eviction(self):
+        self.cache.set('key1', 'value1')
+        self.cache.set('key2', 'value2')
+        self.cache.get('key1')
+        self.cache.set('key3', 'value3')
+
+        self.assertEqual(2, len(self.cache))
+        self.assertEqual('value1', self.cache.get('key1'))
+        self.assertIsNone(self.cache.get('key2'))
+        self.assertEqual('value3', self.cache.get('key3'))
+
+    def test_get_or_load(self):
+        loader = mock.Mock(return_value='value')
+
+        self.assertEqual('value', self.cache.get_or_load('key', loader))
+        self.assertEqual('value', self.cache.get_or_load('key', loader))
+        loader.assert_called_once_with()
+
+        self.cache.pop('key')
+        self.cache.get_or_load('key', loader)
+        self.assertEqual(2, loader.call_count)
+
+
+class NeutronResourceCacheTest(base.TestCase):
+    """Unit tests for the Neutron resource cache."""
+
+    def setUp(self):
+        super(NeutronResourceCacheTest, self).setUp()
+        self.neutron_client = mock.Mock()
+        self.cache = cache.NeutronResourceCache(self.neutron_client)
+        self.network_id = str(uuid.uuid4())
+
+    def test_get_network(self):
+        fake_network = self._get_fake_networks(self.network_id)['networks'][0]
+        self.neutron_client.show_network.return_value = {
+            'network': fake_network}
+
+        self.assertEqual(fake_network,
+                         self.cache.get_network(self.network_id))
+        self.assertEqual(fake_network,
+                         self.cache.get_network(self.network_id))
+        self.neutron_client.show_network.assert_called_once_with(
+            self.network_id)
+
+        self.cache.invalidate_network(self.network_id)
+        self.cache.get_network(self.network_id)
+        self.assertEqual(2, self.neutron_client.show_network.call_count)
+
+    def test_get_subnets(self):
+        subnet_v4_id = str(uuid.uuid4())
+        subnet_v6_id = str(uuid.uuid4())
+        fake_subnets = self._get_fake_subnets(
+            utils.get_hash(), self.network_id, subnet_v4_id, subnet_v6_id)
+        self.neutron_client.list_subnets.return_value = fake_subnets
+
+        self.assertEqual(fake_subnets['subnets'],
+                         self.cache.get_subnets(self.network_id))
+        self.assertEqual(fake_subnets['subnets'],
+                         self.cache.get_subnets(self.network_id))
+        self.neutron_client.list_subnets.assert_called_once_with(
+            network_id=self.network_id)
+
+    def test_get_subnetpool(self):
+        fake_subnetpool = {'id': str(uuid.uuid4())}
+        self.neutron_client.list_subnetpools.return_value = {
+            'subnetpools': [fake_subnetpool]}
+
+        self.assertEqual(fake_subnetpool,
+                         self.cache.get_subnetpool('10.0.0.0/16'))
+        self.cache.get_subnetpool('10.0.0.0/16')
+        self.neutron_client.list_subnetpools.assert_called_once_with(
+            name=utils.get_neutron_subnetpool_name('10.0.0.0/16'))
+
+        self.cache.invalidate_subnetpool('10.0.0.0/16')
+        self.cache.get_subnetpool('10.0.0.0/16')
+        self.assertEqual(2, self.neutron_client.list_subnetpools.call_count)
+
+    def test_get_subnetpool_not_found(self):
+        self.neutron_client.list_subnetpools.return_value = {
+            'subnetpools': []}
+
+        self.assertRaises(exceptions.NoResourceException,
+                          self.cache.get_subnetpool, '10.0.0.0/16')
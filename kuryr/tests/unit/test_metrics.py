@@ -0,0 +1,122 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import ddt
+import mock
+
+from kuryr.lib import binding
+from kuryr.lib import metrics
+from kuryr.tests.unit import base
+
+
+@ddt.ddt
+class MetricsTest(base.TestCase):
+    """Unit tests for the binding metrics."""
+
+    def setUp(self):
+        super(MetricsTest, self).setUp()
+        self.addCleanup(metrics.set_sink, None)
+
+    @ddt.data(('noop', metrics.MetricsSink),
+              ('statsd', metrics.StatsdSink),
+              ('prometheus', metrics.HistogramSink))
+    @ddt.unpack
+    def test_get_sink(self, sink_name, sink_class):
+        self.config_fixture.config(group='binding', metrics_sink=sink_name)
+        metrics.set_sink(None)
+
+        sink = metrics.get_sink()
+
+        self.assertIsInstance(sink, sink_class)
+        self.assertIs(sink, metrics.get_sink())
+
+    def test_timed(self):
+        sink = metrics.HistogramSink()
+        metrics.set_sink(sink)
+
+        with metrics.timed(metrics.SCRIPT, 'ovs'):
+            pass
+        try:
+            with metrics.timed(metrics.SCRIPT, 'ovs'):
+                raise ValueError()
+        except ValueError:
+            pass
+        with metrics.timed(metrics.CLEANUP):
+            pass
+
+        self.assertEqual(1, sink.get_count(metrics.SCRIPT, 'ovs'))
+        self.assertEqual(1, sink.get_count(metrics.SCRIPT, 'ovs',
+                                           succeeded=False))
+        self.assertEqual(1, sink.get_count(metrics.CLEANUP,
+                                           metrics.UNKNOWN_VIF_TYPE))
+
+    def test_histogram_dump(self):
+        sink = metrics.HistogramSink(buckets=(0.1, 1.0))
+        sink.observe(metrics.VETH_CREATE, 'ovs', 0.05, True)
+        sink.observe(metrics.VETH_CREATE, 'ovs', 0.5, False)
+
+        dump = sink.dump()
+
+        labels = 'phase="veth_create",vif_type="ovs"'
+        self.assertIn('# TYPE kuryr_binding_phase_seconds histogram', dump)
+        self.assertIn('kuryr_binding_phase_seconds_bucket{%s,le="0.1"} 1'
+                      % labels, dump)
+        self.assertIn('kuryr_binding_phase_seconds_bucket{%s,le="1.0"} 2'
+                      % labels, dump)
+        self.assertIn('kuryr_binding_phase_seconds_bucket{%s,le="+Inf"} 2'
+                      % labels, dump)
+        self.assertIn('kuryr_binding_phase_seconds_count{%s} 2' % labels,
+                      dump)
+        self.assertIn('kuryr_binding_phase_total{%s,result="failure"} 1'
+                      % labels, dump)
+
+    @mock.patch('socket.socket')
+    def test_statsd_sink(self, mock_socket):
+        sink = metrics.StatsdSink('127.0.0.1', 8125, 'kuryr.binding')
+
+        sink.observe(metrics.SCRIPT, 'ovs', 0.25, True)
+
+        payload, address = mock_socket.return_value.sendto.call_args[0]
+        self.assertEqual(('127.0.0.1', 8125), address)
+        self.assertEqual(b'kuryr.binding.script:250.000|ms|#vif_type:ovs\n'
+                         b'kuryr.binding.script.success:1|c|#vif_type:ovs',
+                         payload)
+
+    @mock.patch('socket.socket')
+    def test_statsd_gauge(self, mock_socket):
+        sink = metrics.StatsdSink('127.0.0.1', 8125, 'kuryr.binding')
+
+        sink.gauge(metrics.QUEUE_DEPTH, 'ovs', 3)
+
+        payload, address = mock_socket.return_value.sendto.call_args[0]
+        self.assertEqual(b'kuryr.binding.queue_depth:3|g|#vif_type:ovs',
+                         payload)
+
+    def test_histogram_gauge(self):
+        sink = metrics.HistogramSink()
+        sink.gauge(metrics.QUEUE_DEPTH, 'ovs', 2)
+        sink.gauge(metrics.QUEUE_DEPTH, 'ovs', 1)
+
+        self.assertEqual(1, sink.get_gauge(metrics.QUEUE_DEPTH, 'ovs'))
+        self.assertIsNone(sink.get_gauge(metrics.QUEUE_DEPTH, 'bridge'))
+        self.assertIn('kuryr_binding_gauge{name="queue_depth",'
+                      'vif_type="ovs"} 1', sink.dump())
+
+    @mock.patch('kuryr.lib.binding.get_iproute')
+    def test_cleanup_veth_metrics(self, mock_get_iproute):
+        sink = metrics.HistogramSink()
+        metrics.set_sink(sink)
+        mock_get_iproute.return_value.link_lookup.return_value = [7]
+
+        binding.cleanup_veth('tapfake', 'ovs')
+
+        self.assertEqual(1, sink.get_count(metrics.CLEANUP, 'ovs'))
@@ -12,6 +12,7 @@
 
 import mock
 
+from kuryr.lib import config
 from kuryr.lib import opts as kuryr_opts
 from kuryr.tests.unit import base
 
@@ -28,3 +29,13 @@ class OptsTest(base.TestCase):
 
         self.assertEqual(self._fake_kuryr_opts + self._fake_neutron_opts,
                          kuryr_opts.list_kuryr_opts())
+
+    def test_list_kuryr_opts_binding(self):
+        groups = dict(kuryr_opts.list_kuryr_opts())
+
+        self.assertEqual(
+            [opt.name for opt in config.binding_opts],
+            [opt.name for opt in groups['binding']])
+        self.assertEqual(
+            [opt.name for opt in config.datapath_profile_opts],
+            [opt.name for opt in groups['datapath_profile:<name>']])
@@ -0,0 +1,72 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+from oslo_concurrency import processutils
+
+from kuryr.lib import privileged
+from kuryr.tests.unit import base
+
+
+class PrivilegedTest(base.TestCase):
+    """Unit tests for the privileged helper."""
+
+    def setUp(self):
+        super(PrivilegedTest, self).setUp()
+        privileged.default.set_client_mode(False)
+        self.addCleanup(privileged.default.set_client_mode, True)
+        privileged.netns_admin.set_client_mode(False)
+        self.addCleanup(privileged.netns_admin.set_client_mode, True)
+        self.config_fixture.config(bindir='/fake')
+
+    @mock.patch('oslo_concurrency.processutils.execute',
+                return_value=('fake_stdout', 'fake_stderr'))
+    def test_execute_binding(self, mock_execute):
+        self.assertEqual((0, 'fake_stdout', 'fake_stderr'),
+                         privileged.execute_binding('/fake/ovs', 'bind'))
+        mock_execute.assert_called_once_with('/fake/ovs', 'bind')
+
+    @mock.patch('oslo_concurrency.processutils.execute')
+    def test_execute_binding_failure(self, mock_execute):
+        mock_execute.side_effect = processutils.ProcessExecutionError(
+            stdout='fake_stdout', stderr='fake_stderr', exit_code=2)
+
+        self.assertEqual((2, 'fake_stdout', 'fake_stderr'),
+                         privileged.execute_binding('/fake/ovs', 'unbind'))
+
+    @mock.patch('oslo_concurrency.processutils.execute')
+    def test_execute_binding_refused(self, mock_execute):
+        for cmd in (('/bin/sh', 'bind'), ('/fake/../bin/sh', 'bind'),
+                    ('/fake/ovs', 'status'), ('/fake/ovs',),
+                    ('/fake/sub/ovs', 'bind')):
+            exit_code, stdout, stderr = privileged.execute_binding(*cmd)
+            self.assertEqual(privileged.REFUSED_EXIT_CODE, exit_code)
+        mock_execute.assert_not_called()
+
+    @mock.patch('oslo_concurrency.processutils.execute',
+                return_value=('', ''))
+    def test_set_offloads(self, mock_execute):
+        self.assertEqual((0, '', ''),
+                         privileged.set_offloads('eth0', ('gro', 'on'),
+                                                 '/var/run/netns/fake'))
+        mock_execute.assert_called_once_with(
+            'nsenter', '--net=/var/run/netns/fake', 'ethtool', '--offload',
+            'eth0', 'gro', 'on')
+
+    @mock.patch('oslo_concurrency.processutils.execute')
+    def test_set_offloads_refused(self, mock_execute):
+        for args in (('-s', ('gro', 'on')), ('eth0', ('gro',)),
+                     ('eth0', ('rx-all', 'on')), ('eth0', ('gro', '1')),
+                     ('eth0', ('gro', 'on'), 'fake')):
+            exit_code, stdout, stderr = privileged.set_offloads(*args)
+            self.assertEqual(privileged.REFUSED_EXIT_CODE, exit_code)
+        mock_execute.assert_not_called()
@@ -15,6 +15,7 @@ import mock
 import socket
 import uuid
 
+from oslo_concurrency import processutils
 from oslo_config import cfg
 
 from kuryr.lib import constants as const
@@ -29,6 +30,7 @@ class TestKuryrUtils(base.TestCase):
         super(TestKuryrUtils, self).setUp()
         self.fake_url = 'http://127.0.0.1:9696'
         self.fake_auth_url = 'http://127.0.0.1:35357/v2.0'
+        self.addCleanup(utils._NEUTRON_CLIENT_CACHE.clear)
 
     def test_get_veth_pair_names(self):
         fake_neutron_port_id = str(uuid.uuid4())
@@ -69,6 +71,34 @@ class TestKuryrUtils(base.TestCase):
             session=fake_session,
             endpoint_type=cfg.CONF.neutron.endpoint_type)
 
+    @mock.patch('neutronclient.v2_0.client.Client')
+    @mock.patch('keystoneauth1.loading.load_auth_from_conf_options')
+    @mock.patch('keystoneauth1.loading.load_session_from_conf_options')
+    def test_get_neutron_client_cached(self, mock_session_loader,
+                                       mock_auth_loader, mock_client):
+        mock_client.side_effect = [mock.sentinel.client1,
+                                   mock.sentinel.client2]
+
+        self.assertIs(mock.sentinel.client1, utils.get_neutron_client())
+        self.assertIs(mock.sentinel.client1, utils.get_neutron_client())
+        mock_auth_loader.assert_called_once()
+        mock_session_loader.assert_called_once()
+        self.assertEqual(cfg.CONF.neutron.token_refresh_margin,
+                         mock_auth_loader.return_value.MIN_TOKEN_LIFE_SECONDS)
+
+        # A different auth configuration gets its own client.
+        self.config_fixture.config(group='neutron', endpoint_type='internal')
+        self.assertIs(mock.sentinel.client2, utils.get_neutron_client())
+
+    def test_get_requests_session(self):
+        self.config_fixture.config(group='neutron', connection_pool_size=3)
+
+        http_session = utils._get_requests_session()
+
+        adapter = http_session.get_adapter(self.fake_url)
+        self.assertEqual(3, adapter._pool_maxsize)
+        self.assertTrue(adapter._pool_block)
+
     @mock.patch.object(socket, 'gethostname', return_value='fake_hostname')
     def test_get_hostname(self, mock_get_hostname):
         self.assertEqual('fake_hostname', utils.get_hostname())
@@ -98,3 +128,22 @@ class TestKuryrUtils(base.TestCase):
         fake_string_len = 20
         self.assertEqual(fake_string_len,
              len(utils.get_random_string(fake_string_len)))
+
+    @mock.patch('os.geteuid')
+    def test_get_root_command(self, mock_geteuid):
+        mock_geteuid.return_value = 0
+        self.assertEqual(('/fake/ovs', 'bind', '42'),
+                         utils.get_root_command('/fake/ovs', 'bind', 42))
+
+        mock_geteuid.return_value = 1000
+        self.assertEqual(('sudo', '/fake/ovs', 'bind'),
+                         utils.get_root_command('/fake/ovs', 'bind'))
+        self.config_fixture.config(
+            group='binding',
+            root_helper='sudo kuryr-rootwrap /etc/kuryr/rootwrap.conf')
+        self.assertEqual(('sudo', 'kuryr-rootwrap',
+                          '/etc/kuryr/rootwrap.conf', '/fake/ovs', 'bind'),
+                         utils.get_root_command('/fake/ovs', 'bind'))
+        self.config_fixture.config(group='binding', root_helper='')
+        self.assertRaises(processutils.NoRootWrapSpecified,
+                          utils.get_root_command, '/fake/ovs', 'bind')